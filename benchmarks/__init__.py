@@ -0,0 +1 @@
+"""Benchmark suite for the auto-annotation pipeline (scan / label I/O / annotate loop)."""
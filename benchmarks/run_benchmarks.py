@@ -0,0 +1,282 @@
+"""Timed benchmark scenarios for the non-model parts of the pipeline.
+
+Scenarios:
+- scan:          iter_station_dirs + scan_station_categories over the whole tree
+- annotate:      AutoAnnotator.annotate_images_yolo with the stub predictor
+- split:         DatasetOrganizer.split_dataset_from_dirs on every pre-labeled category
+- label_manager: YOLOLabelManager scan/analyze/modify on every labels dir
+
+Results are written as JSON and can be compared against a stored baseline:
+
+  python benchmarks/run_benchmarks.py --output bench.json
+  python benchmarks/run_benchmarks.py --baseline bench.json --tolerance 0.2
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import logging
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.stub_predictor import StubPredictor
+from benchmarks.synthetic_tree import LAYOUTS, TreeSpec, generate_stations_tree
+
+SCENARIOS = ("scan", "annotate", "split", "label_manager")
+
+# Modules imported before timing, so one-off import cost (torch/ultralytics) is not measured.
+_SCENARIO_IMPORTS = {
+    "scan": ("src.station_scanner",),
+    "annotate": ("src.station_scanner", "src.auto_annotator"),
+    "split": ("src.station_scanner", "src.data_processor"),
+    "label_manager": ("myutils.yolo_label_manager",),
+}
+
+_BENCH_CONFIG = {
+    "validation": {"split_ratio": 0.15, "shuffle": True, "random_seed": 42},
+    "auto_annotation": {"review_threshold": 0.5, "chunk_size": 50},
+}
+
+
+def _category_dirs(stations_root: Path) -> List[Tuple[Path, str]]:
+    from src.station_scanner import iter_station_dirs, scan_station_categories
+
+    found = []
+    for station_dir in iter_station_dirs(stations_root):
+        for entry in scan_station_categories(station_dir):
+            found.append((entry.category_dir, entry.layout))
+    return found
+
+
+def scenario_scan(stations_root: Path, scratch: Path) -> int:
+    return len(_category_dirs(stations_root))
+
+
+def scenario_annotate(stations_root: Path, scratch: Path, *, latency_ms: float = 0.0) -> int:
+    from src.auto_annotator import AutoAnnotator
+
+    total = 0
+    for idx, (category_dir, layout) in enumerate(_category_dirs(stations_root)):
+        if layout == "pre_labeled":
+            continue
+        images_dir = category_dir if layout == "flat_images" else category_dir / "images"
+        annotator = AutoAnnotator("stub.pt", _BENCH_CONFIG)
+        annotator.predictor = StubPredictor("stub.pt", _BENCH_CONFIG, latency_ms=latency_ms)
+        labels_dir = scratch / f"labels_{idx:04d}"
+        stats = annotator.annotate_images_yolo(
+            str(images_dir),
+            str(labels_dir),
+            skip_existing=True,
+            write_empty=True,
+        )
+        total += stats["total"]
+    return total
+
+
+def scenario_split(stations_root: Path, scratch: Path) -> int:
+    from src.data_processor import DatasetOrganizer
+
+    total = 0
+    cfg = _BENCH_CONFIG["validation"]
+    for idx, (category_dir, _layout) in enumerate(_category_dirs(stations_root)):
+        images_dir = category_dir / "pre_images"
+        labels_dir = category_dir / "pre_labels"
+        if not (images_dir.exists() and labels_dir.exists()):
+            continue
+        organizer = DatasetOrganizer(str(scratch / f"split_{idx:04d}"))
+        train_count, val_count = organizer.split_dataset_from_dirs(
+            images_dir=str(images_dir),
+            labels_dir=str(labels_dir),
+            split_ratio=cfg["split_ratio"],
+            shuffle=cfg["shuffle"],
+            seed=cfg["random_seed"],
+        )
+        total += train_count + val_count
+    return total
+
+
+def scenario_label_manager(stations_root: Path, scratch: Path) -> int:
+    from myutils.yolo_label_manager import YOLOLabelManager
+
+    total = 0
+    label_dirs = sorted(p for p in stations_root.rglob("*labels") if p.is_dir())
+    with contextlib.redirect_stdout(io.StringIO()):
+        for idx, labels_dir in enumerate(label_dirs):
+            work_dir = scratch / f"lm_{idx:04d}"
+            shutil.copytree(labels_dir, work_dir)
+            manager = YOLOLabelManager(work_dir)
+            manager.scan_labels()
+            manager.analyze_categories()
+            manager.modify_labels({0: 1}, backup=True)
+            total += len(manager.label_files)
+    return total
+
+
+def _time_scenario(
+    fn: Callable[[Path, Path], int],
+    stations_root: Path,
+    scratch_root: Path,
+    repeats: int,
+) -> Dict[str, float]:
+    durations = []
+    items = 0
+    for r in range(repeats):
+        scratch = scratch_root / f"run_{r}"
+        scratch.mkdir(parents=True, exist_ok=True)
+        start = time.perf_counter()
+        items = fn(stations_root, scratch)
+        durations.append(time.perf_counter() - start)
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    median = statistics.median(durations)
+    return {
+        "repeats": repeats,
+        "items": items,
+        "min_s": min(durations),
+        "median_s": median,
+        "mean_s": statistics.fmean(durations),
+        "items_per_s": (items / median) if median > 0 else None,
+    }
+
+
+def compare_to_baseline(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Return a list of human-readable regressions (median slower than baseline * (1 + tolerance))."""
+    regressions = []
+    for name, result in current.get("scenarios", {}).items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base or "median_s" not in base or "median_s" not in result:
+            continue
+        limit = base["median_s"] * (1 + tolerance)
+        if result["median_s"] > limit:
+            regressions.append(
+                f"{name}: median {result['median_s']:.4f}s > baseline {base['median_s']:.4f}s "
+                f"(+{(result['median_s'] / base['median_s'] - 1) * 100:.1f}%, tolerance {tolerance * 100:.0f}%)"
+            )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark scan / label I/O / annotation loop on a synthetic tree")
+    parser.add_argument("--stations", type=int, default=4, help="Number of stations (default: 4)")
+    parser.add_argument("--categories", type=int, default=6, help="Categories per station (default: 6)")
+    parser.add_argument("--images", type=int, default=200, help="Unlabeled images per category (default: 200)")
+    parser.add_argument("--pre-labeled", type=int, default=40, help="Pre-labeled images per category (default: 40)")
+    parser.add_argument("--label-density", type=float, default=0.3,
+                        help="Fraction of unlabeled images that already have labels (default: 0.3)")
+    parser.add_argument("--boxes", type=int, default=3, help="Boxes per label file (default: 3)")
+    parser.add_argument("--layouts", nargs="+", default=list(LAYOUTS), choices=list(LAYOUTS),
+                        help="Category layouts to mix (default: all)")
+    parser.add_argument("--image-padding", type=int, default=0, help="Extra bytes per placeholder image")
+    parser.add_argument("--latency-ms", type=float, default=0.0,
+                        help="Simulated per-image model latency of the stub predictor (default: 0)")
+    parser.add_argument("--repeats", type=int, default=3, help="Repetitions per scenario (default: 3)")
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS), default=None,
+                        help="Scenario to run; can be repeated (default: all)")
+    parser.add_argument("--workdir", type=str, default=None,
+                        help="Where to build the synthetic tree (default: a temporary directory)")
+    parser.add_argument("--output", type=str, default=None, help="Write results JSON to this path")
+    parser.add_argument("--baseline", type=str, default=None, help="Baseline results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed slowdown vs baseline before flagging a regression (default: 0.2)")
+    parser.add_argument("--verbose", action="store_true", help="Keep INFO logs from the pipeline modules")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        # Per-file INFO logging would otherwise dominate the measured time.
+        logging.disable(logging.INFO)
+
+    spec = TreeSpec(
+        stations=args.stations,
+        categories=args.categories,
+        images=args.images,
+        pre_labeled_images=args.pre_labeled,
+        label_density=args.label_density,
+        boxes_per_label=args.boxes,
+        layouts=tuple(args.layouts),
+        image_padding=args.image_padding,
+    )
+
+    workdir = Path(args.workdir) if args.workdir else Path(tempfile.mkdtemp(prefix="autolabel_bench_"))
+    stations_root = workdir / "stations"
+    scratch_root = workdir / "scratch"
+    if stations_root.exists():
+        shutil.rmtree(stations_root)
+
+    scenarios = {
+        "scan": scenario_scan,
+        "annotate": lambda root, scratch: scenario_annotate(root, scratch, latency_ms=args.latency_ms),
+        "split": scenario_split,
+        "label_manager": scenario_label_manager,
+    }
+    selected = args.scenario or list(SCENARIOS)
+
+    try:
+        start = time.perf_counter()
+        summary = generate_stations_tree(stations_root, spec)
+        print(f"Generated tree in {time.perf_counter() - start:.2f}s: {summary.stations} stations, "
+              f"{summary.categories} categories, {summary.images} images, {summary.labels} labels")
+
+        results = {}
+        for name in selected:
+            try:
+                for module in _SCENARIO_IMPORTS[name]:
+                    importlib.import_module(module)
+                results[name] = _time_scenario(scenarios[name], stations_root, scratch_root, args.repeats)
+            except ImportError as e:
+                results[name] = {"skipped": f"missing dependency: {e}"}
+                print(f"  {name:<14} skipped ({e})")
+                continue
+            r = results[name]
+            rate = f"{r['items_per_s']:.1f} items/s" if r["items_per_s"] else "-"
+            print(f"  {name:<14} median {r['median_s']:.4f}s  min {r['min_s']:.4f}s  items {r['items']}  {rate}")
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "spec": {k: (list(v) if isinstance(v, tuple) else v) for k, v in vars(spec).items()},
+            "latency_ms": args.latency_ms,
+        },
+        "scenarios": results,
+    }
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Results saved to: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(report, baseline, args.tolerance)
+        if regressions:
+            print("Regressions detected:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("No regressions against baseline")
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,124 @@
+"""Deterministic stand-in for YOLOPredictor.
+
+Produces ultralytics-shaped results (``result.path``, ``result.boxes`` with
+``cls``/``conf``/``xywhn``) derived from a hash of the image path, so the
+annotation loop can be benchmarked without torch, ultralytics or a GPU.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import random
+import time
+from pathlib import Path
+from typing import List, Optional
+
+
+class _Row(list):
+    """List with a ``tolist`` method, mimicking a 1-D tensor row."""
+
+    def tolist(self):
+        return list(self)
+
+
+class _Column(list):
+    """List with ``max``/``tolist``, mimicking a 1-D tensor."""
+
+    def max(self):
+        return max(self)
+
+    def tolist(self):
+        return list(self)
+
+
+class StubBox:
+    def __init__(self, cls: int, conf: float, xywhn):
+        self.cls = _Column([cls])
+        self.conf = _Column([conf])
+        self.xywhn = [_Row(xywhn)]
+
+
+class StubBoxes:
+    def __init__(self, boxes: List[StubBox]):
+        self._boxes = boxes
+        self.cls = _Column([b.cls[0] for b in boxes])
+        self.conf = _Column([b.conf[0] for b in boxes])
+
+    def __len__(self):
+        return len(self._boxes)
+
+    def __iter__(self):
+        return iter(self._boxes)
+
+
+class StubResult:
+    def __init__(self, path: str, boxes: Optional[StubBoxes]):
+        self.path = path
+        self.boxes = boxes
+        self.speed = {"preprocess": 0.0, "inference": 0.0, "postprocess": 0.0}
+
+
+class StubPredictor:
+    """Drop-in replacement for ``YOLOPredictor`` used by the benchmarks."""
+
+    def __init__(
+        self,
+        model_path: str,
+        config: dict,
+        *,
+        max_boxes: int = 3,
+        num_classes: int = 4,
+        latency_ms: float = 0.0,
+    ):
+        self.model_path = model_path
+        self.config = config
+        self.max_boxes = max_boxes
+        self.num_classes = num_classes
+        self.latency_ms = latency_ms
+        self.model = None
+
+    def load_model(self):
+        self.model = object()
+        return self.model
+
+    def _predict_one(self, image_path: Path) -> StubResult:
+        digest = hashlib.md5(str(image_path).encode("utf-8")).digest()
+        rng = random.Random(int.from_bytes(digest[:8], "little"))
+        count = rng.randint(0, self.max_boxes)
+        if count == 0:
+            return StubResult(str(image_path), None)
+
+        boxes = []
+        for _ in range(count):
+            w = rng.uniform(0.02, 0.4)
+            h = rng.uniform(0.02, 0.4)
+            boxes.append(
+                StubBox(
+                    rng.randrange(self.num_classes),
+                    rng.uniform(0.2, 1.0),
+                    [rng.uniform(w / 2, 1 - w / 2), rng.uniform(h / 2, 1 - h / 2), w, h],
+                )
+            )
+        return StubResult(str(image_path), StubBoxes(boxes))
+
+    def predict_batch(self, image_paths: List[Path], **kwargs):
+        if self.model is None:
+            self.load_model()
+        if self.latency_ms:
+            time.sleep(self.latency_ms * len(image_paths) / 1000.0)
+        return [self._predict_one(Path(p)) for p in image_paths]
+
+    def filter_by_confidence(self, results, threshold: float = 0.5):
+        high_conf, medium_conf, low_conf = [], [], []
+        for result in results:
+            if result.boxes is None or len(result.boxes) == 0:
+                low_conf.append(result)
+                continue
+            max_conf = float(result.boxes.conf.max())
+            if max_conf >= 0.7:
+                high_conf.append(result)
+            elif max_conf >= threshold:
+                medium_conf.append(result)
+            else:
+                low_conf.append(result)
+        return high_conf, medium_conf, low_conf
@@ -0,0 +1,136 @@
+"""Synthetic stations_root generator.
+
+Builds a metertools-style tree at a configurable scale so scanning, label I/O and
+the annotation loop can be timed without real data:
+
+  <root>/
+    station_000/
+      det/<category>/{pre_images,pre_labels,images,labels}   # layout "det"
+      <category>/{images,labels}                             # layout "dir_images"
+      <category>/*.jpg                                       # layout "flat"
+      <category>/{pre_images,pre_labels}                     # layout "pre_labeled"
+
+Images are tiny placeholder JPEGs: the stub predictor never decodes them, so only
+the file-system cost (listing, stat, copy) is measured.
+"""
+
+from __future__ import annotations
+
+import base64
+import random
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Sequence
+
+# Smallest well-formed 1x1 baseline JPEG.
+_PLACEHOLDER_JPEG = base64.b64decode(
+    "/9j/4AAQSkZJRgABAQEASABIAAD/2wBDAP//////////////////////////////////////////////////////"
+    "////////////////////////////////wgALCAABAAEBAREA/8QAFBABAAAAAAAAAAAAAAAAAAAAAP/aAAgBAQAB"
+    "PxA="
+)
+
+LAYOUTS = ("det", "dir_images", "flat", "pre_labeled")
+
+
+@dataclass
+class TreeSpec:
+    stations: int = 4
+    categories: int = 6
+    images: int = 200
+    pre_labeled_images: int = 40
+    label_density: float = 0.3      # fraction of unlabeled images that already have labels/*.txt
+    boxes_per_label: int = 3
+    num_classes: int = 4
+    layouts: Sequence[str] = field(default_factory=lambda: LAYOUTS)
+    image_padding: int = 0          # extra bytes appended to each placeholder image
+    seed: int = 0
+
+
+@dataclass(frozen=True)
+class TreeSummary:
+    root: Path
+    stations: int
+    categories: int
+    images: int
+    labels: int
+
+
+def _write_label(path: Path, rng: random.Random, boxes: int, num_classes: int) -> None:
+    lines = []
+    for _ in range(boxes):
+        w = rng.uniform(0.02, 0.4)
+        h = rng.uniform(0.02, 0.4)
+        x = rng.uniform(w / 2, 1 - w / 2)
+        y = rng.uniform(h / 2, 1 - h / 2)
+        lines.append(f"{rng.randrange(num_classes)} {x:.6f} {y:.6f} {w:.6f} {h:.6f}\n")
+    path.write_text("".join(lines), encoding="utf-8")
+
+
+def _write_images(directory: Path, count: int, prefix: str, payload: bytes) -> List[str]:
+    directory.mkdir(parents=True, exist_ok=True)
+    stems = []
+    for i in range(count):
+        stem = f"{prefix}_{i:06d}"
+        (directory / f"{stem}.jpg").write_bytes(payload)
+        stems.append(stem)
+    return stems
+
+
+def generate_stations_tree(root: Path, spec: TreeSpec) -> TreeSummary:
+    """Create a synthetic stations tree under `root` according to `spec`."""
+    unknown = set(spec.layouts) - set(LAYOUTS)
+    if unknown:
+        raise ValueError(f"Unknown layouts: {sorted(unknown)} (expected subset of {LAYOUTS})")
+
+    rng = random.Random(spec.seed)
+    payload = _PLACEHOLDER_JPEG + b"\0" * spec.image_padding
+    root.mkdir(parents=True, exist_ok=True)
+
+    n_images = 0
+    n_labels = 0
+    n_categories = 0
+    for s in range(spec.stations):
+        station_dir = root / f"station_{s:03d}"
+        for c in range(spec.categories):
+            layout = spec.layouts[(s + c) % len(spec.layouts)]
+            category = f"category_{c:02d}"
+            if layout == "det":
+                category_dir = station_dir / "det" / category
+            else:
+                category_dir = station_dir / category
+            n_categories += 1
+
+            if layout in ("det", "pre_labeled"):
+                stems = _write_images(category_dir / "pre_images", spec.pre_labeled_images, "pre", payload)
+                labels_dir = category_dir / "pre_labels"
+                labels_dir.mkdir(parents=True, exist_ok=True)
+                for stem in stems:
+                    _write_label(labels_dir / f"{stem}.txt", rng, spec.boxes_per_label, spec.num_classes)
+                n_images += len(stems)
+                n_labels += len(stems)
+
+            if layout == "pre_labeled":
+                continue
+
+            if layout == "flat":
+                images_dir = category_dir
+                labels_dir = category_dir / "labels"
+            else:
+                images_dir = category_dir / "images"
+                labels_dir = category_dir / "labels"
+
+            stems = _write_images(images_dir, spec.images, "img", payload)
+            labels_dir.mkdir(parents=True, exist_ok=True)
+            labeled = int(len(stems) * spec.label_density)
+            for stem in stems[:labeled]:
+                _write_label(labels_dir / f"{stem}.txt", rng, spec.boxes_per_label, spec.num_classes)
+            n_images += len(stems)
+            n_labels += labeled
+
+    return TreeSummary(
+        root=root,
+        stations=spec.stations,
+        categories=n_categories,
+        images=n_images,
+        labels=n_labels,
+    )
@@ -1,4 +1,8 @@
+import argparse
+import hashlib
+import os
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 # ==================== 配置区域 ====================
@@ -13,41 +17,112 @@ LABEL_EXTENSIONS = ['.txt']
 # ================================================
 
 
-def copy_matched_labels():
-    """将与图像匹配的标签复制到输出目录"""
+SYNC_MODES = ('copy', 'hardlink', 'copy-if-changed', 'checksum')
+
+
+def _list_files(directory: Path, extensions) -> dict:
+    """一次 scandir 列出目录文件: stem -> 文件名"""
+    files = {}
+    exts = {e.lower() for e in extensions}
+    with os.scandir(directory) as it:
+        for entry in it:
+            stem, ext = os.path.splitext(entry.name)
+            if ext.lower() in exts and entry.is_file():
+                files.setdefault(stem, entry.name)
+    return files
+
+
+def _sha1(path: Path) -> str:
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
 
-    img_path = Path(IMAGE_DIR)
-    lbl_path = Path(LABEL_DIR)
-    out_path = Path(OUTPUT_DIR)
+
+def _sync_one(src: Path, dst: Path, mode: str) -> str:
+    """
+    同步单个标签文件
+
+    Returns:
+        'copied' / 'linked' / 'skipped'
+    """
+    try:
+        dst_stat = dst.stat()
+    except FileNotFoundError:
+        dst_stat = None
+
+    if mode == 'hardlink':
+        src_stat = src.stat()
+        if dst_stat is not None and (dst_stat.st_ino, dst_stat.st_dev) == (src_stat.st_ino, src_stat.st_dev):
+            return 'skipped'
+        if dst_stat is not None:
+            dst.unlink()
+        try:
+            os.link(src, dst)
+            return 'linked'
+        except OSError:
+            # 跨盘符/文件系统不支持硬链接时退回复制
+            shutil.copy2(src, dst)
+            return 'copied'
+
+    if dst_stat is not None:
+        if mode == 'copy-if-changed':
+            src_stat = src.stat()
+            if src_stat.st_size == dst_stat.st_size and int(src_stat.st_mtime) == int(dst_stat.st_mtime):
+                return 'skipped'
+        elif mode == 'checksum':
+            if src.stat().st_size == dst_stat.st_size and _sha1(src) == _sha1(dst):
+                return 'skipped'
+
+    shutil.copy2(src, dst)
+    return 'copied'
+
+
+def sync_matched_labels(image_dir, label_dir, output_dir, mode: str = 'copy-if-changed',
+                        workers: int = 8, verbose: bool = True) -> dict:
+    """
+    将与图像匹配的标签同步到输出目录
+
+    Args:
+        image_dir: 图像目录
+        label_dir: 标签来源目录
+        output_dir: 输出目录
+        mode: copy（总是复制）/ hardlink（硬链接，失败时复制；目标标签不可原地编辑）/
+              copy-if-changed（大小与修改时间相同则跳过）/ checksum（内容哈希相同则跳过）
+        workers: 并发线程数
+        verbose: 是否逐个打印文件
+
+    Returns:
+        统计信息 {'images', 'labels', 'matched', 'copied', 'linked', 'skipped', 'failed'}
+    """
+    if mode not in SYNC_MODES:
+        raise ValueError(f"不支持的同步模式: {mode}（可选: {', '.join(SYNC_MODES)}）")
+
+    img_path = Path(image_dir)
+    lbl_path = Path(label_dir)
+    out_path = Path(output_dir)
+    stats = {'images': 0, 'labels': 0, 'matched': 0, 'copied': 0, 'linked': 0, 'skipped': 0, 'failed': 0}
 
     if not img_path.exists():
         print(f"错误: 图像目录不存在: {img_path}")
-        return
+        return stats
 
     if not lbl_path.exists():
         print(f"错误: 标签目录不存在: {lbl_path}")
-        return
+        return stats
 
     out_path.mkdir(parents=True, exist_ok=True)
 
     print(f"图像目录: {img_path}")
     print(f"标签目录: {lbl_path}")
-    print(f"输出目录: {out_path}\n")
+    print(f"输出目录: {out_path}")
+    print(f"同步模式: {mode}\n")
 
-    # 获取图像文件名（不含扩展名）
-    image_stems = set()
-    for file in img_path.iterdir():
-        if file.is_file() and file.suffix.lower() in IMAGE_EXTENSIONS:
-            image_stems.add(file.stem)
-
-    # 获取标签文件
-    label_files = {}
-    for file in lbl_path.iterdir():
-        if file.is_file() and file.suffix.lower() in LABEL_EXTENSIONS:
-            label_files[file.stem] = file
-
-    # 找到匹配的文件
-    matched_stems = image_stems & set(label_files.keys())
+    image_stems = _list_files(img_path, IMAGE_EXTENSIONS)
+    label_files = _list_files(lbl_path, LABEL_EXTENSIONS)
+    matched_stems = sorted(image_stems.keys() & label_files.keys())
+    stats.update(images=len(image_stems), labels=len(label_files), matched=len(matched_stems))
 
     print(f"图像文件: {len(image_stems)} 个")
     print(f"标签文件: {len(label_files)} 个")
@@ -55,22 +130,50 @@ def copy_matched_labels():
 
     if not matched_stems:
         print("没有找到匹配的文件")
-        return
+        return stats
 
-    # 复制匹配的标签文件
-    copied = 0
-    for stem in sorted(matched_stems):
-        src = label_files[stem]
-        dst = out_path / src.name
+    def task(stem):
+        name = label_files[stem]
         try:
-            shutil.copy2(src, dst)
-            print(f"✓ {src.name}")
-            copied += 1
+            return name, _sync_one(lbl_path / name, out_path / name, mode), None
         except Exception as e:
-            print(f"✗ {src.name} - {e}")
+            return name, 'failed', e
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for name, status, error in pool.map(task, matched_stems):
+            stats[status] += 1
+            if status == 'failed':
+                print(f"✗ {name} - {error}")
+            elif verbose and status != 'skipped':
+                print(f"✓ {name}")
+
+    print(f"\n完成: 复制 {stats['copied']} 个，硬链接 {stats['linked']} 个，"
+          f"未变化跳过 {stats['skipped']} 个，失败 {stats['failed']} 个")
+    return stats
+
+
+def copy_matched_labels():
+    """将与图像匹配的标签复制到输出目录（使用配置区域中的路径）"""
+    sync_matched_labels(IMAGE_DIR, LABEL_DIR, OUTPUT_DIR, mode='copy')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='将与图像匹配的标签同步到输出目录')
+    parser.add_argument('--images', type=str, default=IMAGE_DIR, help='图像目录（默认: 配置区域 IMAGE_DIR）')
+    parser.add_argument('--labels', type=str, default=LABEL_DIR, help='标签来源目录（默认: 配置区域 LABEL_DIR）')
+    parser.add_argument('--output', type=str, default=OUTPUT_DIR, help='输出目录（默认: 配置区域 OUTPUT_DIR）')
+    parser.add_argument('--mode', choices=SYNC_MODES, default='copy-if-changed',
+                        help='同步模式（默认: copy-if-changed）。hardlink 下目标与来源共用同一文件，'
+                             '本项目的标注与改类别工具都整文件替换（不会改到来源），'
+                             '但不要用其他工具原地编辑目标标签')
+    parser.add_argument('--workers', type=int, default=8, help='并发线程数（默认: 8）')
+    parser.add_argument('--quiet', action='store_true', help='不逐个打印文件')
+    args = parser.parse_args()
 
-    print(f"\n完成: 复制了 {copied} 个标签文件")
+    stats = sync_matched_labels(args.images, args.labels, args.output,
+                                mode=args.mode, workers=args.workers, verbose=not args.quiet)
+    return 1 if stats['failed'] else 0
 
 
 if __name__ == '__main__':
-    copy_matched_labels()
+    exit(main())
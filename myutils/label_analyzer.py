@@ -0,0 +1,432 @@
+"""
+YOLO标签列式索引与分析工具
+功能：
+1. 并行解析 stations_root 下所有 labels/（可选 pre_labels/）目录中的 YOLO 标签
+2. 存为列式数组（station / category / image / class / xywhn），保存为 .npz，可选导出 Parquet
+3. 按文件 mtime/size 增量更新：只重新解析新增或变化的标签文件，删除的文件自动剔除
+4. 基于索引毫秒级回答：类别分布、框尺寸/宽高比直方图、各场站标注密度
+
+示例:
+  python myutils/label_analyzer.py /path/to/stations
+  python myutils/label_analyzer.py /path/to/stations --by station --hist size --density
+  python myutils/label_analyzer.py /path/to/stations --dirs labels pre_labels --parquet labels.parquet
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+INDEX_VERSION = 1
+DEFAULT_INDEX_NAME = "_label_index.npz"
+_IGNORED_PARTS = {"det"}
+
+
+@dataclass
+class LabelIndex:
+    """列式标签索引
+
+    文件级列（长度 = 标签文件数）: files, file_mtime, file_size, file_station, file_category
+    框级列（长度 = 框数）: row_file, cls, xywhn
+    """
+
+    root: str
+    stations: np.ndarray          # 场站名表
+    categories: np.ndarray        # 类别目录名表
+    files: np.ndarray             # 标签文件相对路径
+    file_mtime: np.ndarray        # int64, ns
+    file_size: np.ndarray         # int64
+    file_station: np.ndarray      # int32 -> stations
+    file_category: np.ndarray     # int32 -> categories
+    row_file: np.ndarray          # int32 -> files
+    cls: np.ndarray               # int32
+    xywhn: np.ndarray             # float32 (N, 4)
+
+    @property
+    def num_files(self) -> int:
+        return len(self.files)
+
+    @property
+    def num_boxes(self) -> int:
+        return len(self.cls)
+
+    @property
+    def row_station(self) -> np.ndarray:
+        return self.file_station[self.row_file]
+
+    @property
+    def row_category(self) -> np.ndarray:
+        return self.file_category[self.row_file]
+
+    # ------------------------------------------------------------------ io
+    def save(self, path: Path) -> None:
+        tmp = Path(path).with_suffix(".tmp.npz")
+        np.savez(
+            tmp,
+            version=np.array(INDEX_VERSION),
+            root=np.array(self.root),
+            stations=self.stations,
+            categories=self.categories,
+            files=self.files,
+            file_mtime=self.file_mtime,
+            file_size=self.file_size,
+            file_station=self.file_station,
+            file_category=self.file_category,
+            row_file=self.row_file,
+            cls=self.cls,
+            xywhn=self.xywhn,
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["LabelIndex"]:
+        if not Path(path).exists():
+            return None
+        with np.load(path, allow_pickle=False) as data:
+            if int(data["version"]) != INDEX_VERSION:
+                return None
+            return cls(
+                root=str(data["root"]),
+                stations=data["stations"],
+                categories=data["categories"],
+                files=data["files"],
+                file_mtime=data["file_mtime"],
+                file_size=data["file_size"],
+                file_station=data["file_station"],
+                file_category=data["file_category"],
+                row_file=data["row_file"],
+                cls=data["cls"],
+                xywhn=data["xywhn"],
+            )
+
+    def to_dataframe(self):
+        """转换为 pandas DataFrame（需要 pandas）"""
+        import pandas as pd
+
+        return pd.DataFrame({
+            "station": self.stations[self.row_station],
+            "category": self.categories[self.row_category],
+            "image": np.char.rpartition(
+                np.char.rpartition(self.files[self.row_file].astype(str), "/")[:, 2], ".")[:, 0],
+            "class": self.cls,
+            "x": self.xywhn[:, 0],
+            "y": self.xywhn[:, 1],
+            "w": self.xywhn[:, 2],
+            "h": self.xywhn[:, 3],
+        })
+
+    # ------------------------------------------------------------- queries
+    def _mask(self, station: Optional[str] = None, category: Optional[str] = None,
+              class_id: Optional[int] = None) -> np.ndarray:
+        mask = np.ones(self.num_boxes, dtype=bool)
+        if station is not None:
+            codes = np.flatnonzero(self.stations == station)
+            mask &= np.isin(self.row_station, codes)
+        if category is not None:
+            codes = np.flatnonzero(self.categories == category)
+            mask &= np.isin(self.row_category, codes)
+        if class_id is not None:
+            mask &= self.cls == class_id
+        return mask
+
+    def class_distribution(self, by: Optional[str] = None, **filters) -> Dict:
+        """类别分布；by=None 返回 {class: count}，by='station'/'category' 返回 {name: {class: count}}"""
+        mask = self._mask(**filters)
+        classes = self.cls[mask]
+        if by is None:
+            ids, counts = np.unique(classes, return_counts=True)
+            return {int(i): int(c) for i, c in zip(ids, counts)}
+
+        if by == "station":
+            groups, names = self.row_station[mask], self.stations
+        elif by == "category":
+            groups, names = self.row_category[mask], self.categories
+        else:
+            raise ValueError(f"Unsupported group: {by} (expected 'station' or 'category')")
+
+        pairs, counts = np.unique(np.stack([groups, classes], axis=1), axis=0, return_counts=True)
+        result: Dict[str, Dict[int, int]] = {}
+        for (g, c), n in zip(pairs, counts):
+            result.setdefault(str(names[g]), {})[int(c)] = int(n)
+        return result
+
+    def box_size_histogram(self, bins: Sequence[float] = (0, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0),
+                           **filters) -> Tuple[np.ndarray, np.ndarray]:
+        """框尺寸直方图，尺寸定义为 sqrt(w*h)（相对整图）"""
+        xywhn = self.xywhn[self._mask(**filters)]
+        sizes = np.sqrt(np.clip(xywhn[:, 2] * xywhn[:, 3], 0, None))
+        return np.histogram(sizes, bins=np.asarray(bins, dtype=np.float64))
+
+    def aspect_histogram(self, bins: Sequence[float] = (0, 0.25, 0.5, 0.75, 1.0, 1.33, 2.0, 4.0, np.inf),
+                         **filters) -> Tuple[np.ndarray, np.ndarray]:
+        """框宽高比（w/h，归一化坐标）直方图"""
+        xywhn = self.xywhn[self._mask(**filters)]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            aspect = np.where(xywhn[:, 3] > 0, xywhn[:, 2] / xywhn[:, 3], np.inf)
+        return np.histogram(aspect, bins=np.asarray(bins, dtype=np.float64))
+
+    def station_density(self) -> Dict[str, Dict[str, float]]:
+        """各场站的标签文件数、框数、每图平均框数、空标签比例"""
+        boxes_per_file = np.bincount(self.row_file, minlength=self.num_files)
+        files_per_station = np.bincount(self.file_station, minlength=len(self.stations))
+        boxes_per_station = np.bincount(self.file_station, weights=boxes_per_file, minlength=len(self.stations))
+        empty_per_station = np.bincount(self.file_station, weights=(boxes_per_file == 0),
+                                        minlength=len(self.stations))
+        result = {}
+        for i, name in enumerate(self.stations):
+            n = int(files_per_station[i])
+            result[str(name)] = {
+                "images": n,
+                "boxes": int(boxes_per_station[i]),
+                "boxes_per_image": float(boxes_per_station[i] / n) if n else 0.0,
+                "empty_ratio": float(empty_per_station[i] / n) if n else 0.0,
+            }
+        return result
+
+
+# ---------------------------------------------------------------- building
+def _station_category(rel_dir: Path) -> Tuple[str, str]:
+    """由 labels 目录的相对路径推断 (场站, 类别)"""
+    parts = [p for p in rel_dir.parts[:-1] if p not in _IGNORED_PARTS]
+    if not parts:
+        return "", ""
+    station = parts[0]
+    category = parts[-1]
+    return station, category
+
+
+def _list_label_files(root: Path, dir_names: Sequence[str]) -> List[Tuple[str, int, int, str, str]]:
+    """一次 scandir 列出所有标签文件: (相对路径, mtime_ns, size, 场站, 类别)"""
+    entries = []
+    for dirpath, dirnames, _ in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d != "backup" and not d.startswith(".")]
+        path = Path(dirpath)
+        if path.name not in dir_names:
+            continue
+        rel_dir = path.relative_to(root)
+        station, category = _station_category(rel_dir)
+        with os.scandir(path) as it:
+            for entry in it:
+                if not entry.name.endswith(".txt") or entry.name.startswith("_") or not entry.is_file():
+                    continue
+                st = entry.stat()
+                entries.append(((rel_dir / entry.name).as_posix(), st.st_mtime_ns, st.st_size, station, category))
+    entries.sort()
+    return entries
+
+
+def _parse_label_text(text: str) -> Tuple[np.ndarray, np.ndarray]:
+    tokens = text.split()
+    lines = text.count("\n") + (0 if text.endswith("\n") else 1)
+    # 快速路径：每行恰好 5 列（仅凭 token 数能被 5 整除不够，6 列的行也可能凑成 5 的倍数）
+    if tokens and len(tokens) == 5 * lines:
+        try:
+            arr = np.array(tokens, dtype=np.float32).reshape(-1, 5)
+            return arr[:, 0].astype(np.int32), arr[:, 1:5]
+        except ValueError:
+            pass
+
+    # 行长度不一致（带置信度/分割点等）时逐行取前 5 列
+    rows = []
+    for line in text.splitlines():
+        parts = line.split()
+        if len(parts) < 5:
+            continue
+        try:
+            rows.append([float(v) for v in parts[:5]])
+        except ValueError:
+            continue
+    if not rows:
+        return np.zeros(0, dtype=np.int32), np.zeros((0, 4), dtype=np.float32)
+    arr = np.asarray(rows, dtype=np.float32)
+    return arr[:, 0].astype(np.int32), arr[:, 1:5]
+
+
+def _parse_chunk(args: Tuple[str, List[Tuple[int, str]]]) -> List[Tuple[int, np.ndarray, np.ndarray]]:
+    root, items = args
+    out = []
+    for file_idx, rel in items:
+        try:
+            with open(os.path.join(root, rel), "r", encoding="utf-8") as f:
+                cls, xywhn = _parse_label_text(f.read())
+        except (OSError, UnicodeDecodeError):
+            cls, xywhn = np.zeros(0, dtype=np.int32), np.zeros((0, 4), dtype=np.float32)
+        out.append((file_idx, cls, xywhn))
+    return out
+
+
+def build_index(
+    root: Path,
+    index_path: Optional[Path] = None,
+    dir_names: Sequence[str] = ("labels",),
+    workers: Optional[int] = None,
+    rebuild: bool = False,
+    chunk_size: int = 512,
+) -> Tuple[LabelIndex, Dict[str, int]]:
+    """
+    构建或增量更新标签索引
+
+    Returns:
+        (索引, 统计 {'files', 'reused', 'parsed', 'removed'})
+    """
+    root = Path(root).resolve()
+    index_path = Path(index_path) if index_path else root / DEFAULT_INDEX_NAME
+    old = None if rebuild else LabelIndex.load(index_path)
+    if old is not None and old.root != str(root):
+        old = None
+
+    listing = _list_label_files(root, tuple(dir_names))
+    files = np.array([e[0] for e in listing], dtype=str)
+    mtimes = np.array([e[1] for e in listing], dtype=np.int64)
+    sizes = np.array([e[2] for e in listing], dtype=np.int64)
+    station_names, file_station = np.unique(np.array([e[3] for e in listing], dtype=str), return_inverse=True)
+    category_names, file_category = np.unique(np.array([e[4] for e in listing], dtype=str), return_inverse=True)
+
+    # 旧索引中 (路径, mtime, size) 均未变化的文件直接复用其行
+    reuse_old_idx = np.full(len(files), -1, dtype=np.int64)
+    if old is not None and old.num_files:
+        order = np.argsort(old.files)
+        pos = np.searchsorted(old.files[order], files)
+        pos = np.clip(pos, 0, len(order) - 1)
+        cand = order[pos]
+        same = (old.files[cand] == files) & (old.file_mtime[cand] == mtimes) & (old.file_size[cand] == sizes)
+        reuse_old_idx[same] = cand[same]
+
+    cls_parts: List[np.ndarray] = []
+    xywhn_parts: List[np.ndarray] = []
+    row_file_parts: List[np.ndarray] = []
+
+    reused = int((reuse_old_idx >= 0).sum())
+    if old is not None and reused:
+        old_to_new = np.full(old.num_files, -1, dtype=np.int64)
+        kept = np.flatnonzero(reuse_old_idx >= 0)
+        old_to_new[reuse_old_idx[kept]] = kept
+        new_file = old_to_new[old.row_file]
+        keep_rows = new_file >= 0
+        cls_parts.append(old.cls[keep_rows])
+        xywhn_parts.append(old.xywhn[keep_rows])
+        row_file_parts.append(new_file[keep_rows].astype(np.int32))
+
+    to_parse = [(int(i), str(files[i])) for i in np.flatnonzero(reuse_old_idx < 0)]
+    chunks = [(str(root), to_parse[i:i + chunk_size]) for i in range(0, len(to_parse), chunk_size)]
+    if len(chunks) > 1 and (workers is None or workers > 1):
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parsed_chunks = list(pool.map(_parse_chunk, chunks))
+    else:
+        parsed_chunks = [_parse_chunk(c) for c in chunks]
+
+    for parsed in parsed_chunks:
+        for file_idx, cls, xywhn in parsed:
+            if len(cls):
+                cls_parts.append(cls)
+                xywhn_parts.append(xywhn)
+                row_file_parts.append(np.full(len(cls), file_idx, dtype=np.int32))
+
+    if cls_parts:
+        cls_all = np.concatenate(cls_parts)
+        xywhn_all = np.concatenate(xywhn_parts)
+        row_file_all = np.concatenate(row_file_parts)
+        order = np.argsort(row_file_all, kind="stable")
+        cls_all, xywhn_all, row_file_all = cls_all[order], xywhn_all[order], row_file_all[order]
+    else:
+        cls_all = np.zeros(0, dtype=np.int32)
+        xywhn_all = np.zeros((0, 4), dtype=np.float32)
+        row_file_all = np.zeros(0, dtype=np.int32)
+
+    index = LabelIndex(
+        root=str(root),
+        stations=station_names,
+        categories=category_names,
+        files=files,
+        file_mtime=mtimes,
+        file_size=sizes,
+        file_station=file_station.astype(np.int32),
+        file_category=file_category.astype(np.int32),
+        row_file=row_file_all,
+        cls=cls_all,
+        xywhn=xywhn_all,
+    )
+    index.save(index_path)
+
+    stats = {
+        "files": len(files),
+        "reused": reused,
+        "parsed": len(to_parse),
+        "removed": int(np.isin(old.files, files, invert=True).sum()) if old is not None else 0,
+    }
+    return index, stats
+
+
+def _print_histogram(title: str, counts: np.ndarray, edges: np.ndarray) -> None:
+    total = int(counts.sum())
+    print(f"\n{title}（共 {total} 个框）:")
+    for i, c in enumerate(counts):
+        pct = c / total * 100 if total else 0
+        print(f"  [{edges[i]:>6.3g}, {edges[i + 1]:>6.3g})  {int(c):>8}  {pct:6.2f}%")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='YOLO标签列式索引与分析')
+    parser.add_argument('root', type=str, help='stations_root 或任意包含 labels/ 的根目录')
+    parser.add_argument('--index', type=str, default=None, help=f'索引文件路径（默认: <root>/{DEFAULT_INDEX_NAME}）')
+    parser.add_argument('--dirs', nargs='+', default=['labels'], help='要索引的标签目录名（默认: labels）')
+    parser.add_argument('--workers', type=int, default=None, help='并行解析进程数（默认: CPU 核数）')
+    parser.add_argument('--rebuild', action='store_true', help='忽略已有索引，全部重新解析')
+    parser.add_argument('--by', choices=['station', 'category'], default=None, help='按场站/类别分组统计类别分布')
+    parser.add_argument('--station', type=str, default=None, help='只统计指定场站')
+    parser.add_argument('--category', type=str, default=None, help='只统计指定类别目录')
+    parser.add_argument('--hist', choices=['size', 'aspect'], action='append', default=None,
+                        help='输出框尺寸/宽高比直方图，可重复')
+    parser.add_argument('--density', action='store_true', help='输出各场站标注密度')
+    parser.add_argument('--parquet', type=str, default=None, help='导出为 Parquet（需要 pandas + pyarrow）')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index, stats = build_index(
+        Path(args.root),
+        index_path=Path(args.index) if args.index else None,
+        dir_names=args.dirs,
+        workers=args.workers,
+        rebuild=args.rebuild,
+    )
+    print(f"索引完成: {stats['files']} 个标签文件（复用 {stats['reused']}，解析 {stats['parsed']}，"
+          f"移除 {stats['removed']}），{index.num_boxes} 个框，耗时 {time.perf_counter() - start:.2f}s")
+
+    filters = {'station': args.station, 'category': args.category}
+    query_start = time.perf_counter()
+    distribution = index.class_distribution(by=args.by, **filters)
+    print("\n类别分布:")
+    if args.by is None:
+        total = sum(distribution.values())
+        for class_id, count in sorted(distribution.items()):
+            print(f"  类别 {class_id:<6} {count:>8}  {count / total * 100 if total else 0:6.2f}%")
+    else:
+        for name, dist in sorted(distribution.items()):
+            print(f"  {name}: {dict(sorted(dist.items()))}")
+
+    for kind in args.hist or []:
+        if kind == 'size':
+            _print_histogram("框尺寸 sqrt(w*h) 直方图", *index.box_size_histogram(**filters))
+        else:
+            _print_histogram("框宽高比 w/h 直方图", *index.aspect_histogram(**filters))
+
+    if args.density:
+        print("\n各场站标注密度:")
+        print(f"  {'场站':<24} {'图像数':>8} {'框数':>8} {'框/图':>8} {'空标签比例':>10}")
+        for name, d in sorted(index.station_density().items()):
+            print(f"  {name:<24} {d['images']:>8} {d['boxes']:>8} {d['boxes_per_image']:>8.2f} "
+                  f"{d['empty_ratio'] * 100:>9.1f}%")
+    print(f"\n查询耗时: {(time.perf_counter() - query_start) * 1000:.1f} ms")
+
+    if args.parquet:
+        index.to_dataframe().to_parquet(args.parquet, index=False)
+        print(f"已导出 Parquet: {args.parquet}")
+
+
+if __name__ == '__main__':
+    main()
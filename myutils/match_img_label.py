@@ -1,8 +1,37 @@
 import os
+import json
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Tuple, Set
+from typing import Dict, List, Optional, Tuple, Set
 import argparse
 
+DEFAULT_CACHE_NAME = '_match_cache.json'
+DEFAULT_DIR_PAIRS = [('images', 'labels'), ('pre_images', 'pre_labels')]
+
+
+def list_file_stems(directory: Path, extensions: List[str]) -> Dict[str, str]:
+    """
+    List files of a directory with a single scandir pass.
+    
+    Args:
+        directory: Path to the directory
+        extensions: List of valid file extensions (e.g., ['.jpg', '.png'])
+    
+    Returns:
+        Mapping of file stem -> file name
+    """
+    files = {}
+    exts = {e.lower() for e in extensions}
+    try:
+        with os.scandir(directory) as it:
+            for entry in it:
+                stem, ext = os.path.splitext(entry.name)
+                if ext.lower() in exts and entry.is_file():
+                    files.setdefault(stem, entry.name)
+    except FileNotFoundError:
+        pass
+    return files
+
 
 def get_file_stems(directory: Path, extensions: List[str]) -> Set[str]:
     """
@@ -15,15 +44,7 @@ def get_file_stems(directory: Path, extensions: List[str]) -> Set[str]:
     Returns:
         Set of file stems
     """
-    file_stems = set()
-    if not directory.exists():
-        return file_stems
-    
-    for file in directory.iterdir():
-        if file.is_file() and file.suffix.lower() in extensions:
-            file_stems.add(file.stem)
-    
-    return file_stems
+    return set(list_file_stems(directory, extensions))
 
 
 def check_image_label_correspondence(
@@ -65,8 +86,10 @@ def check_image_label_correspondence(
     
     # Get file stems
     print(f"正在扫描目录...")
-    image_stems = get_file_stems(images_dir, image_extensions)
-    label_stems = get_file_stems(labels_dir, label_extensions)
+    image_files = list_file_stems(images_dir, image_extensions)
+    label_files = list_file_stems(labels_dir, label_extensions)
+    image_stems = set(image_files)
+    label_stems = set(label_files)
     
     # Find mismatches
     images_without_labels = sorted(image_stems - label_stems)
@@ -88,13 +111,7 @@ def check_image_label_correspondence(
         print(f"❌ 缺少标签的图像 (共 {len(images_without_labels)} 个):")
         display_count = min(max_display, len(images_without_labels))
         for i, stem in enumerate(images_without_labels[:display_count], 1):
-            # Find the actual file with extension
-            actual_file = None
-            for ext in image_extensions:
-                if (images_dir / f"{stem}{ext}").exists():
-                    actual_file = f"{stem}{ext}"
-                    break
-            print(f"  {i}. {actual_file or stem}")
+            print(f"  {i}. {image_files.get(stem, stem)}")
         
         if len(images_without_labels) > max_display:
             print(f"  ... 还有 {len(images_without_labels) - max_display} 个文件未显示")
@@ -107,13 +124,7 @@ def check_image_label_correspondence(
         print(f"❌ 缺少图像的标签 (共 {len(labels_without_images)} 个):")
         display_count = min(max_display, len(labels_without_images))
         for i, stem in enumerate(labels_without_images[:display_count], 1):
-            # Find the actual file with extension
-            actual_file = None
-            for ext in label_extensions:
-                if (labels_dir / f"{stem}{ext}").exists():
-                    actual_file = f"{stem}{ext}"
-                    break
-            print(f"  {i}. {actual_file or stem}")
+            print(f"  {i}. {label_files.get(stem, stem)}")
         
         if len(labels_without_images) > max_display:
             print(f"  ... 还有 {len(labels_without_images) - max_display} 个文件未显示")
@@ -187,6 +198,7 @@ def delete_images_without_labels(
     root = Path(root_path)
     images_dir = root / 'images'
     
+    image_files = list_file_stems(images_dir, image_extensions)
     deleted_count = 0
     failed_deletions = []
     
@@ -198,13 +210,8 @@ def delete_images_without_labels(
     print(f"{'='*60}\n")
     
     for stem in images_without_labels:
-        # Find the actual file with extension
-        file_to_delete = None
-        for ext in image_extensions:
-            file_path = images_dir / f"{stem}{ext}"
-            if file_path.exists():
-                file_to_delete = file_path
-                break
+        name = image_files.get(stem)
+        file_to_delete = images_dir / name if name else None
         
         if file_to_delete:
             if dry_run:
@@ -232,6 +239,181 @@ def delete_images_without_labels(
     return deleted_count
 
 
+def find_dir_pairs(root_path: str, dir_pairs: List[Tuple[str, str]] = None) -> List[Tuple[Path, Path]]:
+    """
+    Find every (images, labels) directory pair under a stations root.
+    
+    Args:
+        root_path: Stations root (or any directory tree)
+        dir_pairs: Sibling directory name pairs to look for (default: images/labels, pre_images/pre_labels)
+    
+    Returns:
+        Sorted list of (images_dir, labels_dir)
+    """
+    if dir_pairs is None:
+        dir_pairs = DEFAULT_DIR_PAIRS
+    pair_names = {name for pair in dir_pairs for name in pair}
+    
+    pairs = []
+    for dirpath, dirnames, _ in os.walk(root_path):
+        present = set(dirnames)
+        for image_name, label_name in dir_pairs:
+            if image_name in present and label_name in present:
+                pairs.append((Path(dirpath) / image_name, Path(dirpath) / label_name))
+        # images/labels themselves never contain further pairs
+        dirnames[:] = [d for d in dirnames if d not in pair_names and d != 'backup' and not d.startswith('.')]
+    return sorted(pairs)
+
+
+def check_dir_pair(
+    images_dir: Path,
+    labels_dir: Path,
+    image_extensions: List[str],
+    label_extensions: List[str]
+) -> Dict:
+    """
+    Check one images/labels pair from a single scandir listing per directory.
+    
+    Returns:
+        Dict with counts and the unmatched file names
+    """
+    image_files = list_file_stems(images_dir, image_extensions)
+    label_files = list_file_stems(labels_dir, label_extensions)
+    return {
+        'images': len(image_files),
+        'labels': len(label_files),
+        'matched': len(image_files.keys() & label_files.keys()),
+        'images_without_labels': sorted(image_files[s] for s in image_files.keys() - label_files.keys()),
+        'labels_without_images': sorted(label_files[s] for s in label_files.keys() - image_files.keys()),
+    }
+
+
+def _dir_mtime(path: Path) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def check_tree(
+    root_path: str,
+    image_extensions: List[str],
+    label_extensions: List[str],
+    dir_pairs: List[Tuple[str, str]] = None,
+    workers: int = 8,
+    cache_path: Optional[Path] = None
+) -> List[Dict]:
+    """
+    Check every images/labels pair under a stations root concurrently.
+    
+    A pair is only re-listed when the mtime of either directory changed (adding,
+    removing or renaming files updates the directory mtime), otherwise the cached
+    result is reused.
+    
+    Args:
+        root_path: Stations root
+        image_extensions: Image file extensions
+        label_extensions: Label file extensions
+        dir_pairs: Sibling directory name pairs (default: images/labels, pre_images/pre_labels)
+        workers: Number of concurrent checks
+        cache_path: JSON cache file; None disables caching
+    
+    Returns:
+        List of per-pair results (with 'images_dir', 'labels_dir', 'cached' keys added)
+    """
+    root = Path(root_path)
+    ext_key = ','.join(sorted(e.lower() for e in image_extensions)) + '|' + \
+        ','.join(sorted(e.lower() for e in label_extensions))
+    
+    cache = {}
+    if cache_path is not None and cache_path.exists():
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('extensions') == ext_key:
+                cache = data.get('pairs', {})
+        except (OSError, ValueError):
+            cache = {}
+    
+    def check(pair: Tuple[Path, Path]) -> Tuple[str, Dict]:
+        images_dir, labels_dir = pair
+        key = f"{images_dir.relative_to(root).as_posix()}|{labels_dir.relative_to(root).as_posix()}"
+        stamp = [_dir_mtime(images_dir), _dir_mtime(labels_dir)]
+        entry = cache.get(key)
+        if entry is not None and entry.get('mtime') == stamp:
+            result, cached = entry['result'], True
+        else:
+            result, cached = check_dir_pair(images_dir, labels_dir, image_extensions, label_extensions), False
+        return key, {'mtime': stamp, 'result': result, 'cached': cached,
+                     'images_dir': str(images_dir), 'labels_dir': str(labels_dir)}
+    
+    pairs = find_dir_pairs(root_path, dir_pairs)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        checked = list(pool.map(check, pairs))
+    
+    if cache_path is not None:
+        payload = {
+            'extensions': ext_key,
+            'pairs': {key: {'mtime': e['mtime'], 'result': e['result']} for key, e in checked},
+        }
+        tmp = cache_path.with_name(cache_path.name + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False)
+        os.replace(tmp, cache_path)
+    
+    return [dict(e['result'], images_dir=e['images_dir'], labels_dir=e['labels_dir'], cached=e['cached'])
+            for _, e in checked]
+
+
+def print_tree_report(results: List[Dict], max_display: int = 10) -> None:
+    """Print per-pair mismatch summary for tree mode."""
+    total_images = sum(r['images'] for r in results)
+    total_labels = sum(r['labels'] for r in results)
+    total_matched = sum(r['matched'] for r in results)
+    cached = sum(1 for r in results if r['cached'])
+    
+    print(f"\n{'='*60}")
+    print(f"检查结果统计 (共 {len(results)} 组目录，缓存命中 {cached} 组):")
+    print(f"{'='*60}")
+    print(f"图像文件总数: {total_images}")
+    print(f"标签文件总数: {total_labels}")
+    print(f"匹配的文件数: {total_matched}")
+    print(f"{'='*60}\n")
+    
+    for r in results:
+        missing_labels = r['images_without_labels']
+        missing_images = r['labels_without_images']
+        if not missing_labels and not missing_images:
+            continue
+        print(f"❌ {r['images_dir']}")
+        print(f"   图像 {r['images']} / 标签 {r['labels']} / 匹配 {r['matched']}")
+        for title, names in (('缺少标签的图像', missing_labels), ('缺少图像的标签', missing_images)):
+            if not names:
+                continue
+            shown = ', '.join(names[:max_display])
+            more = f" ... 还有 {len(names) - max_display} 个" if len(names) > max_display else ''
+            print(f"   {title} ({len(names)}): {shown}{more}")
+        print()
+
+
+def save_tree_report(root_path: str, results: List[Dict], output_file: str = "mismatch_report.txt"):
+    """Save the full tree-mode mismatch report."""
+    output_path = Path(root_path) / output_file
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write("图像与标签匹配检查报告（全目录树）\n")
+        f.write("=" * 60 + "\n\n")
+        for r in results:
+            f.write(f"{r['images_dir']}  <->  {r['labels_dir']}\n")
+            f.write(f"图像 {r['images']} / 标签 {r['labels']} / 匹配 {r['matched']}\n")
+            for title, names in (('缺少标签的图像', r['images_without_labels']),
+                                 ('缺少图像的标签', r['labels_without_images'])):
+                f.write(f"{title} (共 {len(names)} 个):\n")
+                for name in names:
+                    f.write(f"  {name}\n")
+            f.write("-" * 60 + "\n")
+    print(f"📝 完整报告已保存至: {output_path}")
+
+
 def main():
     parser = argparse.ArgumentParser(
         description='检查图像和标签文件的对应关系',
@@ -244,6 +426,7 @@ def main():
   python match_img_label.py /path/to/dataset --image-ext .jpg .png --label-ext .txt
   python match_img_label.py /path/to/dataset --delete-unmatched  # 预览删除
   python match_img_label.py /path/to/dataset --delete-unmatched --delete  # 执行删除
+  python match_img_label.py /path/to/stations --tree --workers 16  # 检查整个场站目录树
         """
     )
     
@@ -255,9 +438,36 @@ def main():
     parser.add_argument('--report-name', type=str, default='mismatch_report.txt', help='报告文件名 (默认: mismatch_report.txt)')
     parser.add_argument('--delete-unmatched', action='store_true', help='删除缺少标签的图像文件')
     parser.add_argument('--delete', action='store_true', help='确认执行删除操作 (配合 --delete-unmatched 使用)')
+    parser.add_argument('--tree', action='store_true', help='全目录树模式: root_path 为场站根目录，并发检查所有 images/labels 目录对')
+    parser.add_argument('--workers', type=int, default=8, help='全目录树模式的并发数 (默认: 8)')
+    parser.add_argument('--cache-file', type=str, default=None, help=f'全目录树模式的缓存文件 (默认: <root>/{DEFAULT_CACHE_NAME})')
+    parser.add_argument('--no-cache', action='store_true', help='全目录树模式下不读写缓存')
     
     args = parser.parse_args()
     
+    if args.tree:
+        if args.delete_unmatched:
+            print("错误: 全目录树模式不支持 --delete-unmatched，请对单个目录执行")
+            return 2
+        cache_path = None
+        if not args.no_cache:
+            cache_path = Path(args.cache_file) if args.cache_file else Path(args.root_path) / DEFAULT_CACHE_NAME
+        results = check_tree(
+            root_path=args.root_path,
+            image_extensions=args.image_ext,
+            label_extensions=args.label_ext,
+            workers=args.workers,
+            cache_path=cache_path
+        )
+        print_tree_report(results, max_display=args.max_display)
+        if args.save_report:
+            save_tree_report(args.root_path, results, output_file=args.report_name)
+        if any(r['images_without_labels'] or r['labels_without_images'] for r in results):
+            print("⚠️  发现不匹配的文件")
+            return 1
+        print("✅ 所有文件都匹配成功!")
+        return 0
+    
     # Check correspondence
     images_without_labels, labels_without_images = check_image_label_correspondence(
         root_path=args.root_path,
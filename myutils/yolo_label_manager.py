@@ -4,12 +4,31 @@ YOLO标签管理工具
 1. 读取指定路径下的所有YOLO格式标签文件（.txt）
 2. 统计所有类别及其数量
 3. 可选择性地修改指定类别标签
+4. 批量模式：按映射文件并行重映射整棵目录树下所有 labels/ 中的类别ID，
+   只记录真正被修改的文件到可回滚的日志（journal）
+
+批量模式示例:
+  python myutils/yolo_label_manager.py --root /path/to/stations --mapping mapping.yaml --workers 16
+  python myutils/yolo_label_manager.py --revert /path/to/stations/_remap_journal_20260101_120000.jsonl.gz
 """
 
+import argparse
+import gzip
+import hashlib
+import json
 import os
+import sys
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from pathlib import Path
 from collections import Counter
-from typing import Dict, List, Set, Tuple
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.utils import atomic_write_text
 
 
 class YOLOLabelManager:
@@ -119,12 +138,6 @@ class YOLOLabelManager:
                 with open(label_file, 'r', encoding='utf-8') as f:
                     lines = f.readlines()
                 
-                # 备份原文件
-                if backup:
-                    backup_file = backup_dir / label_file.name
-                    with open(backup_file, 'w', encoding='utf-8') as f:
-                        f.writelines(lines)
-                
                 # 修改标签
                 new_lines = []
                 file_modified = False
@@ -152,10 +165,13 @@ class YOLOLabelManager:
                     else:
                         new_lines.append(line + '\n')
                 
-                # 写回文件
+                # 写回文件（只备份真正被修改的文件）
                 if file_modified:
-                    with open(label_file, 'w', encoding='utf-8') as f:
-                        f.writelines(new_lines)
+                    if backup:
+                        backup_file = backup_dir / label_file.name
+                        with open(backup_file, 'w', encoding='utf-8') as f:
+                            f.writelines(lines)
+                    atomic_write_text(str(label_file), ''.join(new_lines))
                     modified_files += 1
                     
             except Exception as e:
@@ -164,6 +180,204 @@ class YOLOLabelManager:
         return modified_files, modified_objects
 
 
+def load_mapping_file(mapping_path: str) -> Dict[int, int]:
+    """
+    读取类别映射文件
+
+    支持 YAML/JSON 映射（{原类别ID: 新类别ID}），或每行 "原类别ID 新类别ID" 的文本（# 开头为注释）。
+    """
+    path = Path(mapping_path)
+    text = path.read_text(encoding='utf-8')
+
+    if path.suffix.lower() in ('.yaml', '.yml', '.json'):
+        if path.suffix.lower() == '.json':
+            data = json.loads(text)
+        else:
+            import yaml
+            data = yaml.safe_load(text)
+        if not isinstance(data, dict):
+            raise ValueError(f"映射文件格式错误（应为映射）: {path}")
+        return {int(k): int(v) for k, v in data.items()}
+
+    mapping = {}
+    for lineno, line in enumerate(text.splitlines(), 1):
+        line = line.split('#', 1)[0].strip()
+        if not line:
+            continue
+        parts = line.replace('->', ' ').replace(':', ' ').split()
+        if len(parts) != 2:
+            raise ValueError(f"映射文件第 {lineno} 行格式错误: {line}")
+        mapping[int(parts[0])] = int(parts[1])
+    return mapping
+
+
+def find_label_dirs(root: Path, dir_names: Tuple[str, ...] = ('labels',)) -> List[Path]:
+    """递归查找 root 下所有名为 dir_names 的标签目录（跳过 backup 目录）"""
+    found = []
+    for dirpath, dirnames, _ in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d != 'backup' and not d.startswith('.')]
+        if Path(dirpath).name in dir_names:
+            found.append(Path(dirpath))
+    return sorted(found)
+
+
+def _remap_text(text: str, mapping: Dict[int, int]) -> Tuple[Optional[str], int]:
+    """返回 (新内容, 修改的对象数)；内容无变化时新内容为 None"""
+    changed = 0
+    out = []
+    for line in text.splitlines(keepends=True):
+        stripped = line.strip()
+        parts = stripped.split()
+        if len(parts) >= 5:
+            try:
+                class_id = int(parts[0])
+            except ValueError:
+                out.append(line)
+                continue
+            if class_id in mapping and mapping[class_id] != class_id:
+                parts[0] = str(mapping[class_id])
+                ending = line[len(line.rstrip('\r\n')):]  # 保留原换行符（LF / CRLF）
+                out.append(' '.join(parts) + ending)
+                changed += 1
+                continue
+        out.append(line)
+    return (''.join(out) if changed else None), changed
+
+
+def _read_raw_text(path: Path) -> str:
+    """按原样读取文本（不转换换行符），使改写与回滚都能逐字节保留 CRLF"""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        return f.read()
+
+
+def _sha1(text: str) -> str:
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def batch_remap_labels(
+    root: Path,
+    mapping: Dict[int, int],
+    workers: int = 8,
+    journal_path: Optional[Path] = None,
+    dry_run: bool = False,
+    dir_names: Tuple[str, ...] = ('labels',),
+) -> Dict[str, object]:
+    """
+    非交互式批量重映射类别ID
+
+    - 递归处理 root 下每个 labels/ 目录中的 .txt 文件，线程池并行
+    - 每个文件先读入、在内存中改写；只有内容发生变化的文件才会被写回（原子替换）
+    - 被修改文件的原内容写入一个 gzip 压缩的 JSONL 日志，可用 revert_remap_journal 回滚
+
+    Returns:
+        统计信息字典
+    """
+    root = Path(root)
+    label_files = [p for d in find_label_dirs(root, dir_names) for p in d.glob('*.txt')]
+
+    if journal_path is None:
+        journal_path = root / f"_remap_journal_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl.gz"
+
+    journal_lock = threading.Lock()
+    journal = None if dry_run else gzip.open(journal_path, 'wt', encoding='utf-8')
+    stats = Counter()
+
+    def process(label_file: Path) -> None:
+        try:
+            original = _read_raw_text(label_file)
+            new_text, changed = _remap_text(original, mapping)
+            if new_text is None:
+                return
+            if not dry_run:
+                record = {
+                    'path': str(label_file.resolve()),
+                    'original': original,
+                    'new_sha1': _sha1(new_text),
+                }
+                # 先落盘日志，再替换文件，保证中途中断也能回滚
+                with journal_lock:
+                    journal.write(json.dumps(record, ensure_ascii=False) + '\n')
+                    journal.flush()
+                atomic_write_text(str(label_file), new_text, newline='')
+            with journal_lock:
+                stats['modified_files'] += 1
+                stats['modified_objects'] += changed
+        except Exception as e:
+            print(f"处理文件 {label_file} 时出错: {e}")
+            with journal_lock:
+                stats['errors'] += 1
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            list(pool.map(process, label_files))
+    finally:
+        if journal is not None:
+            journal.close()
+
+    if not dry_run and stats['modified_files'] == 0:
+        Path(journal_path).unlink(missing_ok=True)
+        journal_path = None
+
+    return {
+        'scanned_files': len(label_files),
+        'modified_files': stats['modified_files'],
+        'modified_objects': stats['modified_objects'],
+        'errors': stats['errors'],
+        'journal': str(journal_path) if journal_path and not dry_run else None,
+    }
+
+
+def _read_journal(journal_path: Path) -> Iterator[dict]:
+    """
+    逐条读取回滚日志
+
+    重映射进程中途被结束时，gzip 流没有结束标记，最后一条记录也可能只写了一半；
+    此时读到最后一条完整记录为止，并提示日志不完整，而不是抛出异常。
+    """
+    truncated = False
+    with gzip.open(journal_path, 'rt', encoding='utf-8') as f:
+        try:
+            for line in f:
+                if not line.strip():
+                    continue
+                if not line.endswith('\n'):
+                    truncated = True  # 写了一半的最后一条记录
+                    break
+                yield json.loads(line)
+        except (EOFError, gzip.BadGzipFile, zlib.error):
+            truncated = True
+    if truncated:
+        print(f"警告: 日志不完整（重映射中途被中断），已按其中完整的记录回滚: {journal_path}")
+
+
+def revert_remap_journal(journal_path: Path, force: bool = False) -> Tuple[int, int]:
+    """
+    按日志回滚批量重映射
+
+    默认只回滚自重映射后未再被修改过的文件（比对 new_sha1），force=True 时强制回滚。
+    中断的重映射留下的不完整日志同样可以回滚。
+
+    Returns:
+        (回滚的文件数, 跳过的文件数)
+    """
+    reverted = 0
+    skipped = 0
+    for record in _read_journal(journal_path):
+        path = Path(record['path'])
+        if not force:
+            try:
+                current = _read_raw_text(path)
+            except FileNotFoundError:
+                current = None
+            if current is None or _sha1(current) != record['new_sha1']:
+                print(f"跳过（重映射后已被修改或已删除）: {path}")
+                skipped += 1
+                continue
+        atomic_write_text(str(path), record['original'], newline='')
+        reverted += 1
+    return reverted, skipped
+
+
 def main(label_path: str = None) -> None:
     """主函数"""
     print("="*60)
@@ -271,9 +485,60 @@ def main(label_path: str = None) -> None:
     print("\n程序结束")
 
 
+def cli() -> None:
+    """命令行入口：无 --root/--revert 时进入原有的交互模式"""
+    parser = argparse.ArgumentParser(description='YOLO标签管理工具')
+    parser.add_argument('label_path', nargs='?', default=r'F:\code\changzhan\万胜永\data\switch\det\labels',
+                        help='交互模式：标签目录路径')
+    parser.add_argument('--root', type=str, default=None, help='批量模式：递归处理该目录下所有 labels/ 目录')
+    parser.add_argument('--mapping', type=str, default=None,
+                        help='批量模式：映射文件（YAML/JSON 或每行 "原ID 新ID"）')
+    parser.add_argument('--workers', type=int, default=8, help='批量模式：并行线程数（默认: 8）')
+    parser.add_argument('--journal', type=str, default=None,
+                        help='批量模式：回滚日志路径（默认: <root>/_remap_journal_<时间>.jsonl.gz）')
+    parser.add_argument('--dir-name', action='append', default=None,
+                        help='批量模式：要处理的标签目录名，可重复（默认: labels）')
+    parser.add_argument('--dry-run', action='store_true', help='批量模式：只统计，不写入')
+    parser.add_argument('--revert', type=str, default=None, help='按日志回滚一次批量重映射')
+    parser.add_argument('--force', action='store_true', help='回滚时不检查文件是否已被再次修改')
+    args = parser.parse_args()
+
+    if args.revert:
+        reverted, skipped = revert_remap_journal(Path(args.revert), force=args.force)
+        print(f"回滚完成: 恢复 {reverted} 个文件，跳过 {skipped} 个文件")
+        return
+
+    if args.root:
+        if not args.mapping:
+            parser.error('--root 需要同时指定 --mapping')
+        mapping = load_mapping_file(args.mapping)
+        print(f"映射关系: {mapping}")
+        result = batch_remap_labels(
+            Path(args.root),
+            mapping,
+            workers=args.workers,
+            journal_path=Path(args.journal) if args.journal else None,
+            dry_run=args.dry_run,
+            dir_names=tuple(args.dir_name or ['labels']),
+        )
+        print("="*60)
+        print("批量修改完成！" if not args.dry_run else "预览完成（未写入）")
+        print("="*60)
+        print(f"扫描的文件数: {result['scanned_files']}")
+        print(f"修改的文件数: {result['modified_files']}")
+        print(f"修改的对象数: {result['modified_objects']}")
+        if result['errors']:
+            print(f"出错的文件数: {result['errors']}")
+        if result['journal']:
+            print(f"回滚日志: {result['journal']}")
+        return
+
+    main(label_path=args.label_path)
+
+
 if __name__ == "__main__":
     try:
-        main(label_path=r'F:\code\changzhan\万胜永\data\switch\det\labels')
+        cli()
     except KeyboardInterrupt:
         print("\n\n程序被用户中断")
     except Exception as e:
@@ -38,12 +38,27 @@ def main():
                        help='Path to config file')
     parser.add_argument('--conf-threshold', type=float, default=None,
                        help='Confidence threshold (overrides config)')
+    parser.add_argument('--metrics-json', type=str, default=None,
+                       help='Write the timing/throughput summary as JSON')
+    parser.add_argument('--prometheus-textfile', type=str, default=None,
+                       help='Optional Prometheus textfile-collector output')
+    parser.add_argument('--profile', action='store_true',
+                       help='Run a sampling profiler and write collapsed stacks (flamegraph format)')
+    parser.add_argument('--profile-dir', type=str, default=None,
+                       help='Where to write .folded profiles (default: logs/profiles/<timestamp>)')
+    parser.add_argument('--profile-interval-ms', type=float, default=5.0,
+                       help='Sampling interval of --profile in milliseconds (default: 5)')
+    parser.add_argument('--profile-top', type=int, default=20,
+                       help='Number of hotspot frames printed with --profile (default: 20)')
     
     args = parser.parse_args()
 
     from src.auto_annotator import AutoAnnotator
-    from src.utils import load_config
+    from src.utils import load_config, setup_logger
+    from src.category_pipeline import resolve_cascade_weights
     from src.model_registry import load_model_registry, resolve_registry_weight
+    from src.profiler import SamplingProfiler, finish_run, profile_task
+    from src.run_metrics import RunMetrics
 
     # Load config
     config = load_config(args.config)
@@ -55,10 +70,17 @@ def main():
     print("=" * 60)
     print("Auto-Annotation")
     print("=" * 60)
+    run_metrics = RunMetrics("auto_label")
+    task_metrics = run_metrics.task(args.category or Path(args.images).name, images=args.images)
     model_path = args.model
+    cascade_weights = None
     if args.category:
-        registry = load_model_registry(args.registry)
-        resolved = resolve_registry_weight(registry, args.category, registry_path=args.registry)
+        with task_metrics.stage("weight_resolution"):
+            registry = load_model_registry(args.registry)
+            resolved = resolve_registry_weight(registry, args.category, registry_path=args.registry)
+            cascade_weights = resolve_cascade_weights(
+                args.category, config, registry=registry, registry_path=args.registry
+            )
         if not resolved:
             print(f"✗ No model found for category '{args.category}' in registry: {args.registry}")
             return 1
@@ -73,23 +95,35 @@ def main():
     print("=" * 60)
     
     # Initialize annotator
-    annotator = AutoAnnotator(model_path, config)
+    annotator = AutoAnnotator(
+        model_path, config, cascade_model_path=str(cascade_weights) if cascade_weights else None
+    )
+
+    profiler = None
+    profile_dir = None
+    profile_logger = setup_logger("auto_label.profile")
+    if args.profile:
+        profile_dir = Path(args.profile_dir or Path("logs") / "profiles" / datetime.now().strftime("%Y%m%d_%H%M%S"))
+        profiler = SamplingProfiler(interval=args.profile_interval_ms / 1000.0).start()
     
     try:
         start_time = datetime.now()
         print(f"\nAuto-annotation started at {start_time.strftime('%Y-%m-%d %H:%M:%S')}")
         
         # Annotate images
-        if args.output_layout == "yolo":
-            stats = annotator.annotate_images_yolo(
-                args.images,
-                args.output,
-                skip_existing=not args.no_skip_existing,
-                write_empty=True,
-                report_path=str(Path(args.output) / "_auto_label_report.json"),
-            )
-        else:
-            stats = annotator.annotate_images(args.images, args.output)
+        with profile_task(profiler, task_metrics.name, profile_dir, profile_logger, args.profile_top):
+            if args.output_layout == "yolo":
+                stats = annotator.annotate_images_yolo(
+                    args.images,
+                    args.output,
+                    skip_existing=not args.no_skip_existing,
+                    write_empty=True,
+                    report_path=str(Path(args.output) / "_auto_label_report.json"),
+                    metrics=task_metrics,
+                )
+            else:
+                stats = annotator.annotate_images(args.images, args.output, metrics=task_metrics)
+        finish_run(profiler, profile_dir, profile_logger, args.profile_top)
         
         end_time = datetime.now()
         duration = end_time - start_time
@@ -97,10 +131,24 @@ def main():
         print(f"\n{'=' * 60}")
         print(f"✓ Auto-annotation completed!")
         print(f"  Duration: {duration}")
+        summary = run_metrics.summary()
+        print(f"  Throughput: {summary['images_per_s'] or '-'} img/s "
+              f"(p50 {summary['latency_ms']['p50']} ms, p90 {summary['latency_ms']['p90']} ms, "
+              f"peak RSS {summary['peak_rss_mb'] or '-'} MB)")
+        if args.metrics_json:
+            run_metrics.write_json(args.metrics_json)
+            print(f"  Metrics saved to: {args.metrics_json}")
+        if args.prometheus_textfile:
+            run_metrics.write_prometheus(args.prometheus_textfile)
         print(f"  Total images: {stats['total']}")
         print(f"  High confidence (>0.7): {stats['high_conf']} ({stats['high_conf']/stats['total']*100:.1f}%)")
         print(f"  Medium confidence (0.5-0.7): {stats['medium_conf']} ({stats['medium_conf']/stats['total']*100:.1f}%)")
         print(f"  Low confidence (<0.5): {stats['low_conf']} ({stats['low_conf']/stats['total']*100:.1f}%)")
+        if 'cascade' in stats:
+            cascade = stats['cascade']
+            print(f"  Cascade: {cascade['escalated']}/{cascade['images']} escalated "
+                  f"({cascade['escalated_fraction']*100:.1f}%), "
+                  f"estimated speedup {cascade['estimated_speedup'] or '-'}x")
         if args.output_layout == "yolo":
             print(f"\nLabels saved to: {args.output}/*.txt")
             print(f"Report saved to: {args.output}/_auto_label_report.json")
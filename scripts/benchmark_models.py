@@ -0,0 +1,95 @@
+"""Benchmark registered models on this host and store the results in the registry"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Measure cold-load time, warm per-image latency and batch throughput of registered '
+                    'weights on this host, and store them per host in the registry metadata'
+    )
+    parser.add_argument('--registry', type=str, default='models/model_registry.yaml',
+                        help='Model registry to benchmark (default: models/model_registry.yaml)')
+    parser.add_argument('--category', type=str, action='append', default=None,
+                        help='Only benchmark these categories (repeatable; default: all registered)')
+    parser.add_argument('--config', type=str, default='config/config.yaml',
+                        help='Config providing auto_annotation img_size / batch_size / cpu_profile')
+    parser.add_argument('--imgsz', type=int, default=None,
+                        help='Override auto_annotation.img_size')
+    parser.add_argument('--batch', type=int, default=None,
+                        help='Override auto_annotation.batch_size')
+    parser.add_argument('--images', type=str, default=None,
+                        help='Directory of sample images (default: synthetic frames)')
+    parser.add_argument('--num-images', type=int, default=16,
+                        help='Images per throughput round (default: 16)')
+    parser.add_argument('--latency-runs', type=int, default=20,
+                        help='Single-image predictions used for warm latency (default: 20)')
+    parser.add_argument('--rounds', type=int, default=3,
+                        help='Batch throughput rounds (default: 3)')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Print results without writing them to the registry')
+
+    args = parser.parse_args()
+
+    from src.model_benchmark import benchmark_images, benchmark_weights, host_key, store_host_benchmark
+    from src.model_registry import load_model_registry, resolve_registry_weight
+    from src.utils import load_config
+
+    config = load_config(args.config)
+    auto_cfg = config.setdefault('auto_annotation', {})
+    if args.imgsz:
+        auto_cfg['img_size'] = args.imgsz
+    if args.batch:
+        auto_cfg['batch_size'] = args.batch
+    imgsz = auto_cfg.get('img_size', 640)
+
+    registry = load_model_registry(args.registry)
+    categories = args.category or sorted(registry)
+    if not categories:
+        print(f"✗ No models registered in {args.registry}")
+        return 1
+
+    images = benchmark_images(imgsz, args.num_images, args.images)
+    print("=" * 60)
+    print(f"Benchmarking {len(categories)} models on host '{host_key()}'")
+    print(f"imgsz={imgsz}, batch={auto_cfg.get('batch_size', 1)}, images={len(images)}"
+          f" ({'sample from ' + args.images if args.images else 'synthetic'})")
+    print("=" * 60)
+
+    failed = 0
+    for category in categories:
+        weights = resolve_registry_weight(registry, category, registry_path=args.registry)
+        if weights is None:
+            print(f"✗ {category}: weights not found ({registry.get(category)})")
+            failed += 1
+            continue
+        try:
+            result = benchmark_weights(
+                str(weights), config, images, latency_runs=args.latency_runs, throughput_rounds=args.rounds
+            )
+        except Exception as e:
+            print(f"✗ {category}: benchmark failed: {e}")
+            failed += 1
+            continue
+
+        print(f"✓ {category}: load {result['cold_load_s']}s + prepare {result['prepare_s']}s, "
+              f"latency p50 {result['warm_latency_ms']['p50']} ms / p90 {result['warm_latency_ms']['p90']} ms, "
+              f"throughput {result['batch_images_per_s']} img/s")
+        if args.dry_run:
+            print(json.dumps(result, indent=2, ensure_ascii=False))
+        else:
+            store_host_benchmark(args.registry, category, result)
+
+    if not args.dry_run:
+        print(f"\nResults stored under hosts.{host_key()} in the registry metadata")
+    return 0 if failed == 0 else 2
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,71 @@
+"""Evaluate predicted labels against reference (human) labels"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Compare predicted YOLO labels with reference labels (per-class P/R/AP, per station)',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Two flat label directories
+  python scripts/evaluate_labels.py --gt data/cat/pre_labels --pred output/cat_pred/labels
+
+  # Station trees: <station>/<category>/pre_labels vs <station>/<category>/eval_labels
+  python scripts/evaluate_labels.py --gt /path/stations --gt-dir-name pre_labels \\
+      --pred /path/stations --pred-dir-name eval_labels --json logs/eval.json
+
+  # Packed label indexes built by myutils/label_analyzer.py
+  python scripts/evaluate_labels.py --gt gt_index.npz --pred pred_index.npz
+        """
+    )
+    parser.add_argument('--gt', type=str, required=True,
+                        help='Reference labels: label dir, station tree (with --gt-dir-name) or .npz label index')
+    parser.add_argument('--pred', type=str, required=True,
+                        help='Predicted labels: label dir, station tree (with --pred-dir-name) or .npz label index')
+    parser.add_argument('--gt-dir-name', type=str, default=None,
+                        help='Treat --gt as a tree and read label dirs with this name (e.g. pre_labels)')
+    parser.add_argument('--pred-dir-name', type=str, default=None,
+                        help='Treat --pred as a tree and read label dirs with this name (e.g. labels)')
+    parser.add_argument('--names', type=str, default=None,
+                        help='Optional dataset YAML whose "names" map class ids to names')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Threads used to read label files (default: one per CPU, up to 8)')
+    parser.add_argument('--json', type=str, default=None,
+                        help='Write the full report (incl. per-station per-class metrics) as JSON')
+
+    args = parser.parse_args()
+
+    from src.evaluator import evaluate, load_labels, print_report, write_report
+
+    names = None
+    if args.names:
+        import yaml
+
+        with open(args.names, 'r', encoding='utf-8') as f:
+            raw = (yaml.safe_load(f) or {}).get('names') or {}
+        names = dict(enumerate(raw)) if isinstance(raw, list) else {int(k): v for k, v in raw.items()}
+
+    start = time.perf_counter()
+    reference = load_labels(args.gt, args.gt_dir_name, workers=args.workers)
+    predicted = load_labels(args.pred, args.pred_dir_name, workers=args.workers)
+    loaded = time.perf_counter()
+    report = evaluate(reference, predicted, names)
+    done = time.perf_counter()
+
+    print_report(report)
+    print(f"\nLoaded labels in {loaded - start:.2f}s, evaluated in {done - loaded:.2f}s")
+    if args.json:
+        write_report(report, args.json)
+        print(f"Report saved to: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
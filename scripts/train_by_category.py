@@ -13,6 +13,7 @@ Enhancements:
 import argparse
 import os
 import sys
+from datetime import datetime
 from pathlib import Path
 
 # Add parent directory to path
@@ -39,6 +40,9 @@ Examples:
   # Force retraining even if a model already exists
   python scripts/train_by_category.py --force-train
 
+  # Dry run: show what each category would do (no model is loaded)
+  python scripts/train_by_category.py --data-root /path/to/data --plan --plan-json logs/plan.json
+
 Default mode structure (data/raw/):
   data/raw/
   ├── category1/
@@ -126,9 +130,18 @@ Custom path mode structure:
     parser.add_argument(
         '--train-init',
         type=str,
-        choices=['base', 'reuse'],
+        choices=['base', 'reuse', 'incremental'],
         default='base',
-        help="Training init strategy when training is needed: 'base' (default) or 'reuse' (warm-start from resolved weights)"
+        help="Training init strategy when training is needed: 'base' (default), 'reuse' (warm-start from resolved weights) "
+             "or 'incremental' (fine-tune existing weights on labels added since their last training; "
+             "registered only if val does not regress)"
+    )
+    parser.add_argument(
+        '--train-budget-min',
+        type=float,
+        default=None,
+        help='Wall-clock training budget per category in minutes (overrides training.time_budget_min); '
+             'epochs and LR schedule are fitted to it, training.epochs stays the upper bound'
     )
     parser.add_argument(
         '--output-layout',
@@ -142,6 +155,53 @@ Custom path mode structure:
         action='store_true',
         help="When --output-layout yolo, do not skip images that already have labels/*.txt"
     )
+    parser.add_argument(
+        '--plan',
+        action='store_true',
+        help='Dry run: print every category with its effective action, resolved weights/source and '
+             'unlabeled image count, then exit (no model is loaded)'
+    )
+    parser.add_argument(
+        '--plan-json',
+        type=str,
+        default=None,
+        help='With --plan: also write the plan as JSON to this path'
+    )
+    parser.add_argument(
+        '--metrics-json',
+        type=str,
+        default='logs/train_by_category_metrics.json',
+        help='Write the run-level timing/throughput summary as JSON (default: logs/train_by_category_metrics.json)'
+    )
+    parser.add_argument(
+        '--prometheus-textfile',
+        type=str,
+        default=None,
+        help='Optional Prometheus textfile-collector output (e.g. /var/lib/node_exporter/autolabel.prom)'
+    )
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Run a sampling profiler and write collapsed stacks (flamegraph format) per category'
+    )
+    parser.add_argument(
+        '--profile-dir',
+        type=str,
+        default=None,
+        help='Where to write .folded profiles (default: logs/profiles/<timestamp>)'
+    )
+    parser.add_argument(
+        '--profile-interval-ms',
+        type=float,
+        default=5.0,
+        help='Sampling interval of --profile in milliseconds (default: 5)'
+    )
+    parser.add_argument(
+        '--profile-top',
+        type=int,
+        default=20,
+        help='Number of hotspot frames logged per category with --profile (default: 20)'
+    )
 
     args = parser.parse_args()
 
@@ -149,6 +209,8 @@ Custom path mode structure:
     from src.category_pipeline import load_model_map
     from src.category_runner import process_category
     from src.model_registry import load_model_registry
+    from src.profiler import SamplingProfiler, finish_run, profile_task
+    from src.run_metrics import RunMetrics
 
     # Setup logger
     logger = setup_logger(__name__, "logs/train_by_category.log")
@@ -159,10 +221,52 @@ Custom path mode structure:
         return
 
     base_config = load_config(args.config)
+    if args.train_budget_min is not None:
+        base_config['training']['time_budget_min'] = args.train_budget_min
     logger.info(f"Loaded base configuration from {args.config}")
 
     model_map = load_model_map(args.model_map) if args.model_map else {}
     registry = load_model_registry(args.registry) if args.registry else {}
+    run_metrics = RunMetrics("train_by_category")
+
+    def run_plan(categories, use_pre_prefix: bool) -> None:
+        from src.planner import plan_category, print_plan, write_plan_json
+
+        weight_options = dict(
+            registry=registry,
+            registry_path=args.registry,
+            model_map=model_map,
+            model_map_path=args.model_map,
+            pretrained_root=args.pretrained_root,
+            pretrained_model=args.pretrained_model,
+            prefer_pretrained=args.prefer_pretrained,
+        )
+        tasks = [
+            plan_category(
+                category_name=category_name,
+                category_root=category_path,
+                use_pre_prefix=use_pre_prefix,
+                action=args.action,
+                weight_options=weight_options,
+                shared_model_root=args.shared_model_root,
+                force_train=args.force_train,
+                train_init=args.train_init,
+                output_layout=args.output_layout,
+                skip_existing=not args.no_skip_existing,
+            )
+            for category_name, category_path in categories
+        ]
+        print_plan(tasks)
+        if args.plan_json:
+            write_plan_json(tasks, args.plan_json)
+            logger.info(f"Plan written to: {args.plan_json}")
+
+    profiler = None
+    profile_dir = None
+    if args.profile and not args.plan:
+        profile_dir = Path(args.profile_dir or Path("logs") / "profiles" / datetime.now().strftime("%Y%m%d_%H%M%S"))
+        profiler = SamplingProfiler(interval=args.profile_interval_ms / 1000.0).start()
+        logger.info(f"Sampling profiler enabled ({args.profile_interval_ms} ms), output: {profile_dir}")
 
     # Determine mode and scan for categories
     if args.data_root:
@@ -180,12 +284,13 @@ Custom path mode structure:
 
         # Find all category directories (must contain pre_images/ and pre_labels/ subdirectories)
         categories = []
-        for item in data_root.iterdir():
-            if item.is_dir():
-                pre_images_dir = item / "pre_images"
-                pre_labels_dir = item / "pre_labels"
-                if pre_images_dir.exists() and pre_labels_dir.exists():
-                    categories.append((item.name, item))
+        with run_metrics.stage("scan"):
+            for item in data_root.iterdir():
+                if item.is_dir():
+                    pre_images_dir = item / "pre_images"
+                    pre_labels_dir = item / "pre_labels"
+                    if pre_images_dir.exists() and pre_labels_dir.exists():
+                        categories.append((item.name, item))
 
         if not categories:
             logger.warning(f"No valid categories found in {data_root}")
@@ -194,29 +299,35 @@ Custom path mode structure:
 
         logger.info(f"Found {len(categories)} categories to process: {[c[0] for c in categories]}")
 
+        if args.plan:
+            run_plan(categories, use_pre_prefix=True)
+            return
+
         # Process each category
         results = {}
         for category_name, category_path in categories:
-            success = process_category(
-                category_name=category_name,
-                category_root=category_path,
-                base_config=base_config,
-                logger=logger,
-                use_pre_prefix=True,
-                action=args.action,
-                force_train=args.force_train,
-                train_init=args.train_init,
-                shared_model_root=args.shared_model_root,
-                registry_path=args.registry,
-                registry=registry,
-                model_map_path=args.model_map,
-                model_map=model_map,
-                pretrained_root=args.pretrained_root,
-                pretrained_model=args.pretrained_model,
-                prefer_pretrained=args.prefer_pretrained,
-                output_layout=args.output_layout,
-                skip_existing=not args.no_skip_existing,
-            )
+            with profile_task(profiler, category_name, profile_dir, logger, args.profile_top):
+                success = process_category(
+                    category_name=category_name,
+                    category_root=category_path,
+                    base_config=base_config,
+                    logger=logger,
+                    use_pre_prefix=True,
+                    action=args.action,
+                    force_train=args.force_train,
+                    train_init=args.train_init,
+                    shared_model_root=args.shared_model_root,
+                    registry_path=args.registry,
+                    registry=registry,
+                    model_map_path=args.model_map,
+                    model_map=model_map,
+                    pretrained_root=args.pretrained_root,
+                    pretrained_model=args.pretrained_model,
+                    prefer_pretrained=args.prefer_pretrained,
+                    output_layout=args.output_layout,
+                    skip_existing=not args.no_skip_existing,
+                    metrics=run_metrics.task(category_name, category=category_name),
+                )
             results[category_name] = success
 
     else:
@@ -232,12 +343,13 @@ Custom path mode structure:
 
         # Find all category directories (must contain images/ and labels/ subdirectories)
         categories = []
-        for item in raw_data_dir.iterdir():
-            if item.is_dir() and not item.name.endswith("_unlabeled"):
-                images_dir = item / "images"
-                labels_dir = item / "labels"
-                if images_dir.exists() and labels_dir.exists():
-                    categories.append((item.name, item))
+        with run_metrics.stage("scan"):
+            for item in raw_data_dir.iterdir():
+                if item.is_dir() and not item.name.endswith("_unlabeled"):
+                    images_dir = item / "images"
+                    labels_dir = item / "labels"
+                    if images_dir.exists() and labels_dir.exists():
+                        categories.append((item.name, item))
 
         if not categories:
             logger.warning(f"No valid categories found in {raw_data_dir}")
@@ -246,29 +358,35 @@ Custom path mode structure:
 
         logger.info(f"Found {len(categories)} categories to process: {[c[0] for c in categories]}")
 
+        if args.plan:
+            run_plan(categories, use_pre_prefix=False)
+            return
+
         # Process each category
         results = {}
         for category_name, category_path in categories:
-            success = process_category(
-                category_name=category_name,
-                category_root=category_path,
-                base_config=base_config,
-                logger=logger,
-                use_pre_prefix=False,
-                action=args.action,
-                force_train=args.force_train,
-                train_init=args.train_init,
-                shared_model_root=args.shared_model_root,
-                registry_path=args.registry,
-                registry=registry,
-                model_map_path=args.model_map,
-                model_map=model_map,
-                pretrained_root=args.pretrained_root,
-                pretrained_model=args.pretrained_model,
-                prefer_pretrained=args.prefer_pretrained,
-                output_layout=args.output_layout,
-                skip_existing=not args.no_skip_existing,
-            )
+            with profile_task(profiler, category_name, profile_dir, logger, args.profile_top):
+                success = process_category(
+                    category_name=category_name,
+                    category_root=category_path,
+                    base_config=base_config,
+                    logger=logger,
+                    use_pre_prefix=False,
+                    action=args.action,
+                    force_train=args.force_train,
+                    train_init=args.train_init,
+                    shared_model_root=args.shared_model_root,
+                    registry_path=args.registry,
+                    registry=registry,
+                    model_map_path=args.model_map,
+                    model_map=model_map,
+                    pretrained_root=args.pretrained_root,
+                    pretrained_model=args.pretrained_model,
+                    prefer_pretrained=args.prefer_pretrained,
+                    output_layout=args.output_layout,
+                    skip_existing=not args.no_skip_existing,
+                    metrics=run_metrics.task(category_name, category=category_name),
+                )
             results[category_name] = success
 
     # Summary
@@ -286,6 +404,15 @@ Custom path mode structure:
         status = "[OK]" if success else "[FAIL]"
         logger.info(f"  {status} {category}")
 
+    finish_run(profiler, profile_dir, logger, args.profile_top)
+    run_metrics.log_summary(logger)
+    if args.metrics_json:
+        run_metrics.write_json(args.metrics_json)
+        logger.info(f"Run metrics saved to: {args.metrics_json}")
+    if args.prometheus_textfile:
+        run_metrics.write_prometheus(args.prometheus_textfile)
+        logger.info(f"Prometheus textfile written to: {args.prometheus_textfile}")
+
     logger.info("Batch training completed")
 
 
@@ -10,6 +10,8 @@ Goal:
 import argparse
 import os
 import sys
+from datetime import datetime
+from functools import partial
 from pathlib import Path
 
 # Add parent directory to path
@@ -61,9 +63,17 @@ def main() -> int:
     parser.add_argument(
         "--train-init",
         type=str,
-        choices=["base", "reuse"],
+        choices=["base", "reuse", "incremental"],
         default="reuse",
-        help="Training init strategy: 'base' or 'reuse' (default: reuse)",
+        help="Training init strategy: 'base', 'reuse' or 'incremental' (fine-tune existing weights on "
+             "labels added since their last training, short schedule; default: reuse)",
+    )
+    parser.add_argument(
+        "--train-budget-min",
+        type=float,
+        default=None,
+        help="Wall-clock training budget per category in minutes (overrides training.time_budget_min); "
+             "epochs and LR schedule are fitted to it, training.epochs stays the upper bound",
     )
     parser.add_argument(
         "--shared-model-root",
@@ -112,14 +122,120 @@ def main() -> int:
         action="store_true",
         help="When output layout is yolo, do not skip images that already have labels/*.txt",
     )
+    parser.add_argument(
+        "--fanout",
+        type=str,
+        choices=["off", "path", "content"],
+        default="off",
+        help="With --action annotate: group categories whose images overlap (same file 'path' or same 'content' "
+             "hash), decode each shared image once and run every category model on it (default: off)",
+    )
+    parser.add_argument(
+        "--schedule",
+        type=str,
+        choices=["directory", "longest-first", "freshest"],
+        default="directory",
+        help="Task order: as scanned ('directory', default), largest estimated cost first ('longest-first'), "
+             "or stations with the newest images first ('freshest'). Costs come from --throughput-history",
+    )
+    parser.add_argument(
+        "--throughput-history",
+        type=str,
+        default="logs/throughput_history.json",
+        help="Per-model throughput history used for cost estimates / ETA and updated after each task "
+             "(default: logs/throughput_history.json)",
+    )
+    parser.add_argument(
+        "--lease-dir",
+        type=str,
+        default=None,
+        help="Distributed mode: shared directory for task leases (e.g. <stations-root>/_leases). Workers on "
+             "several hosts running the same command split the tasks; abandoned leases are re-claimed",
+    )
+    parser.add_argument(
+        "--run-id",
+        type=str,
+        default=None,
+        help="Distributed mode: name of this batch; workers of the same batch must use the same id "
+             "(default: today's date, YYYYMMDD)",
+    )
+    parser.add_argument(
+        "--worker-id",
+        type=str,
+        default=None,
+        help="Distributed mode: worker name recorded in leases (default: <hostname>-<pid>)",
+    )
+    parser.add_argument(
+        "--lease-ttl",
+        type=float,
+        default=120.0,
+        help="Distributed mode: seconds without heartbeat after which a lease counts as abandoned (default: 120)",
+    )
+    parser.add_argument(
+        "--shard-size",
+        type=int,
+        default=0,
+        help="Distributed mode: split annotate-only tasks (yolo layout) into image shards of this many images "
+             "so several workers can share one large category (default: 0 = no sharding)",
+    )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="Dry run: print every station/category task with its effective action, resolved weights/source "
+             "and unlabeled image count, then exit (no model is loaded)",
+    )
+    parser.add_argument(
+        "--plan-json",
+        type=str,
+        default=None,
+        help="With --plan: also write the plan as JSON to this path",
+    )
+    parser.add_argument(
+        "--metrics-json",
+        type=str,
+        default="logs/train_by_station_metrics.json",
+        help="Write the run-level timing/throughput summary as JSON (default: logs/train_by_station_metrics.json)",
+    )
+    parser.add_argument(
+        "--prometheus-textfile",
+        type=str,
+        default=None,
+        help="Optional Prometheus textfile-collector output (e.g. /var/lib/node_exporter/autolabel.prom)",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Run a sampling profiler and write collapsed stacks (flamegraph format) per station/category task",
+    )
+    parser.add_argument(
+        "--profile-dir",
+        type=str,
+        default=None,
+        help="Where to write .folded profiles (default: logs/profiles/<timestamp>)",
+    )
+    parser.add_argument(
+        "--profile-interval-ms",
+        type=float,
+        default=5.0,
+        help="Sampling interval of --profile in milliseconds (default: 5)",
+    )
+    parser.add_argument(
+        "--profile-top",
+        type=int,
+        default=20,
+        help="Number of hotspot frames logged per task with --profile (default: 20)",
+    )
 
     args = parser.parse_args()
 
     from src.utils import load_config, setup_logger, ensure_dir
-    from src.category_pipeline import load_model_map, resolve_weights
-    from src.category_runner import process_category
+    from src.category_pipeline import load_model_map
+    from src.lease_queue import LeaseQueue
     from src.model_registry import load_model_registry
-    from src.auto_annotator import AutoAnnotator
+    from src.profiler import SamplingProfiler, finish_run
+    from src.run_metrics import RunMetrics
+    from src.scheduler import EtaTracker, ThroughputHistory, seed_from_registry, total_estimate
+    from src.station_runner import StationRun, build_work_units, run_fanout, run_unit, schedule_entries
     from src.station_scanner import iter_station_dirs, scan_station_categories
 
     logger = setup_logger(__name__, "logs/train_by_station.log")
@@ -129,6 +245,8 @@ def main() -> int:
         return 1
 
     base_config = load_config(args.config)
+    if args.train_budget_min is not None:
+        base_config["training"]["time_budget_min"] = args.train_budget_min
     logger.info(f"Loaded base configuration from {args.config}")
 
     model_map = load_model_map(args.model_map) if args.model_map else {}
@@ -160,6 +278,41 @@ def main() -> int:
             )
             shared_model_root = str(legacy_trained)
 
+    weight_options = dict(
+        registry=registry,
+        registry_path=args.registry,
+        model_map=model_map,
+        model_map_path=args.model_map,
+        pretrained_root=args.pretrained_root,
+        pretrained_model=args.pretrained_model,
+        prefer_pretrained=args.prefer_pretrained,
+    )
+
+    if args.plan:
+        from src.planner import plan_station_entry, print_plan, write_plan_json
+
+        tasks = []
+        for station_dir in station_dirs:
+            for entry in scan_station_categories(station_dir):
+                if category_filter and entry.category_name not in category_filter:
+                    continue
+                tasks.append(plan_station_entry(
+                    station_dir.name,
+                    entry,
+                    action=args.action,
+                    weight_options=weight_options,
+                    shared_model_root=shared_model_root,
+                    force_train=args.force_train,
+                    train_init=args.train_init,
+                    output_layout=args.output_layout,
+                    skip_existing=not args.no_skip_existing,
+                ))
+        print_plan(tasks)
+        if args.plan_json:
+            write_plan_json(tasks, args.plan_json)
+            logger.info(f"Plan written to: {args.plan_json}")
+        return 0
+
     ensure_dir("logs")
     logger.info("=" * 60)
     logger.info("STATION MODE: Batch by station")
@@ -170,92 +323,86 @@ def main() -> int:
     logger.info(f"Shared model root: {Path(shared_model_root).expanduser().resolve()}")
     logger.info(f"Output layout: {args.output_layout}")
 
-    results = {}
-    for station_dir in station_dirs:
-        station_name = station_dir.name
-        logger.info(f"\n{'#' * 60}")
-        logger.info(f"Station: {station_name}")
-        logger.info(f"{'#' * 60}")
+    profiler = None
+    profile_dir = None
+    if args.profile:
+        profile_dir = Path(args.profile_dir or Path("logs") / "profiles" / datetime.now().strftime("%Y%m%d_%H%M%S"))
+        profiler = SamplingProfiler(interval=args.profile_interval_ms / 1000.0).start()
+        logger.info(f"Sampling profiler enabled ({args.profile_interval_ms} ms), output: {profile_dir}")
+
+    run = StationRun(
+        base_config=base_config,
+        action=args.action,
+        shared_model_root=shared_model_root,
+        weight_options=weight_options,
+        force_train=args.force_train,
+        train_init=args.train_init,
+        output_layout=args.output_layout,
+        skip_existing=not args.no_skip_existing,
+        shard_size=args.shard_size,
+    )
+    profile_options = dict(profiler=profiler, profile_dir=profile_dir, profile_top=args.profile_top)
 
-        categories = scan_station_categories(station_dir)
+    run_metrics = RunMetrics("train_by_station")
+    station_entries = []
+    for station_dir in station_dirs:
+        with run_metrics.stage("scan"):
+            categories = scan_station_categories(station_dir)
         if category_filter:
             categories = [c for c in categories if c.category_name in category_filter]
+        station_entries.append((station_dir.name, categories))
 
-        if not categories:
-            logger.warning(f"[{station_name}] No categories found")
-            continue
-
-        logger.info(f"[{station_name}] Found {len(categories)} categories: {[c.category_name for c in categories]}")
-
-        for entry in categories:
-            category_name = entry.category_name
-            category_dir = entry.category_dir
-
-            effective_action = args.action
-            has_pre_labeled = (category_dir / "pre_images").exists() and (category_dir / "pre_labels").exists()
-            if effective_action in ("train", "train_and_annotate") and not has_pre_labeled:
-                logger.info(
-                    f"[{station_name}/{category_name}] No pre_images/pre_labels; downgrade action to annotate"
-                )
-                effective_action = "annotate"
-
-            if entry.layout in ("dir_images", "pre_labeled"):
-                ok = process_category(
-                    category_name=category_name,
-                    category_root=category_dir,
-                    base_config=base_config,
-                    logger=logger,
-                    use_pre_prefix=True,
-                    action=effective_action,
-                    force_train=args.force_train,
-                    train_init=args.train_init,
-                    shared_model_root=shared_model_root,
-                    registry_path=args.registry,
-                    registry=registry,
-                    model_map_path=args.model_map,
-                    model_map=model_map,
-                    pretrained_root=args.pretrained_root,
-                    pretrained_model=args.pretrained_model,
-                    prefer_pretrained=args.prefer_pretrained,
-                    output_layout=args.output_layout,
-                    skip_existing=not args.no_skip_existing,
-                )
-                results[(station_name, category_name)] = ok
-                continue
-
-            if entry.layout == "flat_images":
-                model_root = Path(shared_model_root).expanduser().resolve() / category_name
-                weights, source = resolve_weights(
-                    category_name,
-                    model_root,
-                    registry=registry,
-                    registry_path=args.registry,
-                    model_map=model_map,
-                    model_map_path=args.model_map,
-                    pretrained_root=args.pretrained_root,
-                    pretrained_model=args.pretrained_model,
-                    prefer_pretrained=args.prefer_pretrained,
-                )
-                if not weights:
-                    logger.error(f"[{station_name}/{category_name}] No usable weights found (source={source})")
-                    results[(station_name, category_name)] = False
-                    continue
+    results = {}
+    if args.fanout != "off":
+        if args.lease_dir:
+            logger.warning("--fanout is not supported together with --lease-dir; ignored")
+        elif args.action == "annotate":
+            results.update(run_fanout(
+                run, station_entries, args.fanout, logger=logger, run_metrics=run_metrics, **profile_options
+            ))
+        else:
+            logger.warning("--fanout only applies to --action annotate; ignored")
+    fanned_out = {f"{station_name}/{category_name}" for station_name, category_name in results}
 
-                labels_dir = category_dir / "labels"
-                annotator = AutoAnnotator(str(weights), base_config)
-                logger.info(f"[{station_name}/{category_name}] Flat images -> labels dir: {labels_dir}")
-                annotator.annotate_images_yolo(
-                    str(category_dir),
-                    str(labels_dir),
-                    skip_existing=not args.no_skip_existing,
-                    write_empty=True,
-                    report_path=str(labels_dir / "_auto_label_report.json"),
-                )
-                results[(station_name, category_name)] = True
-                continue
+    history = ThroughputHistory(args.throughput_history)
+    if args.registry:
+        infer_imgsz = base_config.get("auto_annotation", {}).get("img_size", 640)
+        seeded = seed_from_registry(history, args.registry, infer_imgsz)
+        if seeded:
+            logger.info(f"Throughput priors for {seeded} models taken from registry benchmarks")
 
-            logger.warning(f"[{station_name}/{category_name}] Unknown layout: {entry.layout}")
-            results[(station_name, category_name)] = False
+    with run_metrics.stage("schedule"):
+        scheduled = schedule_entries(
+            run, station_entries, history, schedule=args.schedule, skip=fanned_out, logger=logger
+        )
+    logger.info(f"Schedule: {args.schedule}, {len(scheduled)} tasks, estimated total {total_estimate(scheduled)}")
+
+    queue = None
+    if args.lease_dir:
+        run_id = args.run_id or datetime.now().strftime("%Y%m%d")
+        queue = LeaseQueue(args.lease_dir, run_id, worker_id=args.worker_id, ttl_s=args.lease_ttl,
+                           heartbeat_s=max(1.0, args.lease_ttl / 4))
+
+    work = build_work_units(run, scheduled, queue)
+    eta = EtaTracker(work.estimates())
+    run_one = partial(
+        run_unit, run, work, logger=logger, run_metrics=run_metrics, eta=eta, history=history, results=results,
+        **profile_options,
+    )
+    if queue is not None:
+        logger.info(
+            f"Distributed mode: worker {queue.worker_id}, leases in {queue.root}, {len(work.units)} work units"
+        )
+        with queue:
+            queue.drain(work.units, run_one)
+    else:
+        for unit_key in work.units:
+            run_one(unit_key)
+
+    try:
+        history.save()
+    except Exception:
+        logger.warning(f"Failed to update throughput history: {args.throughput_history}", exc_info=True)
 
     successful = sum(1 for v in results.values() if v)
     failed = len(results) - successful
@@ -265,6 +412,15 @@ def main() -> int:
     logger.info(f"Total station/category tasks: {len(results)}")
     logger.info(f"Successful: {successful}")
     logger.info(f"Failed: {failed}")
+
+    finish_run(profiler, profile_dir, logger, args.profile_top)
+    run_metrics.log_summary(logger)
+    if args.metrics_json:
+        run_metrics.write_json(args.metrics_json)
+        logger.info(f"Run metrics saved to: {args.metrics_json}")
+    if args.prometheus_textfile:
+        run_metrics.write_prometheus(args.prometheus_textfile)
+        logger.info(f"Prometheus textfile written to: {args.prometheus_textfile}")
     return 0 if failed == 0 else 2
 
 
@@ -1,24 +1,344 @@
 """Auto-annotation module for generating YOLO labels"""
 
 import json
+import time
+import cv2
 import torch
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Iterator, List, Optional
 from tqdm import tqdm
-from .utils import setup_logger, ensure_dir, get_image_files
+from .utils import atomic_write_text, setup_logger, ensure_dir, get_image_files
+from .image_loader import LoadedImage
 from .predictor import YOLOPredictor
+from .run_metrics import TaskMetrics
+from .staging import LabelWriter, StagingCache, open_staging
+from .video_source import (
+    frame_path,
+    frame_to_loaded,
+    get_video_files,
+    iter_sampled_frames,
+    sampling_signature,
+    save_frame,
+    video_settings,
+)
+
+VIDEO_INDEX_NAME = "_videos.json"
 
 
 class AutoAnnotator:
     """Auto-annotate images using trained YOLO model"""
     
-    def __init__(self, model_path: str, config: dict):
+    def __init__(self, model_path: str, config: dict, cascade_model_path: Optional[str] = None):
         self.predictor = YOLOPredictor(model_path, config)
         self.config = config
         self.logger = setup_logger(__name__)
+
+        # Cascade: a cheap first pass (smaller model and/or lower imgsz); only images whose
+        # max confidence is below review_threshold are re-run through the full model.
+        cascade_cfg = config.get('auto_annotation', {}).get('cascade') or {}
+        self.cascade_predictor = None
+        self.cascade_imgsz = None
+        if cascade_cfg.get('enabled', False):
+            cheap_model = cascade_model_path or cascade_cfg.get('model')
+            self.cascade_predictor = YOLOPredictor(str(cheap_model), config) if cheap_model else self.predictor
+            self.cascade_imgsz = cascade_cfg.get('img_size') or (None if cheap_model else 320)
+            self.logger.info(
+                f"Cascade enabled: first pass {cheap_model or model_path} "
+                f"(imgsz={self.cascade_imgsz or 'default'}), escalating below review_threshold"
+            )
+        self._reset_cascade()
+        # Set for the duration of a run when staging applies (see src/staging.py)
+        self.staging: Optional[StagingCache] = None
+        self.label_writer: Optional[LabelWriter] = None
         
-    def annotate_images(self, image_dir: str, output_dir: str):
-        """Annotate all images in directory"""
+    def predict_images(self, image_files: list, metrics: TaskMetrics, *, count_images: bool = True):
+        """Predict image paths or decoded frames, through the cascade when it is enabled."""
+        if self.cascade_predictor is not None:
+            return self._cascade_predict(image_files, metrics, count_images=count_images)
+        return self._predict(image_files, metrics, count_images=count_images)
+
+    def _predict(self, image_files: list, metrics: TaskMetrics, predictor: Optional[YOLOPredictor] = None,
+                 count_images: bool = True, **predict_kwargs):
+        """Run a predictor (the full model by default) on image paths or decoded frames, recording stage timings."""
+        predictor = predictor or self.predictor
+        self._ensure_loaded(predictor, metrics)
+        start = time.perf_counter()
+        if image_files and isinstance(image_files[0], LoadedImage):
+            results = predictor.predict_loaded(image_files, **predict_kwargs)
+        else:
+            results = predictor.predict_batch(image_files, **predict_kwargs)
+        metrics.record_predictions(results, time.perf_counter() - start, count_images=count_images)
+        return results
+
+    @staticmethod
+    def _ensure_loaded(predictor: YOLOPredictor, metrics: TaskMetrics) -> None:
+        if predictor.model is None:
+            with metrics.stage("model_load"):
+                predictor.load_model()
+
+    def _cascade_predict(self, image_files: list, metrics: TaskMetrics, count_images: bool = True):
+        """Cheap pass on every image, full model only on the low-confidence ones."""
+        review_threshold = self.config['auto_annotation']['review_threshold']
+        kwargs = {'imgsz': self.cascade_imgsz} if self.cascade_imgsz else {}
+        # Both models are loaded up front and the cascade timers sum ultralytics' per-image
+        # preprocess/inference/postprocess times, so model loads and the one-off predictor
+        # setup of the first call do not leak into the speedup estimate.
+        self._ensure_loaded(self.cascade_predictor, metrics)
+        self._ensure_loaded(self.predictor, metrics)
+
+        results = list(self._predict(image_files, metrics, predictor=self.cascade_predictor,
+                                     count_images=count_images, **kwargs))
+        self._cascade['cheap_s'] += self._inference_s(results)
+
+        escalate = [
+            i for i, r in enumerate(results)
+            if r.boxes is None or len(r.boxes) == 0 or float(r.boxes.conf.max()) < review_threshold
+        ]
+        if escalate:
+            full = self._predict([image_files[i] for i in escalate], metrics, count_images=False)
+            self._cascade['full_s'] += self._inference_s(full)
+            for i, result in zip(escalate, full):
+                results[i] = result
+
+        self._cascade['images'] += len(image_files)
+        self._cascade['escalated'] += len(escalate)
+        return results
+
+    @staticmethod
+    def _inference_s(results) -> float:
+        return sum(
+            sum(float((getattr(r, 'speed', None) or {}).get(k) or 0.0)
+                for k in ('preprocess', 'inference', 'postprocess'))
+            for r in results
+        ) / 1000.0
+
+    def _reset_cascade(self) -> None:
+        self._cascade = {'images': 0, 'escalated': 0, 'cheap_s': 0.0, 'full_s': 0.0}
+
+    def _cascade_report(self) -> dict:
+        """Escalated fraction and speedup vs. running the full model on every image.
+
+        The full-model-only time is estimated from the per-image time of the escalated images.
+        """
+        c = self._cascade
+        cascade_s = c['cheap_s'] + c['full_s']
+        full_only_s = c['full_s'] / c['escalated'] * c['images'] if c['escalated'] else None
+        return {
+            'images': c['images'],
+            'escalated': c['escalated'],
+            'escalated_fraction': round(c['escalated'] / c['images'], 4) if c['images'] else 0.0,
+            'cheap_pass_s': round(c['cheap_s'], 3),
+            'full_pass_s': round(c['full_s'], 3),
+            'estimated_full_only_s': round(full_only_s, 3) if full_only_s is not None else None,
+            'estimated_speedup': round(full_only_s / cascade_s, 2) if full_only_s and cascade_s else None,
+        }
+
+    def with_cascade_stats(self, stats: dict) -> dict:
+        return dict(stats, cascade=self._cascade_report()) if self.cascade_predictor is not None else stats
+
+    def _iter_chunk_results(self, image_files: List[Path], metrics: TaskMetrics) -> Iterator[list]:
+        """Predict `image_files` chunk by chunk, yielding each chunk's results.
+
+        Only one chunk of results is alive at a time, so memory use is bounded by
+        `auto_annotation.chunk_size` rather than by the directory size.
+        """
+        chunk_size = max(1, int(self.config.get('auto_annotation', {}).get('chunk_size', 50)))
+        total_chunks = (len(image_files) + chunk_size - 1) // chunk_size
+        self.logger.info(f"Processing {len(image_files)} images in {total_chunks} chunks of {chunk_size}")
+
+        lookahead = max(0, int((self.config.get('staging') or {}).get('lookahead_chunks', 2)))
+        with tqdm(total=len(image_files), desc="Annotating") as progress:
+            for i in range(0, len(image_files), chunk_size):
+                chunk = image_files[i:i + chunk_size]
+                self.logger.debug(f"Processing chunk {i // chunk_size + 1}/{total_chunks} ({len(chunk)} images)")
+
+                staged = chunk
+                if self.staging is not None:
+                    # Keep the copy pool `lookahead` chunks ahead of the chunk being predicted.
+                    self.staging.prefetch(image_files[i:i + chunk_size * (1 + lookahead)])
+                    with metrics.stage("staging"):
+                        staged = self.staging.fetch(chunk)
+
+                results = self.predict_images(staged, metrics)
+
+                if self.staging is not None:
+                    self.staging.release(staged)
+                    for result, source in zip(results, chunk):
+                        result.path = str(source)
+
+                # Clear GPU cache after each chunk
+                if torch.cuda.is_available():
+                    torch.cuda.empty_cache()
+
+                yield results
+                if self.label_writer is not None:
+                    self.label_writer.flush()
+                progress.update(len(chunk))
+
+    def _iter_video_results(self, video: Path, metrics: TaskMetrics, *, skip_stems=frozenset(),
+                            frames_dir: Optional[Path] = None) -> Iterator[list]:
+        """Sample a clip as a stream and predict its frames chunk by chunk (see src/video_source.py).
+
+        Frames whose stem is in `skip_stems` are not predicted; with `frames_dir`,
+        each sampled frame is also written there as `<video>_<frame>.jpg`.
+        """
+        settings = video_settings(self.config)
+        auto_cfg = self.config.get('auto_annotation', {})
+        chunk_size = max(1, int(auto_cfg.get('chunk_size', 50)))
+        img_size = auto_cfg.get('img_size', 640)
+
+        source = video
+        if self.staging is not None:
+            with metrics.stage("staging"):
+                source = self.staging.fetch([video])[0]
+        try:
+            frames = iter_sampled_frames(
+                source,
+                stride=settings['stride'],
+                scene_threshold=settings['scene_threshold'],
+                max_frames=settings['max_frames'],
+            )
+            while True:
+                chunk = []
+                start = time.perf_counter()
+                for index, frame in frames:
+                    path = frame_path(video, index)
+                    if path.stem in skip_stems:
+                        continue
+                    if frames_dir is not None:
+                        save_frame(frame, frames_dir / path.name)
+                    chunk.append(frame_to_loaded(frame, path, img_size))
+                    if len(chunk) >= chunk_size:
+                        break
+                metrics.add_stage("decode", time.perf_counter() - start)
+                if not chunk:
+                    break
+
+                results = self.predict_images(chunk, metrics)
+                yield results
+                if self.label_writer is not None:
+                    self.label_writer.flush()
+        finally:
+            if self.staging is not None:
+                self.staging.release([source])
+
+    def annotate_videos(
+        self,
+        image_dir,
+        consume: Callable[[list], None],
+        metrics: TaskMetrics,
+        *,
+        labels_dir: Optional[Path] = None,
+        frames_dir: Optional[Path] = None,
+    ) -> int:
+        """Annotate the video clips in `image_dir`, passing each chunk of frame results to `consume`.
+
+        With `labels_dir` (YOLO layout with skip_existing), frames that already have a
+        label are skipped and finished clips are recorded in `<labels_dir>/_videos.json`,
+        so a clip is not decoded again until it or the sampling settings change.
+        `frames_dir` defaults to `video.frames_dir` when `video.save_frames` is set.
+        Returns the number of frames annotated.
+        """
+        settings = video_settings(self.config)
+        index_file = Path(labels_dir) / VIDEO_INDEX_NAME if labels_dir is not None else None
+        index = self._read_video_index(labels_dir)
+        videos = self.pending_videos(image_dir, labels_dir, index=index)
+        if not videos:
+            return 0
+        skip_stems = frozenset()
+        if labels_dir is not None:
+            skip_stems = frozenset(p.stem for p in Path(labels_dir).glob("*.txt"))
+
+        if settings['save_frames']:
+            frames_dir = Path(settings['frames_dir']) if settings['frames_dir'] else frames_dir
+            if frames_dir is not None:
+                ensure_dir(str(frames_dir))
+        else:
+            frames_dir = None
+
+        signature = sampling_signature(settings)
+        annotated = 0
+        self.logger.info(f"Found {len(videos)} video clips (stride={settings['stride']}, "
+                         f"scene_threshold={settings['scene_threshold']})")
+        for video in tqdm(videos, desc="Videos"):
+            entry = self._video_entry(video, signature)
+            try:
+                frames = 0
+                for results in self._iter_video_results(video, metrics, skip_stems=skip_stems, frames_dir=frames_dir):
+                    consume(results)
+                    frames += len(results)
+            except (ValueError, OSError, cv2.error) as e:
+                self.logger.warning(f"Skipping video {video}: {e}")
+                continue
+            annotated += frames
+            if index_file is not None:
+                index[video.name] = dict(entry, frames=frames)
+                if self.label_writer is not None:
+                    self.label_writer.wait()     # the clip counts as done only once its labels are on disk
+                atomic_write_text(str(index_file), json.dumps(index, indent=2, ensure_ascii=False))
+        return annotated
+
+    def pending_videos(self, image_dir, labels_dir: Optional[Path] = None, *, index=None) -> List[Path]:
+        """Video clips in `image_dir` that still need annotating.
+
+        With `labels_dir`, clips recorded as done in its `_videos.json` (same file and
+        sampling settings) are left out; without it every clip is pending.
+        """
+        settings = video_settings(self.config)
+        if not settings['enabled']:
+            return []
+        videos = get_video_files(image_dir, settings['extensions'])
+        if labels_dir is None or not videos:
+            return videos
+        index = self._read_video_index(labels_dir) if index is None else index
+        signature = sampling_signature(settings)
+        pending = []
+        for video in videos:
+            entry = self._video_entry(video, signature)
+            if {k: index.get(video.name, {}).get(k) for k in entry} != entry:
+                pending.append(video)
+        return pending
+
+    @staticmethod
+    def _read_video_index(labels_dir: Optional[Path]) -> dict:
+        index_file = Path(labels_dir) / VIDEO_INDEX_NAME if labels_dir is not None else None
+        if index_file is None or not index_file.exists():
+            return {}
+        try:
+            return json.loads(index_file.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _video_entry(video: Path, signature) -> dict:
+        st = video.stat()
+        return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sampling': signature}
+
+    def _begin_staging(self, image_dir: str, output_dir: str) -> None:
+        self.staging, self.label_writer = open_staging(self.config, image_dir, output_dir)
+
+    def _end_staging(self) -> None:
+        """Wait for queued label writes and stop the copy pool."""
+        staging, writer = self.staging, self.label_writer
+        self.staging, self.label_writer = None, None
+        try:
+            if writer is not None:
+                writer.close()
+        finally:
+            if staging is not None:
+                staging.close()
+                self.logger.info(f"Staging: {staging.stats}")
+
+    def annotate_images(self, image_dir: str, output_dir: str, *, metrics: Optional[TaskMetrics] = None):
+        """Annotate all images in directory, routing labels into high/medium/low confidence folders.
+
+        Images are processed in chunks; each chunk's labels are written as soon as
+        it completes and `statistics.json` is rewritten after every chunk
+        (`complete` stays false until the whole directory is done). Video clips in
+        the directory are annotated afterwards, frame by frame (see annotate_videos).
+        """
+        metrics = metrics or TaskMetrics(Path(image_dir).name)
+        self._reset_cascade()
         image_files = get_image_files(image_dir)
         self.logger.info(f"Found {len(image_files)} images to annotate")
         
@@ -31,32 +351,42 @@ class AutoAnnotator:
         for d in [high_dir, medium_dir, low_dir]:
             ensure_dir(d)
         
-        # Predict
-        results = self.predictor.predict_batch(image_files)
-        
-        # Filter by confidence
         review_threshold = self.config['auto_annotation']['review_threshold']
-        high_conf, medium_conf, low_conf = self.predictor.filter_by_confidence(
-            results, review_threshold
-        )
-        
-        # Generate labels
-        stats = {
-            'total': len(results),
-            'high_conf': len(high_conf),
-            'medium_conf': len(medium_conf),
-            'low_conf': len(low_conf)
-        }
-        
-        self._save_labels(high_conf, high_dir)
-        self._save_labels(medium_conf, medium_dir)
-        self._save_labels(low_conf, low_dir)
-        
-        # Save statistics
+        stats = {'total': 0, 'high_conf': 0, 'medium_conf': 0, 'low_conf': 0}
         stats_file = Path(output_dir) / "statistics.json"
-        with open(stats_file, 'w') as f:
-            json.dump(stats, f, indent=2)
-        
+
+        def write_statistics(complete: bool) -> None:
+            payload = dict(self.with_cascade_stats(stats), complete=complete,
+                           pending=max(0, len(image_files) - stats['total']), timing=metrics.to_dict())
+            atomic_write_text(str(stats_file), json.dumps(payload, indent=2))
+
+        def consume(results) -> None:
+            high_conf, medium_conf, low_conf = self.predictor.filter_by_confidence(
+                results, review_threshold
+            )
+            with metrics.stage("label_write"):
+                self.save_labels(high_conf, high_dir)
+                self.save_labels(medium_conf, medium_dir)
+                self.save_labels(low_conf, low_dir)
+
+            stats['total'] += len(results)
+            stats['high_conf'] += len(high_conf)
+            stats['medium_conf'] += len(medium_conf)
+            stats['low_conf'] += len(low_conf)
+            write_statistics(complete=False)
+
+        self._begin_staging(image_dir, output_dir)
+        try:
+            for results in self._iter_chunk_results(image_files, metrics):
+                consume(results)
+            video_frames = self.annotate_videos(image_dir, consume, metrics, frames_dir=Path(output_dir) / "frames")
+            if video_frames:
+                stats['video_frames'] = video_frames
+        finally:
+            self._end_staging()
+
+        write_statistics(complete=True)
+        stats = self.with_cascade_stats(stats)
         self.logger.info(f"Annotation complete: {stats}")
         return stats
 
@@ -68,15 +398,26 @@ class AutoAnnotator:
         skip_existing: bool = True,
         write_empty: bool = True,
         report_path: Optional[str] = None,
+        metrics: Optional[TaskMetrics] = None,
+        image_files: Optional[List[Path]] = None,
+        videos: Optional[bool] = None,
     ):
         """Annotate images and write YOLO-format labels directly into a labels directory.
 
         This mode is designed for incremental station/category datasets, where rerunning the
         command should only label new images by default.
 
-        Uses chunked processing to avoid GPU OOM errors.
+        Uses chunked processing to avoid GPU OOM errors; labels are written per chunk,
+        so an interrupted run resumes where it stopped when skip_existing is set.
+        Video clips in image_dir are annotated after the images as `<video>_<frame>`
+        labels (see annotate_videos). `image_files` restricts the run to a subset of
+        image_dir (e.g. one shard of a distributed run); clips are then left out
+        unless `videos` is set (by default they are annotated only for whole-directory runs).
         """
-        image_files = get_image_files(image_dir)
+        metrics = metrics or TaskMetrics(Path(image_dir).name)
+        self._reset_cascade()
+        with_videos = image_files is None if videos is None else videos
+        image_files = list(image_files) if image_files is not None else get_image_files(image_dir)
         labels_path = Path(labels_dir)
         ensure_dir(str(labels_path))
 
@@ -85,80 +426,88 @@ class AutoAnnotator:
             image_files = [p for p in image_files if p.stem not in existing]
 
         self.logger.info(f"Found {len(image_files)} images to annotate (skip_existing={skip_existing})")
-        if not image_files:
+        has_videos = with_videos and bool(
+            self.pending_videos(image_dir, labels_path if skip_existing else None)
+        )
+        if not image_files and not has_videos:
             return {"total": 0, "high_conf": 0, "medium_conf": 0, "low_conf": 0}
 
-        # Process in chunks to avoid OOM
-        chunk_size = self.config.get('auto_annotation', {}).get('chunk_size', 50)
-        all_results = []
-
-        total_chunks = (len(image_files) + chunk_size - 1) // chunk_size
-        self.logger.info(f"Processing {len(image_files)} images in {total_chunks} chunks of {chunk_size}")
-
-        for i in range(0, len(image_files), chunk_size):
-            chunk = image_files[i:i+chunk_size]
-            chunk_num = i // chunk_size + 1
-
-            self.logger.info(f"Processing chunk {chunk_num}/{total_chunks} ({len(chunk)} images)")
+        review_threshold = self.config["auto_annotation"]["review_threshold"]
+        stats = {"total": 0, "high_conf": 0, "medium_conf": 0, "low_conf": 0}
 
-            # Predict on chunk
-            results = self.predictor.predict_batch(chunk)
-            all_results.extend(results)
+        def consume(results) -> None:
+            high_conf, medium_conf, low_conf = self.predictor.filter_by_confidence(
+                results, review_threshold
+            )
+            with metrics.stage("label_write"):
+                for result in results:
+                    img_path = Path(result.path)
+                    label_file = labels_path / f"{img_path.stem}.txt"
+                    self.save_yolo_label(result, label_file, write_empty=write_empty)
 
-            # Clear GPU cache after each chunk
-            if torch.cuda.is_available():
-                torch.cuda.empty_cache()
+            stats["total"] += len(results)
+            stats["high_conf"] += len(high_conf)
+            stats["medium_conf"] += len(medium_conf)
+            stats["low_conf"] += len(low_conf)
 
-        review_threshold = self.config["auto_annotation"]["review_threshold"]
-        high_conf, medium_conf, low_conf = self.predictor.filter_by_confidence(
-            all_results, review_threshold
-        )
-
-        for result in tqdm(all_results, desc="Saving YOLO labels"):
-            img_path = Path(result.path)
-            label_file = labels_path / f"{img_path.stem}.txt"
-            self._save_single_yolo_label(result, label_file, write_empty=write_empty)
-
-        stats = {
-            "total": len(all_results),
-            "high_conf": len(high_conf),
-            "medium_conf": len(medium_conf),
-            "low_conf": len(low_conf),
-        }
+        self._begin_staging(image_dir, labels_dir)
+        try:
+            for results in self._iter_chunk_results(image_files, metrics):
+                consume(results)
+            if has_videos:
+                video_frames = self.annotate_videos(
+                    image_dir, consume, metrics,
+                    labels_dir=labels_path if skip_existing else None,
+                    frames_dir=labels_path.parent / "frames",
+                )
+                if video_frames:
+                    stats["video_frames"] = video_frames
+        finally:
+            self._end_staging()
 
+        stats = self.with_cascade_stats(stats)
+        if not stats["total"]:
+            # Nothing new (e.g. every clip was already done): keep the previous report
+            self.logger.info("No new images or video frames to annotate")
+            return stats
         report_file = Path(report_path) if report_path else (labels_path / "_auto_label_report.json")
         try:
             with open(report_file, "w", encoding="utf-8") as f:
-                json.dump(stats, f, indent=2, ensure_ascii=False)
+                json.dump(dict(stats, timing=metrics.to_dict()), f, indent=2, ensure_ascii=False)
         except Exception:
             self.logger.warning(f"Failed to write report: {report_file}", exc_info=True)
 
         self.logger.info(f"YOLO label writing complete: {stats}")
         return stats
     
-    def _save_labels(self, results, output_dir: Path):
+    @staticmethod
+    def _label_text(result) -> str:
+        lines = []
+        for box in result.boxes:
+            cls = int(box.cls[0])
+            xywhn = box.xywhn[0].tolist()
+            lines.append(f"{cls} {' '.join(map(str, xywhn))}\n")
+        return "".join(lines)
+
+    def _write_label_file(self, label_file: Path, text: str) -> None:
+        if self.label_writer is not None:
+            self.label_writer.write(label_file, text)
+            return
+        atomic_write_text(str(label_file), text)
+
+    def save_labels(self, results, output_dir: Path):
         """Save YOLO format labels"""
-        for result in tqdm(results, desc=f"Saving to {output_dir.name}"):
+        for result in results:
             if result.boxes is None or len(result.boxes) == 0:
                 continue
             
             img_path = Path(result.path)
             label_file = output_dir / f"{img_path.stem}.txt"
-            
-            with open(label_file, 'w') as f:
-                for box in result.boxes:
-                    cls = int(box.cls[0])
-                    xywhn = box.xywhn[0].tolist()
-                    f.write(f"{cls} {' '.join(map(str, xywhn))}\n")
+            self._write_label_file(label_file, self._label_text(result))
 
-    def _save_single_yolo_label(self, result, label_file: Path, *, write_empty: bool) -> None:
+    def save_yolo_label(self, result, label_file: Path, *, write_empty: bool) -> None:
         if result.boxes is None or len(result.boxes) == 0:
             if write_empty:
-                label_file.write_text("", encoding="utf-8")
+                self._write_label_file(label_file, "")
             return
-
-        with open(label_file, "w", encoding="utf-8") as f:
-            for box in result.boxes:
-                cls = int(box.cls[0])
-                xywhn = box.xywhn[0].tolist()
-                f.write(f"{cls} {' '.join(map(str, xywhn))}\n")
+        self._write_label_file(label_file, self._label_text(result))
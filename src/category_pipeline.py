@@ -1,21 +1,24 @@
 """Category-level pipeline utilities.
 
 Used by scripts to prepare data, train models, and/or auto-annotate per category.
+
+The annotator and trainer (torch / ultralytics) are imported inside the functions
+that need a model, so scanning, weight resolution and `--plan` stay fast.
 """
 
 from __future__ import annotations
 
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 import yaml
 
-from .auto_annotator import AutoAnnotator
 from .data_processor import DatasetOrganizer
-from .trainer import YOLOTrainer
 from .utils import ensure_dir
 from .model_registry import resolve_registry_weight
+from .quantization import select_annotation_weights
+from .staging import staged_data_root, staging_dir, staging_enabled
 
 
 @dataclass(frozen=True)
@@ -140,12 +143,32 @@ def resolve_weights(
     return None, "missing"
 
 
+def resolve_cascade_weights(
+    category_name: str,
+    config: Dict[str, Any],
+    *,
+    registry: Optional[Dict[str, str]] = None,
+    registry_path: Optional[str] = None,
+) -> Optional[Path]:
+    """Cheap first-pass model for cascade mode: registry entry `<category><registry_suffix>`.
+
+    Returns None when cascade is disabled or no such entry exists; the annotator then
+    falls back to `cascade.model` or to a low-imgsz pass of the full model.
+    """
+    cascade_cfg = config.get("auto_annotation", {}).get("cascade") or {}
+    if not cascade_cfg.get("enabled", False):
+        return None
+    suffix = cascade_cfg.get("registry_suffix", "_small")
+    return resolve_registry_weight(registry or {}, f"{category_name}{suffix}", registry_path=registry_path)
+
+
 def build_category_io(
     category_name: str,
     category_root: Path,
     *,
     use_pre_prefix: bool,
-    shared_model_root: Optional[str] = None
+    shared_model_root: Optional[str] = None,
+    config: Optional[Dict[str, Any]] = None,
 ) -> CategoryIO:
     if use_pre_prefix:
         raw_images_dir = category_root / "pre_images"
@@ -157,6 +180,9 @@ def build_category_io(
         unlabeled_images_dir = category_root.parent / f"{category_name}_unlabeled" / "images"
 
     data_root = category_root / "category"
+    if config is not None:
+        # Slow mount: keep the training split on local disk (see src/staging.py)
+        data_root = staged_data_root(config, category_root, data_root)
     if shared_model_root:
         model_root = Path(shared_model_root).expanduser().resolve() / category_name
     else:
@@ -176,9 +202,14 @@ def build_category_io(
     )
 
 
-def prepare_dataset(io: CategoryIO, config: Dict[str, Any], logger) -> None:
+def prepare_dataset(io: CategoryIO, config: Dict[str, Any], logger) -> Dict[str, List[str]]:
+    """Split the raw labeled set into `io.data_root`; returns the train/val stems."""
     ensure_dir(str(io.data_root))
-    organizer = DatasetOrganizer(str(io.data_root))
+    if staging_dir(config) in io.data_root.parents:
+        logger.info(f"[{io.category_name}] Training split staged on local disk: {io.data_root}")
+    staging_cfg = config.get("staging") or {}
+    workers = int(staging_cfg.get("workers", 8)) if staging_enabled(config, io.raw_images_dir) else 1
+    organizer = DatasetOrganizer(str(io.data_root), copy_workers=workers)
     train_count, val_count = organizer.split_dataset_from_dirs(
         images_dir=str(io.raw_images_dir),
         labels_dir=str(io.raw_labels_dir),
@@ -191,6 +222,7 @@ def prepare_dataset(io: CategoryIO, config: Dict[str, Any], logger) -> None:
     generated_config = io.data_root / "dataset_config.yaml"
     if generated_config.exists():
         io.dataset_config_path.write_text(generated_config.read_text(encoding="utf-8"), encoding="utf-8")
+    return organizer.last_split
 
 
 def train_model(
@@ -200,6 +232,8 @@ def train_model(
     *,
     init_weights: Optional[Path] = None,
 ) -> Path:
+    from .trainer import YOLOTrainer
+
     ensure_dir(str(io.model_root))
     trainer = YOLOTrainer(config)
     trainer.load_model(str(init_weights) if init_weights else None)
@@ -219,12 +253,19 @@ def auto_annotate(
     *,
     output_layout: str = "triage",
     skip_existing: bool = True,
+    metrics=None,
+    cascade_weights: Optional[Path] = None,
 ):
     if not io.unlabeled_images_dir or not io.unlabeled_images_dir.exists():
         logger.info(f"[{io.category_name}] No unlabeled data found, skipping auto-annotation")
         return None
 
-    annotator = AutoAnnotator(str(weights_path), config)
+    from .auto_annotator import AutoAnnotator
+
+    weights_path = select_annotation_weights(io, config, weights_path, logger)
+    annotator = AutoAnnotator(
+        str(weights_path), config, cascade_model_path=str(cascade_weights) if cascade_weights else None
+    )
     if output_layout == "yolo":
         ensure_dir(str(io.output_root))
         stats = annotator.annotate_images_yolo(
@@ -233,10 +274,11 @@ def auto_annotate(
             skip_existing=skip_existing,
             write_empty=True,
             report_path=str(io.output_root / "_auto_label_report.json"),
+            metrics=metrics,
         )
     elif output_layout == "triage":
         ensure_dir(str(io.output_root))
-        stats = annotator.annotate_images(str(io.unlabeled_images_dir), str(io.output_root))
+        stats = annotator.annotate_images(str(io.unlabeled_images_dir), str(io.output_root), metrics=metrics)
     else:
         raise ValueError(f"Unsupported output_layout: {output_layout}")
     logger.info(f"[{io.category_name}] Auto-annotation completed: {stats}")
@@ -7,6 +7,7 @@ share consistent behavior (train/annotate, model reuse, output layout).
 from __future__ import annotations
 
 import copy
+from contextlib import nullcontext
 from pathlib import Path
 from typing import Any, Dict, Optional
 
@@ -14,10 +15,42 @@ from .category_pipeline import (
     auto_annotate,
     build_category_io,
     prepare_dataset,
+    resolve_cascade_weights,
     resolve_weights,
     train_model,
 )
-from .model_registry import update_registry_for_category
+from .incremental import finetune_category, write_train_manifest
+from .model_registry import load_registry_metadata, update_registry_for_category, update_registry_metadata
+from .run_metrics import TaskMetrics
+from .utils import directory_fingerprint
+
+
+def _register_weights(
+    registry_path: str, io, config: Dict[str, Any], weights_path: Path, extra: Optional[Dict[str, Any]] = None
+) -> None:
+    """Record freshly trained weights together with the training-set fingerprint and imgsz."""
+    update_registry_for_category(
+        registry_path,
+        io.category_name,
+        str(weights_path),
+        train_fingerprint=directory_fingerprint(str(io.raw_labels_dir)),
+        imgsz=config["training"].get("img_size"),
+        extra=extra,
+    )
+
+
+def _finetune(io, config: Dict[str, Any], logger, base_weights: Path, registry_path: Optional[str]) -> Path:
+    """Incremental fine-tune; only an accepted (non-regressing) model is registered."""
+    train_fingerprint = None
+    if registry_path:
+        train_fingerprint = load_registry_metadata(registry_path).get(io.category_name, {}).get("train_fingerprint")
+    result = finetune_category(io, config, logger, base_weights, train_fingerprint=train_fingerprint)
+    if registry_path and result.status in ("accepted", "rejected"):
+        if result.accepted:
+            _register_weights(registry_path, io, config, result.weights, extra={"incremental": result.summary()})
+        else:
+            update_registry_metadata(registry_path, io.category_name, incremental=result.summary())
+    return result.weights
 
 
 def process_category(
@@ -40,13 +73,20 @@ def process_category(
     prefer_pretrained: bool = False,
     output_layout: str = "triage",
     skip_existing: bool = True,
+    metrics: Optional[TaskMetrics] = None,
 ) -> bool:
     """Process a single category: optionally train, and optionally auto-annotate.
 
     Notes:
     - When action is annotate-only, this runner does NOT require labeled data to exist.
     - When action includes training, it requires raw labeled dirs (images+labels) to exist.
+    - When `metrics` is given, stage timings of this category are recorded into it.
+    - train_init="incremental" fine-tunes reusable weights on labels added since their
+      train manifest instead of skipping training (see src/incremental.py).
     """
+    def stage(name: str):
+        return metrics.stage(name) if metrics is not None else nullcontext()
+
     try:
         logger.info(f"\n{'='*60}")
         logger.info(f"Processing category: {category_name}")
@@ -58,6 +98,7 @@ def process_category(
             category_root,
             use_pre_prefix=use_pre_prefix,
             shared_model_root=shared_model_root,
+            config=base_config,
         )
 
         should_train = action in ("train", "train_and_annotate")
@@ -79,48 +120,57 @@ def process_category(
         weights_path: Optional[Path] = None
 
         if should_train:
-            existing, source = resolve_weights(
-                category_name,
-                io.model_root,
-                registry=registry,
-                registry_path=registry_path,
-                model_map=model_map,
-                model_map_path=model_map_path,
-                pretrained_root=pretrained_root,
-                pretrained_model=pretrained_model,
-                prefer_pretrained=prefer_pretrained,
-            )
+            with stage("weight_resolution"):
+                existing, source = resolve_weights(
+                    category_name,
+                    io.model_root,
+                    registry=registry,
+                    registry_path=registry_path,
+                    model_map=model_map,
+                    model_map_path=model_map_path,
+                    pretrained_root=pretrained_root,
+                    pretrained_model=pretrained_model,
+                    prefer_pretrained=prefer_pretrained,
+                )
 
-            if existing and not force_train and source in ("trained", "registry"):
+            if existing and not force_train and source in ("trained", "registry") and train_init == "incremental":
+                logger.info(f"[{category_name}] Step 2: Incremental fine-tuning from existing weights...")
+                with stage("train"):
+                    weights_path = _finetune(io, category_config, logger, existing, registry_path)
+            elif existing and not force_train and source in ("trained", "registry"):
                 logger.info(f"[{category_name}] Reusing existing weights (skip training): {existing}")
                 weights_path = existing
             else:
                 logger.info(f"[{category_name}] Step 1: Preparing dataset...")
-                prepare_dataset(io, category_config, logger)
+                with stage("prepare"):
+                    split = prepare_dataset(io, category_config, logger)
 
                 init_weights = existing if (train_init == "reuse" and existing) else None
                 if init_weights:
                     logger.info(f"[{category_name}] Training init weights: {init_weights} (source={source})")
 
                 logger.info(f"[{category_name}] Step 2: Training model...")
-                weights_path = train_model(io, category_config, logger, init_weights=init_weights)
+                with stage("train"):
+                    weights_path = train_model(io, category_config, logger, init_weights=init_weights)
+                write_train_manifest(weights_path, io.raw_images_dir, io.raw_labels_dir, split["val"])
 
                 if registry_path:
-                    update_registry_for_category(registry_path, category_name, str(weights_path))
+                    _register_weights(registry_path, io, category_config, weights_path)
 
         if should_annotate:
             if not weights_path:
-                resolved, source = resolve_weights(
-                    category_name,
-                    io.model_root,
-                    registry=registry,
-                    registry_path=registry_path,
-                    model_map=model_map,
-                    model_map_path=model_map_path,
-                    pretrained_root=pretrained_root,
-                    pretrained_model=pretrained_model,
-                    prefer_pretrained=prefer_pretrained,
-                )
+                with stage("weight_resolution"):
+                    resolved, source = resolve_weights(
+                        category_name,
+                        io.model_root,
+                        registry=registry,
+                        registry_path=registry_path,
+                        model_map=model_map,
+                        model_map_path=model_map_path,
+                        pretrained_root=pretrained_root,
+                        pretrained_model=pretrained_model,
+                        prefer_pretrained=prefer_pretrained,
+                    )
                 if not resolved:
                     # First-run ergonomics: if the user requested annotate-only but no weights
                     # are available, and labeled data exists, train once to unblock annotation.
@@ -132,11 +182,14 @@ def process_category(
                             f"found labeled data, auto-training a model to proceed"
                         )
                         logger.info(f"[{category_name}] Step 1: Preparing dataset...")
-                        prepare_dataset(io, category_config, logger)
+                        with stage("prepare"):
+                            split = prepare_dataset(io, category_config, logger)
                         logger.info(f"[{category_name}] Step 2: Training model...")
-                        weights_path = train_model(io, category_config, logger, init_weights=None)
+                        with stage("train"):
+                            weights_path = train_model(io, category_config, logger, init_weights=None)
+                        write_train_manifest(weights_path, io.raw_images_dir, io.raw_labels_dir, split["val"])
                         if registry_path:
-                            update_registry_for_category(registry_path, category_name, str(weights_path))
+                            _register_weights(registry_path, io, category_config, weights_path)
                     else:
                         logger.error(
                             f"[{category_name}] No usable weights found for annotation (source={source}). "
@@ -156,6 +209,10 @@ def process_category(
                 logger,
                 output_layout=output_layout,
                 skip_existing=skip_existing,
+                metrics=metrics,
+                cascade_weights=resolve_cascade_weights(
+                    category_name, category_config, registry=registry, registry_path=registry_path
+                ),
             )
 
         logger.info(f"[{category_name}] [OK] Category processing completed successfully")
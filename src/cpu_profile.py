@@ -0,0 +1,244 @@
+"""CPU inference profile for YOLOPredictor.
+
+Used when no CUDA device is present. A profile fixes:
+- dtype: fp32, or bf16 autocast when the ISA has native bf16 (AVX512_BF16 / AMX)
+- channels_last memory format for the (fused) model
+- intra-op / inter-op thread counts
+- optional torch.compile of the underlying nn.Module
+
+Every prediction runs under `torch.inference_mode()` with Conv+BN fused. With
+`autotune` enabled, the first model load on a machine times each candidate
+combination on a synthetic image and caches the fastest one per machine, image
+size and model size, so later runs (and other processes) reuse the choice.
+
+Config (auto_annotation.cpu_profile):
+  enabled: true
+  autotune: true
+  compile: false          # also try torch.compile (slow first compile)
+  threads: null           # intra-op threads, null = usable CPU cores
+  interop_threads: 1
+  cache: null             # null = ~/.cache/auto-labeling/cpu_profile.json
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import platform
+import socket
+import statistics
+import time
+from contextlib import ExitStack, contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import torch
+
+from .utils import atomic_write_text, ensure_dir, file_lock, setup_logger
+
+logger = setup_logger(__name__)
+
+DEFAULT_CACHE_PATH = Path.home() / ".cache" / "auto-labeling" / "cpu_profile.json"
+
+
+@dataclass
+class CpuProfile:
+    dtype: str = "fp32"             # "fp32" | "bf16"
+    channels_last: bool = True
+    threads: int = 1
+    interop_threads: int = 1
+    compile: bool = False
+
+    def describe(self) -> str:
+        return (f"dtype={self.dtype}, channels_last={self.channels_last}, threads={self.threads}/"
+                f"{self.interop_threads}, compile={self.compile}")
+
+
+def usable_cpu_count() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def cpu_supports_bf16() -> bool:
+    """True when the CPU executes bf16 natively (oneDNN AVX512_BF16 / AMX)."""
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except (AttributeError, RuntimeError):
+        pass
+    try:
+        with open("/proc/cpuinfo", "r", encoding="utf-8") as f:
+            flags = f.read()
+        return "avx512_bf16" in flags or "amx_bf16" in flags
+    except OSError:
+        return False
+
+
+def machine_key() -> str:
+    """Identify the host/CPU/torch build a tuned profile is valid for."""
+    cpu = platform.processor() or platform.machine()
+    try:
+        with open("/proc/cpuinfo", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    cpu = line.split(":", 1)[1].strip()
+                    break
+    except OSError:
+        pass
+    return f"{socket.gethostname()}|{cpu}|{usable_cpu_count()}cpu|torch-{torch.__version__}"
+
+
+def default_profile(cfg: Dict[str, Any]) -> CpuProfile:
+    return CpuProfile(
+        dtype="bf16" if cpu_supports_bf16() else "fp32",
+        channels_last=True,
+        threads=int(cfg.get("threads") or usable_cpu_count()),
+        interop_threads=int(cfg.get("interop_threads") or 1),
+        compile=False,
+    )
+
+
+def apply_threads(profile: CpuProfile) -> None:
+    torch.set_num_threads(max(1, profile.threads))
+    try:
+        torch.set_num_interop_threads(max(1, profile.interop_threads))
+    except RuntimeError:
+        # Can only be set once, before any inter-op parallel work has started.
+        pass
+
+
+@contextmanager
+def inference_context(profile: Optional[CpuProfile]):
+    """inference_mode (+ bf16 autocast) around a predict call."""
+    with ExitStack() as stack:
+        stack.enter_context(torch.inference_mode())
+        if profile is not None and profile.dtype == "bf16":
+            stack.enter_context(torch.autocast("cpu", dtype=torch.bfloat16))
+        yield
+
+
+def _dummy_image(imgsz) -> np.ndarray:
+    height, width = imgsz if isinstance(imgsz, (list, tuple)) else (imgsz, imgsz)
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 255, size=(height, width, 3), dtype=np.uint8)
+
+
+def prepare_model(yolo, profile: CpuProfile, imgsz: int) -> None:
+    """Fuse, warm up and convert an ultralytics YOLO model for CPU inference.
+
+    The warm-up predict creates the ultralytics predictor; channels_last and
+    torch.compile are then applied to the nn.Module it wraps, so every later
+    predict call uses them.
+    """
+    apply_threads(profile)
+    try:
+        yolo.fuse()
+    except (TypeError, AttributeError):
+        # Exported (non-PyTorch) models are fused at export time.
+        pass
+
+    with inference_context(profile):
+        yolo.predict(source=[_dummy_image(imgsz)], imgsz=imgsz, device="cpu", verbose=False)
+
+    backend = getattr(getattr(yolo, "predictor", None), "model", None)
+    module = getattr(backend, "model", None)
+    if not isinstance(module, torch.nn.Module):
+        return
+    if profile.channels_last:
+        module.to(memory_format=torch.channels_last)
+    if profile.compile and hasattr(torch, "compile"):
+        backend.model = torch.compile(module)
+        with inference_context(profile):
+            yolo.predict(source=[_dummy_image(imgsz)], imgsz=imgsz, device="cpu", verbose=False)
+
+
+def _time_candidate(load_fn, profile: CpuProfile, imgsz: int, repeats: int) -> float:
+    yolo = load_fn()
+    prepare_model(yolo, profile, imgsz)
+    image = _dummy_image(imgsz)
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        with inference_context(profile):
+            yolo.predict(source=[image], imgsz=imgsz, device="cpu", verbose=False)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def candidate_profiles(cfg: Dict[str, Any]) -> List[CpuProfile]:
+    base = default_profile(cfg)
+    dtypes = ["fp32", "bf16"] if cpu_supports_bf16() else ["fp32"]
+    compiles = [False, True] if cfg.get("compile") and hasattr(torch, "compile") else [False]
+    return [
+        CpuProfile(dtype=d, channels_last=cl, threads=base.threads,
+                   interop_threads=base.interop_threads, compile=c)
+        for d in dtypes for cl in (False, True) for c in compiles
+    ]
+
+
+def _cache_key(imgsz: int, model_key: str, cfg: Dict[str, Any]) -> str:
+    threads = cfg.get("threads") or usable_cpu_count()
+    return f"{machine_key()}|imgsz={imgsz}|model={model_key}|threads={threads}|compile={bool(cfg.get('compile'))}"
+
+
+def _load_cache(path: Path) -> Dict[str, Any]:
+    if not path.exists():
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f) or {}
+    except (OSError, ValueError):
+        return {}
+
+
+def select_cpu_profile(load_fn, cfg: Dict[str, Any], imgsz: int, model_key: str, repeats: int = 3) -> CpuProfile:
+    """Return the cached tuned profile for this machine, autotuning it on first use.
+
+    Args:
+        load_fn: Callable returning a fresh ultralytics YOLO model
+        cfg: auto_annotation.cpu_profile config
+        imgsz: Inference image size
+        model_key: Identifies the model size/architecture (e.g. parameter count)
+    """
+    if not cfg.get("autotune", True):
+        return default_profile(cfg)
+
+    cache_path = Path(cfg.get("cache") or DEFAULT_CACHE_PATH)
+    key = _cache_key(imgsz, model_key, cfg)
+    cached = _load_cache(cache_path).get(key)
+    if cached:
+        return CpuProfile(**cached["profile"])
+
+    ensure_dir(str(cache_path.parent))
+    with file_lock(str(cache_path) + ".lock", timeout=3600):
+        # Another process may have finished tuning while we waited.
+        cache = _load_cache(cache_path)
+        if key in cache:
+            return CpuProfile(**cache[key]["profile"])
+
+        results = []
+        for profile in candidate_profiles(cfg):
+            try:
+                seconds = _time_candidate(load_fn, profile, imgsz, repeats)
+            except Exception as e:
+                logger.warning(f"CPU profile candidate failed ({profile.describe()}): {e}")
+                continue
+            logger.info(f"CPU profile candidate {profile.describe()}: {seconds * 1000:.1f} ms/img")
+            results.append((seconds, profile))
+
+        if not results:
+            return default_profile(cfg)
+
+        seconds, best = min(results, key=lambda r: r[0])
+        cache[key] = {
+            "profile": asdict(best),
+            "ms_per_image": round(seconds * 1000, 3),
+            "candidates": [dict(asdict(p), ms_per_image=round(s * 1000, 3)) for s, p in results],
+            "tuned_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        atomic_write_text(str(cache_path), json.dumps(cache, indent=2, ensure_ascii=False))
+        logger.info(f"Selected CPU profile {best.describe()} ({seconds * 1000:.1f} ms/img), cached in {cache_path}")
+        return best
@@ -3,6 +3,7 @@
 import os
 import shutil
 import random
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import List, Tuple
 from .utils import setup_logger, ensure_dir, get_image_files, save_config
@@ -11,9 +12,11 @@ from .utils import setup_logger, ensure_dir, get_image_files, save_config
 class DatasetOrganizer:
     """Organize and prepare dataset for YOLO training"""
     
-    def __init__(self, data_root: str = "./data"):
+    def __init__(self, data_root: str = "./data", copy_workers: int = 1):
         self.data_root = Path(data_root)
+        self.copy_workers = copy_workers  # >1 copies in parallel (slow network / 9p sources)
         self.logger = setup_logger(__name__)
+        self.last_split = {"train": [], "val": []}
 
     def split_dataset_from_dirs(
         self,
@@ -55,8 +58,9 @@ class DatasetOrganizer:
 
         self.logger.info(f"Train: {len(train_stems)}, Val: {len(val_stems)}")
 
-        self._copy_files(train_stems, image_dict, label_dict, "train")
-        self._copy_files(val_stems, image_dict, label_dict, "val")
+        self.copy_split(train_stems, image_dict, label_dict, "train")
+        self.copy_split(val_stems, image_dict, label_dict, "val")
+        self.last_split = {"train": train_stems, "val": val_stems}
 
         self._create_dataset_config(train_stems, label_dict)
 
@@ -109,27 +113,35 @@ class DatasetOrganizer:
         self.logger.info(f"Train: {len(train_stems)}, Val: {len(val_stems)}")
         
         # Copy files
-        self._copy_files(train_stems, image_dict, label_dict, "train")
-        self._copy_files(val_stems, image_dict, label_dict, "val")
+        self.copy_split(train_stems, image_dict, label_dict, "train")
+        self.copy_split(val_stems, image_dict, label_dict, "val")
         
         # Create dataset config
         self._create_dataset_config(train_stems, label_dict)
         
         return len(train_stems), len(val_stems)
     
-    def _copy_files(self, stems: List[str], image_dict: dict, 
+    def copy_split(self, stems: List[str], image_dict: dict,
                    label_dict: dict, split: str):
-        """Copy files to train/val directories"""
+        """Copy the image/label files of `stems` to `<data_root>/<split>/{images,labels}`"""
         img_dst = self.data_root / split / "images"
         lbl_dst = self.data_root / split / "labels"
         ensure_dir(img_dst)
         ensure_dir(lbl_dst)
         
+        copies = []
         for stem in stems:
             if stem in image_dict:
-                shutil.copy2(image_dict[stem], img_dst / image_dict[stem].name)
+                copies.append((image_dict[stem], img_dst / image_dict[stem].name))
             if stem in label_dict:
-                shutil.copy2(label_dict[stem], lbl_dst / label_dict[stem].name)
+                copies.append((label_dict[stem], lbl_dst / label_dict[stem].name))
+
+        if self.copy_workers > 1 and len(copies) > 1:
+            with ThreadPoolExecutor(max_workers=self.copy_workers) as pool:
+                list(pool.map(lambda pair: shutil.copy2(*pair), copies))
+        else:
+            for src, dst in copies:
+                shutil.copy2(src, dst)
     
     def _create_dataset_config(self, train_stems: List[str], label_dict: dict):
         """Create dataset.yaml for YOLO"""
@@ -0,0 +1,342 @@
+"""Compare predicted YOLO labels against reference (human) labels.
+
+A lightweight alternative to ultralytics `val()` for deciding whether a
+category model can be trusted: it works directly on two sets of YOLO label
+files (no dataset restructuring, no model), matches boxes per image with a
+vectorized IoU in NumPy and reports per-class precision / recall / AP50 /
+AP50-95, overall and per station.
+
+Label sources:
+- a flat label directory (`<dir>/*.txt`)
+- a station tree, walked recursively and restricted to label directories with a
+  given name (e.g. `pre_labels` for the reference, `labels` for predictions);
+  files are keyed by `<station>/<category>/<stem>` so both trees line up
+- a packed label index (`_label_index.npz` written by myutils/label_analyzer.py)
+
+Prediction files may carry a 6th column with the confidence, which is used to
+rank detections for AP. Without it every box ranks equally and AP degenerates
+to roughly precision x recall of the labels as written.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .utils import atomic_write_text, ensure_dir
+
+IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+_trapezoid = getattr(np, "trapezoid", None) or np.trapz      # numpy < 2.0 only has trapz
+_IGNORED_DIRS = {"backup"}
+
+
+def box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """IoU matrix between xyxy boxes a (N, 4) and b (M, 4)."""
+    tl = np.maximum(a[:, None, :2], b[None, :, :2])
+    br = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(br - tl, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+def xywh_to_xyxy(xywh: np.ndarray) -> np.ndarray:
+    half = xywh[:, 2:] / 2
+    return np.concatenate([xywh[:, :2] - half, xywh[:, :2] + half], axis=1)
+
+
+@dataclass
+class LabelSet:
+    """Boxes of many label files in flat arrays (one row per box)."""
+
+    keys: List[str]               # per file: "<station>/<category>/<stem>" or "<stem>"
+    stations: List[str]           # per file ("" when the source has no station level)
+    row_key: np.ndarray           # int64 per box -> keys
+    cls: np.ndarray               # int64 per box
+    xywhn: np.ndarray             # float32 (N, 4)
+    conf: Optional[np.ndarray]    # float32 per box, or None when no file had a confidence column
+
+
+def _parse_label_text(text: str) -> np.ndarray:
+    """(N, 5|6) float array of `cls cx cy w h [conf]` rows; segment lines keep their bbox part only."""
+    lines = [line.split() for line in text.splitlines() if line.strip()]
+    if not lines:
+        return np.zeros((0, 6), dtype=np.float32)
+    width = len(lines[0])
+    if width in (5, 6) and all(len(parts) == width for parts in lines):
+        rows = np.asarray(lines, dtype=np.float32)
+    else:
+        rows = np.asarray([parts[:5] for parts in lines if len(parts) >= 5], dtype=np.float32).reshape(-1, 5)
+    if rows.shape[1] == 5:
+        rows = np.concatenate([rows, np.full((len(rows), 1), np.nan, dtype=np.float32)], axis=1)
+    return rows
+
+
+def _label_files(root: Path, dir_name: Optional[str]) -> List[Tuple[str, str, Path]]:
+    """(key, station, path) of label files under root."""
+    if not dir_name:
+        with os.scandir(root) as it:
+            return sorted(
+                (Path(e.name).stem, "", Path(e.path))
+                for e in it
+                if e.name.endswith(".txt") and not e.name.startswith("_") and e.is_file()
+            )
+
+    found = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if not d.startswith(".") and d not in _IGNORED_DIRS]
+        current = Path(dirpath)
+        if current.name != dir_name:
+            continue
+        parts = current.relative_to(root).parts[:-1]
+        station = parts[0] if parts else ""
+        for name in filenames:
+            if name.endswith(".txt") and not name.startswith("_"):
+                found.append(("/".join(parts + (Path(name).stem,)), station, current / name))
+    return sorted(found)
+
+
+def _from_arrays(keys, stations, per_file: List[np.ndarray]) -> LabelSet:
+    counts = np.array([len(rows) for rows in per_file], dtype=np.int64)
+    rows = np.concatenate(per_file) if per_file else np.zeros((0, 6), dtype=np.float32)
+    conf = rows[:, 5]
+    return LabelSet(
+        keys=list(keys),
+        stations=list(stations),
+        row_key=np.repeat(np.arange(len(per_file), dtype=np.int64), counts),
+        cls=rows[:, 0].astype(np.int64),
+        xywhn=rows[:, 1:5].astype(np.float32),
+        conf=None if np.isnan(conf).all() else np.nan_to_num(conf, nan=1.0),
+    )
+
+
+def _load_index(path: Path) -> LabelSet:
+    with np.load(path, allow_pickle=False) as data:
+        files = data["files"].astype(str)
+        stations = data["stations"].astype(str)[data["file_station"]]
+        row_file = data["row_file"].astype(np.int64)
+        cls = data["cls"].astype(np.int64)
+        xywhn = data["xywhn"].astype(np.float32)
+    keys = []
+    for rel in files:
+        parts = rel.split("/")
+        keys.append("/".join(parts[:-2] + [Path(parts[-1]).stem]))
+    return LabelSet(keys=keys, stations=list(stations), row_key=row_file, cls=cls, xywhn=xywhn, conf=None)
+
+
+def load_labels(source: str, dir_name: Optional[str] = None, workers: Optional[int] = None) -> LabelSet:
+    """Load a label directory, a station tree (with `dir_name`) or a packed `.npz` label index.
+
+    Files are read by `workers` threads (default: one per CPU, up to 8), which mostly
+    helps on network filesystems.
+    """
+    path = Path(source)
+    if path.suffix == ".npz":
+        return _load_index(path)
+    if not path.is_dir():
+        raise FileNotFoundError(f"Label source not found: {source}")
+
+    entries = _label_files(path, dir_name)
+    if workers is None:
+        workers = min(8, os.cpu_count() or 1)
+
+    def read(item) -> np.ndarray:
+        with open(item[2], "r", encoding="utf-8") as f:
+            return _parse_label_text(f.read())
+
+    if workers and workers > 1 and len(entries) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            per_file = list(pool.map(read, entries, chunksize=256))
+    else:
+        per_file = [read(item) for item in entries]
+    return _from_arrays([e[0] for e in entries], [e[1] for e in entries], per_file)
+
+
+def _image_pairs(pred_image: np.ndarray, gt_image: np.ndarray, n_images: int) -> Tuple[np.ndarray, np.ndarray]:
+    """All (pred, gt) index pairs that belong to the same image, without a per-image loop."""
+    p_order = np.argsort(pred_image, kind="stable")
+    g_order = np.argsort(gt_image, kind="stable")
+    p_count = np.bincount(pred_image, minlength=n_images)
+    g_count = np.bincount(gt_image, minlength=n_images)
+    p_start = np.concatenate(([0], np.cumsum(p_count)[:-1]))
+    g_start = np.concatenate(([0], np.cumsum(g_count)[:-1]))
+
+    n_pairs = p_count * g_count
+    image = np.repeat(np.arange(n_images), n_pairs)
+    j = np.arange(int(n_pairs.sum())) - np.repeat(np.cumsum(n_pairs) - n_pairs, n_pairs)
+    gc = g_count[image]
+    return p_order[p_start[image] + j // gc], g_order[g_start[image] + j % gc]
+
+
+def match_predictions(
+    pred_xyxy: np.ndarray, pred_cls: np.ndarray, pred_image: np.ndarray,
+    gt_xyxy: np.ndarray, gt_cls: np.ndarray, gt_image: np.ndarray,
+    n_images: int, iou_thresholds: np.ndarray = IOU_THRESHOLDS,
+) -> np.ndarray:
+    """(P, T) bool: whether each prediction matches a same-class reference box of its image.
+
+    Works on all images at once: candidate pairs are every same-image, same-class
+    (pred, gt) pair; at each IoU threshold pairs are taken highest IoU first and each
+    reference box / prediction is used at most once.
+    """
+    correct = np.zeros((len(pred_xyxy), len(iou_thresholds)), dtype=bool)
+    if not len(pred_xyxy) or not len(gt_xyxy):
+        return correct
+    pi, gi = _image_pairs(pred_image, gt_image, n_images)
+    same = pred_cls[pi] == gt_cls[gi]
+    pi, gi = pi[same], gi[same]
+
+    # Pairwise IoU (one row per candidate pair)
+    a, b = pred_xyxy[pi], gt_xyxy[gi]
+    wh = np.clip(np.minimum(a[:, 2:], b[:, 2:]) - np.maximum(a[:, :2], b[:, :2]), 0, None)
+    inter = wh[:, 0] * wh[:, 1]
+    union = np.prod(a[:, 2:] - a[:, :2], axis=1) + np.prod(b[:, 2:] - b[:, :2], axis=1) - inter
+    iou = inter / np.maximum(union, 1e-9)
+
+    order = np.argsort(-iou, kind="stable")
+    pi, gi, iou = pi[order], gi[order], iou[order]
+    for t, threshold in enumerate(iou_thresholds):
+        keep = iou >= threshold            # still sorted by IoU, descending
+        p, g = pi[keep], gi[keep]
+        _, first = np.unique(g, return_index=True)
+        first = np.sort(first)
+        p = p[first]
+        _, first = np.unique(p, return_index=True)
+        correct[p[first], t] = True
+    return correct
+
+
+def average_precision(tp: np.ndarray, conf: np.ndarray, n_gt: int) -> np.ndarray:
+    """101-point interpolated AP per IoU threshold for one class (tp: (P, T) bool)."""
+    if n_gt == 0 or not len(tp):
+        return np.zeros(tp.shape[1])
+    order = np.argsort(-conf, kind="stable")
+    tpc = np.cumsum(tp[order], axis=0)
+    fpc = np.cumsum(~tp[order], axis=0)
+    recall = tpc / n_gt
+    precision = tpc / (tpc + fpc)
+    x = np.linspace(0, 1, 101)
+    aps = np.empty(tp.shape[1])
+    for t in range(tp.shape[1]):
+        # Precision drops to 0 right after the highest recall reached (not linearly to recall 1)
+        mrec = np.concatenate(([0.0], recall[:, t], recall[-1:, t], [1.0]))
+        mpre = np.concatenate(([1.0], precision[:, t], [0.0, 0.0]))
+        mpre = np.flip(np.maximum.accumulate(np.flip(mpre)))
+        aps[t] = _trapezoid(np.interp(x, mrec, mpre), x)
+    return aps
+
+
+def _class_metrics(tp, conf, pred_cls, gt_cls, names=None) -> Dict[Any, Dict[str, Any]]:
+    metrics = {}
+    for c in np.unique(np.concatenate([pred_cls, gt_cls])):
+        mask = pred_cls == c
+        n_gt = int((gt_cls == c).sum())
+        n_pred = int(mask.sum())
+        hits = int(tp[mask, 0].sum())
+        ap = average_precision(tp[mask], conf[mask], n_gt)
+        metrics[int(c)] = {
+            "name": names.get(int(c), str(int(c))) if names else str(int(c)),
+            "gt": n_gt,
+            "pred": n_pred,
+            "precision": round(hits / n_pred, 4) if n_pred else 0.0,
+            "recall": round(hits / n_gt, 4) if n_gt else 0.0,
+            "ap50": round(float(ap[0]), 4),
+            "ap50_95": round(float(ap.mean()), 4),
+        }
+    return metrics
+
+
+def _summary(tp, pred_cls, gt_cls, per_class) -> Dict[str, Any]:
+    n_pred, n_gt = len(pred_cls), len(gt_cls)
+    hits = int(tp[:, 0].sum()) if len(tp) else 0
+    scored = [m for m in per_class.values() if m["gt"]]
+    return {
+        "gt": n_gt,
+        "pred": n_pred,
+        "precision": round(hits / n_pred, 4) if n_pred else 0.0,
+        "recall": round(hits / n_gt, 4) if n_gt else 0.0,
+        "map50": round(float(np.mean([m["ap50"] for m in scored])), 4) if scored else 0.0,
+        "map50_95": round(float(np.mean([m["ap50_95"] for m in scored])), 4) if scored else 0.0,
+    }
+
+
+def evaluate(reference: LabelSet, predicted: LabelSet, names: Optional[Dict[int, str]] = None) -> Dict[str, Any]:
+    """Match predictions to reference labels per image and compute per-class / per-station metrics.
+
+    Images are the union of both sets: a reference file without predictions counts
+    all its boxes as misses, a prediction file without reference counts as false positives.
+    """
+    keys = sorted(set(reference.keys) | set(predicted.keys))
+    image_index = {key: i for i, key in enumerate(keys)}
+    station_of = dict(zip(predicted.keys, predicted.stations))
+    station_of.update(zip(reference.keys, reference.stations))
+    stations = sorted(set(station_of.values()))
+    station_index = {s: i for i, s in enumerate(stations)}
+    image_station = np.array([station_index[station_of[key]] for key in keys], dtype=np.int64)
+
+    ref_image = np.array([image_index[k] for k in reference.keys], dtype=np.int64)[reference.row_key]
+    pred_image = np.array([image_index[k] for k in predicted.keys], dtype=np.int64)[predicted.row_key]
+
+    tp = match_predictions(
+        xywh_to_xyxy(predicted.xywhn), predicted.cls, pred_image,
+        xywh_to_xyxy(reference.xywhn), reference.cls, ref_image,
+        len(keys),
+    )
+    conf = predicted.conf if predicted.conf is not None else np.ones(len(predicted.cls), dtype=np.float32)
+    pred_cls, gt_cls = predicted.cls, reference.cls
+    pred_st, gt_st = image_station[pred_image], image_station[ref_image]
+
+    per_class = _class_metrics(tp, conf, pred_cls, gt_cls, names)
+    report: Dict[str, Any] = {
+        "images": len(keys),
+        "reference_images": len(reference.keys),
+        "predicted_images": len(predicted.keys),
+        "overall": _summary(tp, pred_cls, gt_cls, per_class),
+        "per_class": per_class,
+        "per_station": {},
+        "ranked_by_confidence": predicted.conf is not None,
+    }
+    if len(stations) > 1 or (stations and stations[0]):
+        for name, idx in station_index.items():
+            pm, gm = pred_st == idx, gt_st == idx
+            st_class = _class_metrics(tp[pm], conf[pm], pred_cls[pm], gt_cls[gm], names)
+            report["per_station"][name or "(root)"] = dict(
+                _summary(tp[pm], pred_cls[pm], gt_cls[gm], st_class), per_class=st_class
+            )
+    return report
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    header = f"{'class':<24} {'gt':>7} {'pred':>7} {'P':>7} {'R':>7} {'AP50':>7} {'AP50-95':>8}"
+    print(f"Images: {report['images']} (reference {report['reference_images']}, "
+          f"predicted {report['predicted_images']})")
+    if not report["ranked_by_confidence"]:
+        print("Note: predictions have no confidence column; AP ranks all boxes equally")
+    print(header)
+    print("-" * len(header))
+    for m in report["per_class"].values():
+        print(f"{m['name']:<24} {m['gt']:>7} {m['pred']:>7} {m['precision']:>7.3f} {m['recall']:>7.3f} "
+              f"{m['ap50']:>7.3f} {m['ap50_95']:>8.3f}")
+    o = report["overall"]
+    print("-" * len(header))
+    print(f"{'all':<24} {o['gt']:>7} {o['pred']:>7} {o['precision']:>7.3f} {o['recall']:>7.3f} "
+          f"{o['map50']:>7.3f} {o['map50_95']:>8.3f}")
+
+    if report["per_station"]:
+        print()
+        print(header.replace("class  ", "station"))
+        print("-" * len(header))
+        for station, m in report["per_station"].items():
+            print(f"{station:<24} {m['gt']:>7} {m['pred']:>7} {m['precision']:>7.3f} {m['recall']:>7.3f} "
+                  f"{m['map50']:>7.3f} {m['map50_95']:>8.3f}")
+
+
+def write_report(report: Dict[str, Any], path: str) -> None:
+    ensure_dir(str(Path(path).parent))
+    atomic_write_text(path, json.dumps(report, indent=2, ensure_ascii=False))
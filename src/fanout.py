@@ -0,0 +1,256 @@
+"""Decode-once, multi-model annotation for categories that share images.
+
+Several categories often point at the same physical images (e.g. pointer
+labels copied into `pointer_rect_oiltemper-X`), and annotating them one by one
+decodes every shared image once per category. This module:
+
+1. Groups annotation tasks whose image sets overlap, by file identity
+   (`path`: same device/inode, which also covers symlinks and hard links) or
+   by content (`content`: same size and SHA-256).
+2. Walks the union of a group's pending images in chunks, decoding each image
+   once, and runs the decoded batch through every model that needs it. Tasks
+   that share the same weights share a single prediction.
+3. Writes each task's labels (and report) into its own output directory,
+   using the task's own file stem.
+
+Each task's weights should already be the ones annotation would use (e.g. the
+INT8 model chosen by select_annotation_weights); with a cascade model the
+decoded chunk goes through the cascade of that model pair.
+
+Video clips are not shared this way: each task's clips are annotated by its own
+model after the image pass (AutoAnnotator.annotate_videos).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .auto_annotator import AutoAnnotator
+from .predictor import YOLOPredictor
+from .run_metrics import TaskMetrics
+from .staging import open_staging
+from .utils import ensure_dir, file_sha256, get_image_files, setup_logger
+
+FANOUT_MODES = ("path", "content")
+
+
+@dataclass
+class FanoutTask:
+    key: str                          # e.g. "<station>/<category>"
+    images_dir: Path
+    output_dir: Path                  # yolo: labels dir; triage: output root (labels/<bucket>_conf)
+    weights: Path
+    output_layout: str = "yolo"
+    cascade_weights: Optional[Path] = None   # cheap first-pass model (cascade mode)
+    pending: Dict[Tuple, Path] = field(default_factory=dict)   # image identity -> this task's file
+
+
+def image_identity(path: Path, mode: str) -> Tuple:
+    st = os.stat(path)
+    if mode == "path":
+        return ("inode", st.st_dev, st.st_ino)
+    return ("sha256", st.st_size, file_sha256(str(path)))
+
+
+def _pending_images(task: FanoutTask, skip_existing: bool) -> List[Path]:
+    images = get_image_files(str(task.images_dir))
+    if skip_existing and task.output_layout == "yolo" and task.output_dir.exists():
+        existing = {p.stem for p in task.output_dir.glob("*.txt")}
+        images = [p for p in images if p.stem not in existing]
+    return images
+
+
+def group_tasks(tasks: List[FanoutTask], mode: str = "path", skip_existing: bool = True) -> List[List[FanoutTask]]:
+    """Fill each task's pending images and group tasks whose pending image sets overlap."""
+    if mode not in FANOUT_MODES:
+        raise ValueError(f"Unsupported fan-out mode: {mode} (expected one of {FANOUT_MODES})")
+
+    parent = list(range(len(tasks)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    owner: Dict[Tuple, int] = {}
+    for idx, task in enumerate(tasks):
+        task.pending = {}
+        for path in _pending_images(task, skip_existing):
+            ident = image_identity(path, mode)
+            task.pending.setdefault(ident, path)
+            if ident in owner:
+                parent[find(idx)] = find(owner[ident])
+            else:
+                owner[ident] = idx
+
+    groups: Dict[int, List[FanoutTask]] = {}
+    for idx, task in enumerate(tasks):
+        groups.setdefault(find(idx), []).append(task)
+    return list(groups.values())
+
+
+class FanoutAnnotator:
+    """Annotate a group of tasks sharing images, decoding each image once."""
+
+    def __init__(self, tasks: List[FanoutTask], config: dict, *, write_empty: bool = True,
+                 skip_existing: bool = True):
+        self.tasks = tasks
+        self.config = config
+        self.write_empty = write_empty
+        self.skip_existing = skip_existing
+        self.logger = setup_logger(__name__)
+        # One annotator (model) per distinct weights file / cascade model pair
+        self.annotators: Dict[str, AutoAnnotator] = {}
+        for task in tasks:
+            if self._annotator_key(task) not in self.annotators:
+                self.annotators[self._annotator_key(task)] = AutoAnnotator(
+                    str(task.weights), config,
+                    cascade_model_path=str(task.cascade_weights) if task.cascade_weights else None,
+                )
+
+    @staticmethod
+    def _annotator_key(task: FanoutTask) -> str:
+        return f"{task.weights}|{task.cascade_weights or ''}"
+
+    def _write(self, task: FanoutTask, annotator: AutoAnnotator, result, image_path: Path, stats: dict) -> None:
+        review_threshold = self.config["auto_annotation"]["review_threshold"]
+        high, medium, low = annotator.predictor.filter_by_confidence([result], review_threshold)
+        bucket = "high_conf" if high else "medium_conf" if medium else "low_conf"
+        stats[bucket] += 1
+        stats["total"] += 1
+
+        # Results carry the path of the first task that listed the image; use this task's stem.
+        result.path = str(image_path)
+        if task.output_layout == "yolo":
+            annotator.save_yolo_label(
+                result, task.output_dir / f"{image_path.stem}.txt", write_empty=self.write_empty
+            )
+        else:
+            annotator.save_labels([result], task.output_dir / "labels" / bucket)
+
+    def _run_chunks(self, union, idents, stats, metrics: TaskMetrics, staging, writer) -> None:
+        """Decode the union chunk by chunk (from local copies when staged) and run every model on it."""
+        auto_cfg = self.config.get("auto_annotation", {})
+        chunk_size = max(1, int(auto_cfg.get("chunk_size", 50)))
+        img_size = auto_cfg.get("img_size", 640)
+        lookahead = max(0, int((self.config.get("staging") or {}).get("lookahead_chunks", 2)))
+
+        for i in range(0, len(idents), chunk_size):
+            chunk = idents[i:i + chunk_size]
+            paths = [union[ident] for ident in chunk]
+            if staging is not None:
+                staging.prefetch([union[ident] for ident in idents[i:i + chunk_size * (1 + lookahead)]])
+                with metrics.stage("staging"):
+                    paths = staging.fetch(paths)
+            start = time.perf_counter()
+            loaded = YOLOPredictor.load_images(
+                paths, img_size, auto_cfg.get("decode_workers", 4), reduced=auto_cfg.get("reduced_decode", True)
+            )
+            metrics.add_stage("decode", time.perf_counter() - start)
+            metrics.images += len(chunk)
+            if staging is not None:
+                staging.release(paths)
+
+            for key, annotator in self.annotators.items():
+                tasks = [t for t in self.tasks if self._annotator_key(t) == key]
+                positions = [j for j, ident in enumerate(chunk) if any(ident in t.pending for t in tasks)]
+                if not positions:
+                    continue
+
+                subset = [loaded[j] for j in positions]
+                results = annotator.predict_images(subset, metrics, count_images=False)
+
+                with metrics.stage("label_write"):
+                    for j, result in zip(positions, results):
+                        for task in tasks:
+                            image_path = task.pending.get(chunk[j])
+                            if image_path is not None:
+                                self._write(task, annotator, result, image_path, stats[task.key])
+            if writer is not None:
+                writer.flush()
+
+    def _run_videos(self, stats, metrics: TaskMetrics, staging) -> None:
+        """Annotate each task's video clips with its own model."""
+        for task in self.tasks:
+            annotator = self.annotators[self._annotator_key(task)]
+
+            def consume(results, task=task, annotator=annotator) -> None:
+                with metrics.stage("label_write"):
+                    for result in results:
+                        self._write(task, annotator, result, Path(result.path), stats[task.key])
+
+            yolo = task.output_layout == "yolo"
+            annotator.staging = staging
+            try:
+                annotator.annotate_videos(
+                    task.images_dir, consume, metrics,
+                    labels_dir=task.output_dir if yolo and self.skip_existing else None,
+                    frames_dir=(task.output_dir.parent if yolo else task.output_dir) / "frames",
+                )
+            finally:
+                annotator.staging = None
+
+    def run(self, metrics: Optional[TaskMetrics] = None) -> Dict[str, dict]:
+        metrics = metrics or TaskMetrics("fanout")
+
+        for task in self.tasks:
+            if task.output_layout == "yolo":
+                ensure_dir(str(task.output_dir))
+            else:
+                for bucket in ("high_conf", "medium_conf", "low_conf"):
+                    ensure_dir(str(task.output_dir / "labels" / bucket))
+
+        # Union of pending images, in first-seen order
+        union: Dict[Tuple, Path] = {}
+        for task in self.tasks:
+            for ident, path in task.pending.items():
+                union.setdefault(ident, path)
+        idents = list(union)
+
+        stats = {task.key: {"total": 0, "high_conf": 0, "medium_conf": 0, "low_conf": 0} for task in self.tasks}
+        per_task_images = sum(len(t.pending) for t in self.tasks)
+        self.logger.info(
+            f"Fan-out over {len(self.tasks)} tasks / {len(self.annotators)} models: "
+            f"{len(idents)} unique images (vs {per_task_images} decodes one task at a time)"
+        )
+
+        staging, writer = open_staging(self.config, self.tasks[0].images_dir, self.tasks[0].output_dir)
+        for annotator in self.annotators.values():
+            annotator.label_writer = writer
+        try:
+            self._run_chunks(union, idents, stats, metrics, staging, writer)
+            self._run_videos(stats, metrics, staging)
+        finally:
+            for annotator in self.annotators.values():
+                annotator.label_writer = None
+            if writer is not None:
+                writer.close()
+            if staging is not None:
+                staging.close()
+                self.logger.info(f"Staging: {staging.stats}")
+
+        for task in self.tasks:
+            annotator = self.annotators[self._annotator_key(task)]
+            report = dict(annotator.with_cascade_stats(stats[task.key]), fanout={
+                "tasks": [t.key for t in self.tasks],
+                "unique_images": len(idents),
+                "decodes_saved": per_task_images - len(idents),
+            }, timing=metrics.to_dict())
+            if task.output_layout == "yolo":
+                report_file = task.output_dir / "_auto_label_report.json"
+            else:
+                report_file = task.output_dir / "statistics.json"
+            try:
+                with open(report_file, "w", encoding="utf-8") as f:
+                    json.dump(report, f, indent=2, ensure_ascii=False)
+            except Exception:
+                self.logger.warning(f"Failed to write report: {report_file}", exc_info=True)
+            self.logger.info(f"[{task.key}] Fan-out annotation complete: {stats[task.key]}")
+
+        return stats
@@ -0,0 +1,282 @@
+"""Image loading for annotation.
+
+Station frames are often 8-12MP while inference runs at `img_size` (640), so a
+full JPEG decode mostly produces pixels that are immediately downscaled.
+`load_image` asks libjpeg for a DCT-domain reduced decode (1/2, 1/4 or 1/8)
+at the smallest scale whose long side is still >= imgsz, and reports the
+scale factor so detections can be mapped back onto the original frame.
+
+Uncompressed BMP and TIFF frames are memory-mapped instead: the pixel data
+is viewed in place as a NumPy array (BMP bottom-up rows and row padding are
+handled through strides) and resized straight to `img_size`, so the file is
+never copied into Python bytes or a full-size array.
+
+Other formats (and files the fast paths cannot handle) are decoded at full
+size with OpenCV, the same way ultralytics reads image files.
+
+`read_image_size` reads only the header (plus EXIF orientation), for callers
+that need the frame geometry before decoding, e.g. rectangular batching.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Tuple
+
+import struct
+
+import cv2
+import numpy as np
+
+JPEG_SUFFIXES = {".jpg", ".jpeg"}
+BMP_SUFFIXES = {".bmp"}
+TIFF_SUFFIXES = {".tif", ".tiff"}
+_DCT_SCALES = (8, 4, 2)
+# EXIF orientations that swap width and height
+_TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+
+
+@dataclass
+class LoadedImage:
+    path: Path
+    image: np.ndarray                 # BGR, HxWx3
+    orig_size: Tuple[int, int]        # (width, height) of the full-resolution image
+    scale: float = 1                  # original pixels per decoded pixel
+
+    @property
+    def reduced(self) -> bool:
+        return self.scale > 1
+
+
+def target_size(imgsz) -> int:
+    """Long side to decode for: `imgsz` itself, or the larger side of an [h, w] size."""
+    if isinstance(imgsz, (list, tuple)):
+        return int(max(imgsz))
+    return int(imgsz)
+
+
+def dct_scale_for(width: int, height: int, imgsz: int) -> int:
+    """Largest JPEG DCT reduction (8/4/2) that keeps the long side >= imgsz, else 1."""
+    long_side = max(width, height)
+    for scale in _DCT_SCALES:
+        if -(-long_side // scale) >= imgsz:
+            return scale
+    return 1
+
+
+def read_image_full(path: Path) -> np.ndarray:
+    """Full-resolution BGR decode (unicode-safe, like ultralytics' imread)."""
+    image = cv2.imdecode(np.fromfile(str(path), np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError(f"Failed to decode image: {path}")
+    return image
+
+
+def read_image_size(path) -> Optional[Tuple[int, int]]:
+    """(width, height) as displayed (EXIF orientation applied) from the file header, or None if unreadable."""
+    from PIL import Image
+
+    try:
+        with Image.open(path) as img:
+            width, height = img.size
+            orientation = img.getexif().get(0x0112, 1)
+    except (OSError, SyntaxError, ValueError):
+        return None
+    if orientation in _TRANSPOSED_ORIENTATIONS:
+        width, height = height, width
+    return width, height
+
+
+def _load_jpeg_reduced(path: Path, imgsz: int):
+    from PIL import Image, ImageOps
+
+    with Image.open(path) as img:
+        width, height = img.size
+        scale = dct_scale_for(width, height, imgsz)
+        if scale == 1 or img.format != "JPEG":
+            return None
+
+        orientation = img.getexif().get(0x0112, 1)
+        img.draft("RGB", (-(-width // scale), -(-height // scale)))
+        # draft() may pick a smaller reduction than requested; derive the one used.
+        actual = width / img.size[0]
+        scale = min((s for s in (1, 2, 4, 8)), key=lambda s: abs(s - actual))
+        if scale == 1:
+            return None
+        img = ImageOps.exif_transpose(img).convert("RGB")
+        image = np.asarray(img)[:, :, ::-1].copy()
+
+    if orientation in _TRANSPOSED_ORIENTATIONS:
+        width, height = height, width
+    return image, (width, height), scale
+
+
+def _bmp_view(mm: np.memmap) -> Optional[np.ndarray]:
+    """HxWx3 BGR (24-bit) or HxWx4 BGRX (32-bit) view of an uncompressed BMP, or None for other variants."""
+    if mm.size < 54 or bytes(mm[:2]) != b"BM":
+        return None
+    pixel_offset, header_size = struct.unpack_from("<II", mm, 10)
+    if header_size < 40:
+        return None                       # OS/2 BITMAPCOREHEADER
+    width, height, _planes, bpp, compression = struct.unpack_from("<iiHHI", mm, 18)
+    if compression != 0 or bpp not in (24, 32) or width <= 0 or height == 0:
+        return None                       # RLE / bitfields / palette images go through OpenCV
+    rows = abs(height)
+    stride = ((bpp * width + 31) // 32) * 4
+    if pixel_offset + stride * rows > mm.size:
+        return None
+    channels = bpp // 8
+    view = np.ndarray(
+        shape=(rows, width, channels), dtype=np.uint8, buffer=mm, offset=pixel_offset, strides=(stride, channels, 1)
+    )
+    # Positive height means rows are stored bottom-up; flip through a negative stride.
+    return view[::-1] if height > 0 else view
+
+
+_TIFF_TYPES = {3: "H", 4: "I"}
+
+
+def _tiff_view(mm: np.memmap) -> Optional[Tuple[np.ndarray, int]]:
+    """(HxWxC view, photometric) of a single-image uncompressed 8-bit chunky TIFF, or None."""
+    if mm.size < 8:
+        return None
+    order = {b"II": "<", b"MM": ">"}.get(bytes(mm[:2]))
+    if order is None or struct.unpack_from(f"{order}H", mm, 2)[0] != 42:
+        return None                       # not TIFF / BigTIFF
+    ifd = struct.unpack_from(f"{order}I", mm, 4)[0]
+    (count,) = struct.unpack_from(f"{order}H", mm, ifd)
+    tags = {}
+    for i in range(count):
+        tag, typ, n, value = struct.unpack_from(f"{order}HHI4s", mm, ifd + 2 + 12 * i)
+        code = _TIFF_TYPES.get(typ)
+        if code is None:
+            continue
+        size = struct.calcsize(code) * n
+        data = value if size <= 4 else bytes(mm[struct.unpack(f"{order}I", value)[0]:][:size])
+        tags[tag] = struct.unpack_from(f"{order}{n}{code}", data)
+
+    width, height = tags.get(256, (0,))[0], tags.get(257, (0,))[0]
+    samples = tags.get(277, (1,))[0]
+    if (
+        tags.get(259, (1,))[0] != 1           # compression
+        or tags.get(284, (1,))[0] != 1        # planar configuration (chunky)
+        or tags.get(274, (1,))[0] != 1        # orientation (top-left)
+        or any(b != 8 for b in tags.get(258, (8,)))
+        or samples not in (1, 3, 4)
+        or not width or not height
+    ):
+        return None
+    photometric = tags.get(262, (2,))[0]
+    if (samples == 1) != (photometric in (0, 1)):
+        return None
+
+    offsets, counts = tags.get(273), tags.get(279)
+    if not offsets or not counts or len(offsets) != len(counts):
+        return None
+    # Strips must be stored back to back to be viewed as one array
+    if any(offsets[i] + counts[i] != offsets[i + 1] for i in range(len(offsets) - 1)):
+        return None
+    row = width * samples
+    if offsets[0] + row * height > mm.size:
+        return None
+    view = np.ndarray(
+        shape=(height, width, min(samples, 3)), dtype=np.uint8, buffer=mm, offset=offsets[0],
+        strides=(row, samples, 1),
+    )
+    return view, photometric
+
+
+def _load_mapped(path: Path, imgsz: int) -> Optional[LoadedImage]:
+    """Memory-map an uncompressed BMP/TIFF and resize its pixels straight to `imgsz`."""
+    mm = np.memmap(path, dtype=np.uint8, mode="r")
+    convert = None
+    if path.suffix.lower() in BMP_SUFFIXES:
+        view = _bmp_view(mm)
+        if view is not None and view.shape[2] == 4:
+            convert = cv2.COLOR_BGRA2BGR
+    else:
+        mapped = _tiff_view(mm)
+        if mapped is None:
+            return None
+        view, photometric = mapped
+        if view.shape[2] == 1:
+            convert = cv2.COLOR_GRAY2BGR
+            view = view[:, :, 0]
+            if photometric == 0:                # WhiteIsZero
+                convert = "invert"
+        else:
+            convert = cv2.COLOR_RGB2BGR
+    if view is None:
+        return None
+
+    height, width = view.shape[:2]
+    scale = max(width, height) / imgsz
+    if scale > 1:
+        size = (max(1, round(width / scale)), max(1, round(height / scale)))
+        if view.strides[0] < 0:
+            # Resize the rows as stored, then flip the (small) result
+            image = cv2.resize(view[::-1], size, interpolation=cv2.INTER_LINEAR)[::-1]
+        else:
+            image = cv2.resize(view, size, interpolation=cv2.INTER_LINEAR)
+        # Effective scale after rounding to whole pixels (x and y agree to < 1px)
+        scale = width / size[0]
+    else:
+        image, scale = view, 1
+    image = np.ascontiguousarray(image)
+
+    if convert == "invert":
+        image = cv2.cvtColor(255 - image, cv2.COLOR_GRAY2BGR)
+    elif convert is not None:
+        image = cv2.cvtColor(image, convert)
+    return LoadedImage(path=path, image=image, orig_size=(width, height), scale=scale)
+
+
+def load_image(path, imgsz, reduce_jpeg: bool = True, map_uncompressed: bool = True) -> LoadedImage:
+    """Load an image for inference at `imgsz` (an int or an [h, w] list, see target_size).
+
+    JPEGs are decoded at a reduced DCT scale and uncompressed BMP/TIFF files are
+    memory-mapped and resized in place when possible.
+    """
+    path = Path(path)
+    imgsz = target_size(imgsz)
+    suffix = path.suffix.lower()
+    if map_uncompressed and suffix in BMP_SUFFIXES | TIFF_SUFFIXES:
+        try:
+            loaded = _load_mapped(path, imgsz)
+        except (OSError, ValueError, struct.error):
+            loaded = None
+        if loaded is not None:
+            return loaded
+
+    if reduce_jpeg and suffix in JPEG_SUFFIXES:
+        try:
+            loaded = _load_jpeg_reduced(path, imgsz)
+        except (OSError, SyntaxError):
+            loaded = None
+        if loaded is not None:
+            image, orig_size, scale = loaded
+            return LoadedImage(path=path, image=image, orig_size=orig_size, scale=scale)
+
+    image = read_image_full(path)
+    height, width = image.shape[:2]
+    return LoadedImage(path=path, image=image, orig_size=(width, height), scale=1)
+
+
+def restore_original_geometry(result, loaded: LoadedImage) -> None:
+    """Point an ultralytics Results object back at the source file and its original size.
+
+    Boxes predicted on a reduced decode are scaled by the DCT factor, so
+    `boxes.xywhn` is normalized against the full-resolution dimensions.
+    """
+    result.path = str(loaded.path)
+    if not loaded.reduced:
+        return
+
+    width, height = loaded.orig_size
+    result.orig_shape = (height, width)
+    if result.boxes is None:
+        return
+    data = result.boxes.data.clone()
+    data[:, :4] *= loaded.scale
+    result.update(boxes=data)
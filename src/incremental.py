@@ -0,0 +1,357 @@
+"""Incremental fine-tuning of a category model when new labels arrive.
+
+Every training run records a *train manifest* next to its weights
+(`weights/train_manifest.json`): a content hash per label stem of the labeled
+set it was trained on, plus the stems of its val split. With
+`--train-init incremental`, a category that already has weights is not skipped
+or retrained from scratch; instead:
+
+1. the current `pre_labels` are diffed against the manifest (new + changed stems)
+2. a small dataset is built from the new samples plus a random replay sample of
+   old training samples (so the model does not forget them); val is the
+   recorded val split plus a share of the new samples
+3. the checkpoint is fine-tuned on it for a short schedule (`training.incremental`)
+4. base and candidate are validated on the same val set; the candidate replaces
+   `train/weights/best.pt` (and is registered) only if mAP50-95 did not drop by
+   more than `max_regression`
+
+Diffing and dataset planning only read files; ultralytics is imported when a
+model is actually validated or trained.
+"""
+
+from __future__ import annotations
+
+import copy
+import hashlib
+import json
+import math
+import os
+import random
+import shutil
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import yaml
+
+from .data_processor import DatasetOrganizer
+from .utils import atomic_write_text, directory_fingerprint, ensure_dir, get_image_files, save_config
+
+MANIFEST_NAME = "train_manifest.json"
+MANIFEST_VERSION = 1
+
+DEFAULT_INCREMENTAL = {
+    "epochs": 30,
+    "lr0": None,
+    "warmup_epochs": 0,
+    "replay_ratio": 2.0,
+    "min_replay": 32,
+    "min_new_labels": 1,
+    "max_regression": 0.0,
+}
+
+
+def incremental_settings(config: Dict[str, Any]) -> Dict[str, Any]:
+    settings = dict(DEFAULT_INCREMENTAL)
+    settings.update(config.get("training", {}).get("incremental") or {})
+    return settings
+
+
+def manifest_path(weights_path: Path) -> Path:
+    return Path(weights_path).parent / MANIFEST_NAME
+
+
+def labeled_stems(images_dir: Path, labels_dir: Path) -> Dict[str, Path]:
+    """Stems that have both an image and a label file (the pairs a training split uses) -> label path."""
+    if not images_dir.exists() or not labels_dir.exists():
+        return {}
+    image_stems = {p.stem for p in get_image_files(str(images_dir))}
+    return {p.stem: p for p in labels_dir.glob("*.txt") if p.stem in image_stems}
+
+
+def label_hashes(labels: Dict[str, Path]) -> Dict[str, str]:
+    return {stem: hashlib.sha1(path.read_bytes()).hexdigest() for stem, path in sorted(labels.items())}
+
+
+def load_train_manifest(weights_path: Path) -> Optional[Dict[str, Any]]:
+    path = manifest_path(weights_path)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return data if isinstance(data, dict) and isinstance(data.get("labels"), dict) else None
+
+
+def write_train_manifest(
+    weights_path: Path,
+    images_dir: Path,
+    labels_dir: Path,
+    val_stems: Optional[List[str]] = None,
+    **extra: Any,
+) -> Path:
+    """Record the labeled set `weights_path` was trained on (label hashes + val stems)."""
+    hashes = label_hashes(labeled_stems(images_dir, labels_dir))
+    payload = {
+        "version": MANIFEST_VERSION,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "labels_dir": str(labels_dir),
+        "labels": hashes,
+        "val": sorted(s for s in (val_stems or []) if s in hashes),
+    }
+    payload.update(extra)
+    path = manifest_path(weights_path)
+    atomic_write_text(str(path), json.dumps(payload, indent=2, ensure_ascii=False))
+    return path
+
+
+@dataclass
+class LabelDelta:
+    new: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    old_val: List[str] = field(default_factory=list)
+    has_manifest: bool = True
+
+    @property
+    def fresh(self) -> List[str]:
+        return sorted(self.new + self.changed)
+
+
+def diff_labels(
+    weights_path: Path,
+    images_dir: Path,
+    labels_dir: Path,
+    *,
+    train_fingerprint: Optional[str] = None,
+) -> LabelDelta:
+    """Compare the current labeled set with the one recorded for `weights_path`.
+
+    Without a manifest (weights trained before manifests were written), the
+    registry's `train_fingerprint` decides: an unchanged label dir means nothing
+    is new; otherwise every current label counts as new.
+    """
+    current = label_hashes(labeled_stems(images_dir, labels_dir))
+    manifest = load_train_manifest(weights_path)
+    if manifest is None:
+        if train_fingerprint and labels_dir.exists() and directory_fingerprint(str(labels_dir)) == train_fingerprint:
+            return LabelDelta(unchanged=sorted(current), has_manifest=False)
+        return LabelDelta(new=sorted(current), has_manifest=False)
+
+    recorded: Dict[str, str] = manifest["labels"]
+    delta = LabelDelta(
+        new=sorted(s for s in current if s not in recorded),
+        changed=sorted(s for s in current if s in recorded and recorded[s] != current[s]),
+        unchanged=sorted(s for s in current if recorded.get(s) == current[s]),
+        removed=sorted(s for s in recorded if s not in current),
+        old_val=sorted(s for s in manifest.get("val", []) if s in current),
+    )
+    return delta
+
+
+@dataclass
+class FinetuneSplit:
+    train_new: List[str]
+    replay: List[str]
+    val: List[str]
+
+
+def plan_finetune_split(delta: LabelDelta, config: Dict[str, Any]) -> FinetuneSplit:
+    """New samples (minus a val share) + a replay sample of old training samples; val = recorded val + new share."""
+    settings = incremental_settings(config)
+    val_cfg = config.get("validation", {})
+    rng = random.Random(val_cfg.get("random_seed", 42))
+
+    old_val = set(delta.old_val)
+    fresh = [s for s in delta.fresh if s not in old_val]
+    rng.shuffle(fresh)
+    n_val = int(len(fresh) * val_cfg.get("split_ratio", 0.2))
+    new_val, train_new = fresh[:n_val], fresh[n_val:]
+
+    pool = sorted(s for s in delta.unchanged if s not in old_val)
+    val = sorted(old_val) + new_val
+    if not val and pool:
+        # No recorded val split: hold out part of the old samples so base and candidate can be compared.
+        held = rng.sample(pool, max(1, int(len(pool) * val_cfg.get("split_ratio", 0.2))))
+        val = sorted(held)
+        pool = [s for s in pool if s not in set(held)]
+
+    n_replay = max(int(settings["min_replay"]), math.ceil(float(settings["replay_ratio"]) * len(train_new)))
+    replay = sorted(rng.sample(pool, min(len(pool), n_replay)))
+    return FinetuneSplit(train_new=sorted(train_new), replay=replay, val=sorted(val))
+
+
+def _dataset_names(io, stems: List[str], labels: Dict[str, Path]) -> Dict[int, str]:
+    names: Dict[int, str] = {}
+    if io.dataset_config_path.exists():
+        with open(io.dataset_config_path, "r", encoding="utf-8") as f:
+            raw = (yaml.safe_load(f) or {}).get("names") or {}
+        names = dict(enumerate(raw)) if isinstance(raw, list) else {int(k): str(v) for k, v in raw.items()}
+    for stem in stems:
+        with open(labels[stem], "r") as f:
+            for line in f:
+                parts = line.split()
+                if parts:
+                    names.setdefault(int(parts[0]), f"class{int(parts[0])}")
+    return dict(sorted(names.items()))
+
+
+def build_finetune_dataset(io, split: FinetuneSplit) -> Path:
+    """Copy the fine-tune split next to the regular dataset (`<category>/finetune`) and write its YAML."""
+    data_root = io.data_root.with_name("finetune")
+    if data_root.exists():
+        shutil.rmtree(data_root)
+    ensure_dir(str(data_root))
+
+    images = {p.stem: p for p in get_image_files(str(io.raw_images_dir))}
+    labels = labeled_stems(io.raw_images_dir, io.raw_labels_dir)
+    organizer = DatasetOrganizer(str(data_root))
+    organizer.copy_split(split.train_new + split.replay, images, labels, "train")
+    organizer.copy_split(split.val, images, labels, "val")
+
+    names = _dataset_names(io, split.train_new + split.replay + split.val, labels)
+    config_path = data_root / "dataset_config.yaml"
+    save_config({
+        "path": str(data_root.absolute()),
+        "train": "train/images",
+        "val": "val/images",
+        "nc": len(names),
+        "names": names,
+    }, str(config_path))
+    return config_path
+
+
+def validate_weights(weights_path: Path, data_config: Path, config: Dict[str, Any], project: Path) -> Dict[str, float]:
+    from ultralytics import YOLO
+
+    train_cfg = config["training"]
+    metrics = YOLO(str(weights_path)).val(
+        data=str(data_config),
+        imgsz=train_cfg["img_size"],
+        batch=train_cfg["batch_size"],
+        device=train_cfg["device"],
+        workers=train_cfg["workers"],
+        plots=False,
+        verbose=False,
+        project=str(project),
+        name="finetune_val",
+        exist_ok=True,
+    )
+    return {"map50": round(float(metrics.box.map50), 5), "map50_95": round(float(metrics.box.map), 5)}
+
+
+@dataclass
+class FinetuneResult:
+    weights: Path
+    status: str                    # up_to_date / too_few / accepted / rejected
+    new_labels: int = 0
+    replay: int = 0
+    val: int = 0
+    baseline: Optional[Dict[str, float]] = None
+    candidate: Optional[Dict[str, float]] = None
+
+    @property
+    def accepted(self) -> bool:
+        return self.status == "accepted"
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "status": self.status,
+            "new_labels": self.new_labels,
+            "replay": self.replay,
+            "val": self.val,
+            "baseline": self.baseline,
+            "candidate": self.candidate,
+            "at": datetime.now().isoformat(timespec="seconds"),
+        }
+
+
+def _promote(candidate: Path, target: Path) -> None:
+    """Replace `target` with `candidate` atomically, keeping the previous weights as best.prev.pt."""
+    ensure_dir(str(target.parent))
+    if target.exists():
+        shutil.copy2(target, target.with_name("best.prev.pt"))
+    tmp = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+    shutil.copy2(candidate, tmp)
+    os.replace(tmp, target)
+
+
+def finetune_category(
+    io,
+    config: Dict[str, Any],
+    logger,
+    base_weights: Path,
+    *,
+    train_fingerprint: Optional[str] = None,
+) -> FinetuneResult:
+    """Fine-tune `base_weights` on the labels added since its train manifest (see module docstring)."""
+    from .trainer import YOLOTrainer
+
+    name = io.category_name
+    settings = incremental_settings(config)
+    delta = diff_labels(base_weights, io.raw_images_dir, io.raw_labels_dir, train_fingerprint=train_fingerprint)
+    fresh = delta.fresh
+    if not fresh:
+        logger.info(f"[{name}] No new labels since {base_weights}; keeping current weights")
+        if not delta.has_manifest:
+            try:
+                write_train_manifest(base_weights, io.raw_images_dir, io.raw_labels_dir)
+            except OSError as e:
+                logger.warning(f"[{name}] Could not record train manifest next to {base_weights}: {e}")
+        return FinetuneResult(base_weights, "up_to_date")
+    if len(fresh) < int(settings["min_new_labels"]):
+        logger.info(f"[{name}] {len(fresh)} new labels (< min_new_labels={settings['min_new_labels']}); "
+                    f"keeping current weights")
+        return FinetuneResult(base_weights, "too_few", new_labels=len(fresh))
+
+    split = plan_finetune_split(delta, config)
+    logger.info(
+        f"[{name}] Incremental fine-tune from {base_weights}: {len(delta.new)} new + {len(delta.changed)} changed "
+        f"labels{'' if delta.has_manifest else ' (no train manifest)'}; train {len(split.train_new)} new + "
+        f"{len(split.replay)} replay, val {len(split.val)}"
+    )
+    result = FinetuneResult(base_weights, "rejected", new_labels=len(fresh), replay=len(split.replay),
+                            val=len(split.val))
+    if not split.train_new and not split.replay:
+        logger.info(f"[{name}] Nothing left to train on after holding out val; keeping current weights")
+        result.status = "too_few"
+        return result
+
+    data_config = build_finetune_dataset(io, split)
+    result.baseline = validate_weights(base_weights, data_config, config, io.model_root)
+
+    ft_config = copy.deepcopy(config)
+    train_cfg = ft_config["training"]
+    train_cfg["epochs"] = int(settings["epochs"])
+    train_cfg["patience"] = int(settings["epochs"])
+    train_cfg["warmup_epochs"] = settings["warmup_epochs"]
+    if settings.get("lr0") is not None:
+        train_cfg["lr0"] = settings["lr0"]
+    trainer = YOLOTrainer(ft_config)
+    trainer.load_model(str(base_weights))
+    trainer.train(str(data_config), name="finetune")
+    candidate = io.model_root / "finetune" / "weights" / "best.pt"
+    if not candidate.exists():
+        raise FileNotFoundError(f"Best weights not found after fine-tuning: {candidate}")
+    result.candidate = validate_weights(candidate, data_config, config, io.model_root)
+
+    drop = result.baseline["map50_95"] - result.candidate["map50_95"]
+    if drop > float(settings["max_regression"]):
+        logger.warning(
+            f"[{name}] Fine-tuned model regressed on val (mAP50-95 {result.baseline['map50_95']:.4f} -> "
+            f"{result.candidate['map50_95']:.4f}); keeping {base_weights}, candidate left at {candidate}"
+        )
+        return result
+
+    target = io.model_root / "train" / "weights" / "best.pt"
+    _promote(candidate, target)
+    write_train_manifest(target, io.raw_images_dir, io.raw_labels_dir, split.val, finetuned_from=str(base_weights))
+    logger.info(
+        f"[{name}] Fine-tuned model accepted (mAP50-95 {result.baseline['map50_95']:.4f} -> "
+        f"{result.candidate['map50_95']:.4f}): {target}"
+    )
+    result.weights = target
+    result.status = "accepted"
+    return result
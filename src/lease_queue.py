@@ -0,0 +1,325 @@
+"""Broker-less work distribution through lease files on shared storage.
+
+Several hosts mounting the same stations root can split a run by claiming
+tasks (a station/category, or an image shard of a large one) in a shared
+lease directory:
+
+    <lease_dir>/<run_id>/<task>.lease   held by one worker, refreshed by heartbeat
+    <lease_dir>/<run_id>/<task>.done    written once the task finished
+    <lease_dir>/<run_id>/<task>.shards  shard plan of a sharded task (see shard_plan)
+
+A lease is claimed by creating its file with O_CREAT|O_EXCL, so exactly one
+worker wins. The holder touches the file every `heartbeat_s`; a lease whose
+mtime is older than `ttl_s` is considered abandoned (worker crashed or the
+host went away) and may be re-claimed: the claimant renames the stale file
+away (only one rename can succeed) and then creates a fresh lease.
+
+Expiry compares the lease mtime (set by the file server on touch) with the
+current time, so hosts need roughly synchronized clocks (NTP); keep `ttl_s`
+several heartbeats long.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import socket
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .utils import atomic_write_text, ensure_dir, setup_logger
+
+DEFAULT_TTL_S = 120.0
+DEFAULT_HEARTBEAT_S = 30.0
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def _safe_name(key: str) -> str:
+    # Task keys contain "/" and may contain non-ASCII station names; keep them readable.
+    return re.sub(r'[\\/:*?"<>|\s]+', "__", key)
+
+
+class LeaseQueue:
+    """Claim / heartbeat / complete tasks through lease files in a shared directory."""
+
+    def __init__(
+        self,
+        lease_dir: str,
+        run_id: str,
+        *,
+        worker_id: Optional[str] = None,
+        ttl_s: float = DEFAULT_TTL_S,
+        heartbeat_s: float = DEFAULT_HEARTBEAT_S,
+    ):
+        self.root = Path(lease_dir) / _safe_name(run_id)
+        ensure_dir(str(self.root))
+        self.worker_id = worker_id or default_worker_id()
+        self.ttl_s = ttl_s
+        self.heartbeat_s = heartbeat_s
+        self.logger = setup_logger(__name__)
+        self._held: Dict[str, Path] = {}
+        self._lost: set = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # -- paths -----------------------------------------------------------
+
+    def lease_path(self, key: str) -> Path:
+        return self.root / f"{_safe_name(key)}.lease"
+
+    def done_path(self, key: str) -> Path:
+        return self.root / f"{_safe_name(key)}.done"
+
+    def shard_plan_path(self, key: str) -> Path:
+        return self.root / f"{_safe_name(key)}.shards"
+
+    # -- shard plans -----------------------------------------------------
+
+    def shard_plan(self, key: str, items: List[str], shard_size: int, timeout: float = 30.0) -> Tuple[List[str], int]:
+        """The item list and shard size that the shards of `key` are cut from, for every worker.
+
+        The first worker to get here publishes its own listing (created with O_EXCL, so
+        exactly one plan wins); everyone else adopts that plan, so all workers derive the
+        same shard keys and slices even if items arrived between their start-ups.
+        Items added after the plan was published are left to the next run.
+        """
+        path = self.shard_plan_path(key)
+        payload = json.dumps({"key": key, "worker": self.worker_id, "shard_size": shard_size, "items": items},
+                             ensure_ascii=False)
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            pass
+        else:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(payload)
+            return list(items), shard_size
+
+        # Another worker created the plan; it may still be writing it.
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    plan = json.load(f)
+                break
+            except ValueError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.1)
+        if plan["shard_size"] != shard_size or len(plan["items"]) != len(items):
+            self.logger.info(
+                f"[{key}] Using the shard plan of {plan.get('worker')}: {len(plan['items'])} items, "
+                f"shard size {plan['shard_size']} (this worker listed {len(items)}, shard size {shard_size})"
+            )
+        return list(plan["items"]), int(plan["shard_size"])
+
+    # -- state -----------------------------------------------------------
+
+    def is_done(self, key: str) -> bool:
+        return self.done_path(key).exists()
+
+    def holder(self, key: str) -> Optional[dict]:
+        try:
+            with open(self.lease_path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _expired(self, path: Path) -> bool:
+        try:
+            return time.time() - path.stat().st_mtime > self.ttl_s
+        except FileNotFoundError:
+            return True
+
+    # -- claiming --------------------------------------------------------
+
+    def _create(self, key: str) -> bool:
+        path = self.lease_path(key)
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"key": key, "worker": self.worker_id, "acquired_at": time.time()}, f)
+        with self._lock:
+            self._held[key] = path
+            self._lost.discard(key)
+        if self.is_done(key):
+            # The previous holder completed between our done-check and the create
+            # (done markers are written before leases are dropped).
+            self.release(key)
+            return False
+        return True
+
+    def claim(self, key: str) -> bool:
+        """Try to take the task; re-claims the lease if its holder stopped heart-beating."""
+        if self.is_done(key):
+            return False
+        if self._create(key):
+            return True
+
+        path = self.lease_path(key)
+        if not self._expired(path):
+            return False
+
+        stale = self.root / f"{path.name}.stale.{uuid.uuid4().hex[:8]}"
+        try:
+            os.rename(path, stale)
+        except FileNotFoundError:
+            # Someone else re-claimed (or released) it first
+            return self._create(key)
+        previous = None
+        try:
+            with open(stale, "r", encoding="utf-8") as f:
+                previous = json.load(f).get("worker")
+        except (OSError, ValueError):
+            pass
+        if not self._expired(stale):
+            # The holder heart-beat between our check and the rename: give the lease back.
+            try:
+                os.link(stale, path)
+            except OSError:
+                pass
+            os.unlink(stale)
+            return False
+        os.unlink(stale)
+        if self._create(key):
+            self.logger.warning(f"Re-claimed abandoned lease {key} (previous holder: {previous})")
+            return True
+        return False
+
+    def lost(self, key: str) -> bool:
+        """True if another worker took over this lease while we held it."""
+        with self._lock:
+            return key in self._lost
+
+    def complete(self, key: str, result: Optional[dict] = None) -> None:
+        """Mark the task finished and drop the lease."""
+        record = {"key": key, "worker": self.worker_id, "finished_at": time.time()}
+        record.update(result or {})
+        atomic_write_text(str(self.done_path(key)), json.dumps(record, ensure_ascii=False))
+        self.release(key)
+
+    def release(self, key: str) -> None:
+        """Drop the lease without marking the task done (another worker may take it)."""
+        with self._lock:
+            path = self._held.pop(key, None)
+        if path is not None and not self.lost(key):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    # -- heartbeat -------------------------------------------------------
+
+    def _beat(self) -> None:
+        with self._lock:
+            held = dict(self._held)
+        for key, path in held.items():
+            info = self.holder(key)
+            if not info or info.get("worker") != self.worker_id:
+                with self._lock:
+                    self._lost.add(key)
+                    self._held.pop(key, None)
+                self.logger.warning(f"Lease lost: {key} (now held by {info.get('worker') if info else None})")
+                continue
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                pass
+
+    def _run_heartbeat(self) -> None:
+        while not self._stop.wait(self.heartbeat_s):
+            try:
+                self._beat()
+            except Exception:
+                self.logger.warning("Lease heartbeat failed", exc_info=True)
+
+    def start(self) -> "LeaseQueue":
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run_heartbeat, name="lease-heartbeat", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        for key in list(self._held):
+            self.release(key)
+
+    def __enter__(self) -> "LeaseQueue":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    # -- work loop -------------------------------------------------------
+
+    def drain(
+        self,
+        keys: Iterable[str],
+        run: Callable[[str], bool],
+        *,
+        poll_s: Optional[float] = None,
+        wait: bool = True,
+    ) -> Dict[str, bool]:
+        """Run every claimable task in `keys` order; returns {key: ok} for tasks run by this worker.
+
+        With `wait`, keeps polling until every task is done (by any worker), so that
+        leases abandoned by crashed workers are picked up.
+        """
+        keys: List[str] = list(keys)
+        poll_s = poll_s if poll_s is not None else max(1.0, self.heartbeat_s / 2)
+        results: Dict[str, bool] = {}
+        while True:
+            progressed = False
+            for key in keys:
+                if key in results or not self.claim(key):
+                    continue
+                progressed = True
+                try:
+                    ok = run(key)
+                except Exception:
+                    self.release(key)
+                    raise
+                if self.lost(key):
+                    self.logger.warning(f"[{key}] Lease was taken over while running; result kept by new holder")
+                    results[key] = ok
+                    continue
+                self.complete(key, {"ok": bool(ok)})
+                results[key] = ok
+
+            remaining = [k for k in keys if not self.is_done(k)]
+            if not remaining or not wait:
+                return results
+            if not progressed:
+                time.sleep(poll_s)
+
+
+def shard_keys(key: str, total: int, shard_size: int) -> List[str]:
+    """Stable shard task keys `<key>#<i>of<n>` for a task with `total` images."""
+    if shard_size <= 0 or total <= shard_size:
+        return [key]
+    count = -(-total // shard_size)
+    return [f"{key}#{i + 1}of{count}" for i in range(count)]
+
+
+def shard_slice(items: List, shard_key: str) -> List:
+    """The contiguous slice of `items` covered by a shard key from shard_keys()."""
+    match = re.search(r"#(\d+)of(\d+)$", shard_key)
+    if not match:
+        return list(items)
+    index, count = int(match.group(1)) - 1, int(match.group(2))
+    size = -(-len(items) // count)
+    return list(items[index * size:(index + 1) * size])
@@ -0,0 +1,183 @@
+"""Inference artifacts: fast cold start for `.pt` training checkpoints.
+
+A training checkpoint stores fp16 weights with BatchNorm layers still separate,
+so every `YOLO(best.pt)` unpickles it, converts the weights to fp32 and fuses
+Conv+BN again. For each checkpoint we keep an *inference artifact* instead:
+
+- the fused, eval-mode, fp32 module only (no EMA / optimizer / training state)
+- saved in torch's zip format, so it can be loaded with `mmap=True`: tensors are
+  paged in from the file on demand and forked workers share those pages
+- keyed by the SHA-256 of the source checkpoint, so retrained weights never
+  pick up a stale artifact; a small per-path stamp (size + mtime) avoids
+  re-hashing the checkpoint on every load
+- also keyed by ARTIFACT_VERSION and the ultralytics / torch versions (the
+  module is pickled, so it is only valid for the libraries that built it); the
+  same fields are checked again on load and a mismatch falls back to the `.pt`
+
+Layout (default `~/.cache/auto-labeling/artifacts`):
+
+    <sha256>-<runtime>.pt  the artifact (an ultralytics-compatible checkpoint dict);
+                           <runtime> is a short hash of runtime_tag()
+    paths/<key>.json       {path, size, mtime_ns, sha256} of a source checkpoint
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import torch
+import ultralytics
+from ultralytics import YOLO
+from ultralytics.cfg import DEFAULT_CFG_DICT
+from ultralytics.nn.tasks import guess_model_task
+
+from .utils import atomic_write_text, ensure_dir, file_lock, file_sha256, setup_logger
+
+ARTIFACT_VERSION = 1
+DEFAULT_ARTIFACT_DIR = Path.home() / ".cache" / "auto-labeling" / "artifacts"
+
+logger = setup_logger(__name__)
+
+
+def _stamp_path(cache_dir: Path, weights: Path) -> Path:
+    key = hashlib.sha1(str(weights).encode("utf-8")).hexdigest()
+    return cache_dir / "paths" / f"{key}.json"
+
+
+def checkpoint_sha256(weights: Path, cache_dir: Path) -> str:
+    """SHA-256 of a checkpoint, reusing the recorded hash while its size and mtime are unchanged."""
+    st = weights.stat()
+    stamp_file = _stamp_path(cache_dir, weights)
+    try:
+        with open(stamp_file, "r", encoding="utf-8") as f:
+            stamp = json.load(f)
+        if stamp.get("size") == st.st_size and stamp.get("mtime_ns") == st.st_mtime_ns:
+            return stamp["sha256"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    digest = file_sha256(str(weights))
+    ensure_dir(str(stamp_file.parent))
+    atomic_write_text(str(stamp_file), json.dumps({
+        "path": str(weights), "size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest,
+    }))
+    return digest
+
+
+def runtime_tag() -> Dict[str, Any]:
+    """What an artifact was built with; it is only used under the same values."""
+    return {"version": ARTIFACT_VERSION, "ultralytics": ultralytics.__version__, "torch": torch.__version__}
+
+
+def _runtime_key() -> str:
+    return hashlib.sha1(json.dumps(runtime_tag(), sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+
+def read_artifact(artifact: Path, mmap: bool = True) -> Dict[str, Any]:
+    """Load an artifact checkpoint, raising ValueError if it was built for another runtime."""
+    ckpt = torch.load(str(artifact), map_location="cpu", mmap=mmap, weights_only=False)
+    meta = ckpt.get("artifact") or {}
+    expected = runtime_tag()
+    if {k: meta.get(k) for k in expected} != expected:
+        raise ValueError(f"stale artifact (built for {meta}, running {expected})")
+    return ckpt
+
+
+class ArtifactYOLO(YOLO):
+    """`YOLO` over an inference artifact, read with read_artifact() instead of inside ultralytics.
+
+    Only this load memory-maps: torch.load itself is left untouched for the rest of
+    the process. The module goes through the same updates as ultralytics' own
+    checkpoint loading (args, path, task, eval).
+    """
+
+    def __init__(self, artifact, mmap: bool = True):
+        self.__dict__["_artifact_mmap"] = mmap     # read by _load, which runs inside YOLO.__init__
+        super().__init__(str(artifact))
+
+    def _load(self, weights: str, task: Optional[str] = None) -> None:
+        ckpt = read_artifact(Path(weights), self.__dict__.pop("_artifact_mmap", True))
+        module = ckpt["model"]
+        module.pt_path = str(weights)
+        module.task = getattr(module, "task", None) or guess_model_task(module)
+        module.eval()
+        self.model, self.ckpt = module, ckpt
+        self.task = module.task
+        self.overrides = module.args = self._reset_ckpt_args(
+            {**DEFAULT_CFG_DICT, **(ckpt.get("train_args") or {})}
+        )
+        self.ckpt_path = module.pt_path
+        self.overrides["model"] = weights
+        self.overrides["task"] = self.task
+        self.model_name = weights
+
+
+def _build_artifact(weights: Path, artifact: Path, digest: str) -> None:
+    yolo = YOLO(str(weights))
+    yolo.fuse()
+    module = yolo.model.float().eval()
+    for p in module.parameters():
+        p.requires_grad_(False)
+
+    ckpt: Dict[str, Any] = {
+        "model": module,
+        "train_args": dict(getattr(yolo, "ckpt", {}).get("train_args") or getattr(module, "args", {}) or {}),
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "version": getattr(yolo, "ckpt", {}).get("version"),
+        "artifact": dict(runtime_tag(), source=str(weights), source_sha256=digest),
+    }
+    tmp = artifact.with_name(f".{artifact.name}.{os.getpid()}.tmp")
+    try:
+        torch.save(ckpt, tmp)
+        os.replace(tmp, artifact)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+def ensure_artifact(weights_path: str, cfg: Optional[Dict[str, Any]] = None) -> Optional[Path]:
+    """Return the inference artifact of a `.pt` checkpoint, building it on first use (None if not applicable)."""
+    cfg = cfg or {}
+    weights = Path(weights_path).expanduser().resolve()
+    if weights.suffix != ".pt" or not weights.is_file():
+        return None
+
+    cache_dir = Path(cfg.get("dir") or DEFAULT_ARTIFACT_DIR).expanduser()
+    ensure_dir(str(cache_dir))
+    digest = checkpoint_sha256(weights, cache_dir)
+    artifact = cache_dir / f"{digest}-{_runtime_key()}.pt"
+    if artifact.exists():
+        return artifact
+
+    with file_lock(str(artifact.with_suffix(".lock")), timeout=600):
+        if not artifact.exists():
+            logger.info(f"Building inference artifact for {weights} -> {artifact}")
+            _build_artifact(weights, artifact, digest)
+    return artifact
+
+
+def load_yolo(weights_path: str, cfg: Optional[Dict[str, Any]] = None):
+    """Load a YOLO model through its inference artifact when enabled, else from the checkpoint itself.
+
+    Any problem with the artifact (build or load) falls back to the original `.pt`;
+    an artifact that fails to load is removed so the next load rebuilds it.
+    """
+    cfg = cfg or {}
+    if not cfg.get("enabled", True):
+        return YOLO(weights_path)
+
+    artifact = None
+    try:
+        artifact = ensure_artifact(weights_path, cfg)
+        if artifact is not None:
+            return ArtifactYOLO(artifact, mmap=bool(cfg.get("mmap", True)))
+    except Exception as e:
+        logger.warning(f"Inference artifact unavailable for {weights_path} ({e}); loading checkpoint")
+        if artifact is not None:
+            artifact.unlink(missing_ok=True)
+    return YOLO(weights_path)
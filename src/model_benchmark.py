@@ -0,0 +1,120 @@
+"""Per-host latency / throughput measurements of registered weights.
+
+`benchmark_weights` loads a weights file the way annotation does (YOLOPredictor,
+including the CPU inference profile) and measures:
+
+- cold load: constructing the model (via the inference artifact cache when enabled), and preparing it (profile selection, fuse, warm-up)
+- warm per-image latency: repeated single-image predictions (p50 / p90 / mean)
+- batch throughput: images/sec over several calls at the configured batch size
+
+Results are stored in the registry metadata under `hosts.<hostname>`, next to
+the category entry, so other hosts' numbers are kept (see model_registry).
+"""
+
+from __future__ import annotations
+
+import socket
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .image_loader import LoadedImage, load_image, target_size
+from .model_registry import update_registry_metadata
+from .run_metrics import percentile
+from .utils import file_sha256, get_image_files
+
+
+def host_key() -> str:
+    return socket.gethostname()
+
+
+def benchmark_images(imgsz, count: int, images_dir: Optional[str] = None, seed: int = 0) -> List[LoadedImage]:
+    """Decoded benchmark inputs: a sample of real images when `images_dir` is given, else synthetic frames."""
+    if images_dir:
+        paths = get_image_files(images_dir)[:count]
+        if paths:
+            return [load_image(p, imgsz) for p in paths]
+    rng = np.random.default_rng(seed)
+    imgsz = target_size(imgsz)
+    height = imgsz * 3 // 4
+    return [
+        LoadedImage(
+            path=Path(f"synthetic_{i}.jpg"),
+            image=rng.integers(0, 256, (height, imgsz, 3), dtype=np.uint8),
+            orig_size=(imgsz, height),
+        )
+        for i in range(count)
+    ]
+
+
+def benchmark_weights(
+    weights_path: str,
+    config: Dict[str, Any],
+    images: List[LoadedImage],
+    *,
+    latency_runs: int = 20,
+    throughput_rounds: int = 3,
+) -> Dict[str, Any]:
+    """Measure cold load, warm single-image latency and batch throughput on this host."""
+    import torch
+
+    from .predictor import YOLOPredictor
+
+    auto_cfg = config.get("auto_annotation", {})
+    imgsz = auto_cfg.get("img_size", 640)
+    batch = max(1, int(auto_cfg.get("batch_size", 1)))
+
+    predictor = YOLOPredictor(str(weights_path), config)
+    start = time.perf_counter()
+    predictor.model = predictor._load_yolo()
+    load_s = time.perf_counter() - start
+    start = time.perf_counter()
+    if not torch.cuda.is_available():
+        predictor._setup_cpu_profile()
+    prepare_s = time.perf_counter() - start
+
+    # First prediction (ultralytics builds its predictor lazily) counts as cold too
+    start = time.perf_counter()
+    predictor.predict_loaded(images[:1])
+    first_predict_s = time.perf_counter() - start
+
+    latencies = []
+    for i in range(max(1, latency_runs)):
+        start = time.perf_counter()
+        predictor.predict_loaded([images[i % len(images)]])
+        latencies.append((time.perf_counter() - start) * 1000.0)
+
+    processed = 0
+    start = time.perf_counter()
+    for _ in range(max(1, throughput_rounds)):
+        predictor.predict_loaded(images, batch=batch)
+        processed += len(images)
+    throughput_s = time.perf_counter() - start
+
+    return {
+        "measured_at": datetime.now().isoformat(timespec="seconds"),
+        "device": "cuda" if torch.cuda.is_available() else "cpu",
+        "torch": torch.__version__,
+        "cpu_profile": predictor.cpu_profile.describe() if predictor.cpu_profile else None,
+        "weights_sha256": file_sha256(str(weights_path)),
+        "imgsz": imgsz,
+        "batch": batch,
+        "cold_load_s": round(load_s, 3),
+        "prepare_s": round(prepare_s, 3),
+        "first_predict_s": round(first_predict_s, 3),
+        "warm_latency_ms": {
+            "p50": round(percentile(latencies, 50), 2),
+            "p90": round(percentile(latencies, 90), 2),
+            "mean": round(sum(latencies) / len(latencies), 2),
+        },
+        "batch_images_per_s": round(processed / throughput_s, 2) if throughput_s > 0 else None,
+        "images": len(images),
+    }
+
+
+def store_host_benchmark(registry_path: str, category: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    """Record `result` under hosts.<this host> of the category's registry metadata."""
+    return update_registry_metadata(registry_path, category, hosts={host_key(): result})
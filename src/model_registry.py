@@ -2,16 +2,38 @@
 
 Keep a lightweight mapping from category name -> model weights path, so that a
 previously trained model can be reused for future auto-annotation runs.
+
+Storage:
+- `model_registry.yaml`: the plain `category: weights_path` mapping (unchanged
+  format, still usable as --registry / --model-map by existing configs).
+- `model_registry.meta.json`: per-category metadata next to it (weights hash,
+  train fingerprint, imgsz, measured latency, per-host benchmarks).
+
+Both files are rewritten under an exclusive file lock (`model_registry.yaml.lock`)
+with an atomic replace, and every update re-reads the current state inside the
+lock, so parallel workers or concurrent runs do not lose each other's updates.
 """
 
 from __future__ import annotations
 
+import json
+import os
+from datetime import datetime
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Any, Dict, Optional, Tuple
 
 import yaml
 
-from .utils import ensure_dir
+from .utils import atomic_write_text, ensure_dir, file_lock, file_sha256
+
+
+def _lock_path(registry_path: str) -> str:
+    return str(Path(registry_path)) + ".lock"
+
+
+def metadata_path(registry_path: str) -> Path:
+    path = Path(registry_path)
+    return path.with_name(f"{path.stem}.meta.json")
 
 
 def load_model_registry(registry_path: str) -> Dict[str, str]:
@@ -37,8 +59,26 @@ def load_model_registry(registry_path: str) -> Dict[str, str]:
 def save_model_registry(registry: Dict[str, str], registry_path: str) -> None:
     path = Path(registry_path)
     ensure_dir(str(path.parent))
-    with open(path, "w", encoding="utf-8") as f:
-        yaml.safe_dump(registry, f, allow_unicode=True, sort_keys=True)
+    atomic_write_text(str(path), yaml.safe_dump(registry, allow_unicode=True, sort_keys=True))
+
+
+def load_registry_metadata(registry_path: str) -> Dict[str, Dict[str, Any]]:
+    path = metadata_path(registry_path)
+    if not path.exists():
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f) or {}
+    categories = data.get("categories", {})
+    if not isinstance(categories, dict):
+        raise ValueError(f"Invalid registry metadata format: {path}")
+    return categories
+
+
+def _save_registry_metadata(categories: Dict[str, Dict[str, Any]], registry_path: str) -> None:
+    path = metadata_path(registry_path)
+    ensure_dir(str(path.parent))
+    payload = {"version": 1, "categories": categories}
+    atomic_write_text(str(path), json.dumps(payload, indent=2, ensure_ascii=False, sort_keys=True))
 
 
 def resolve_registry_weight(
@@ -62,11 +102,115 @@ def resolve_registry_weight(
     return candidate if candidate.exists() else None
 
 
+def _weights_metadata(weights_path: str) -> Dict[str, Any]:
+    try:
+        st = os.stat(weights_path)
+    except OSError:
+        return {}
+    return {
+        "sha256": file_sha256(weights_path),
+        "size": st.st_size,
+        "mtime": st.st_mtime,
+    }
+
+
 def update_registry_for_category(
     registry_path: str,
     category_name: str,
-    weights_path: str
+    weights_path: str,
+    *,
+    train_fingerprint: Optional[str] = None,
+    imgsz: Optional[int] = None,
+    extra: Optional[Dict[str, Any]] = None,
 ) -> None:
-    registry = load_model_registry(registry_path)
-    registry[category_name] = str(weights_path)
-    save_model_registry(registry, registry_path)
+    """Point `category_name` at `weights_path` and refresh its metadata (locked read-modify-write)."""
+    meta_fields = _weights_metadata(str(weights_path))
+    with file_lock(_lock_path(registry_path)):
+        registry = load_model_registry(registry_path)
+        registry[category_name] = str(weights_path)
+        save_model_registry(registry, registry_path)
+
+        metadata = load_registry_metadata(registry_path)
+        entry = dict(metadata.get(category_name, {}))
+        if entry.get("sha256") != meta_fields.get("sha256"):
+            # New weights: measurements taken for the previous file no longer apply.
+            entry.pop("latency_ms", None)
+            entry.pop("hosts", None)
+        entry.update(meta_fields)
+        entry["weights"] = str(weights_path)
+        entry["updated_at"] = datetime.now().isoformat(timespec="seconds")
+        if train_fingerprint is not None:
+            entry["train_fingerprint"] = train_fingerprint
+        if imgsz is not None:
+            entry["imgsz"] = int(imgsz)
+        if extra:
+            entry.update(extra)
+        metadata[category_name] = entry
+        _save_registry_metadata(metadata, registry_path)
+
+
+def update_registry_metadata(registry_path: str, category_name: str, **fields: Any) -> Dict[str, Any]:
+    """Merge `fields` into a category's metadata entry (nested dicts are merged one level deep)."""
+    with file_lock(_lock_path(registry_path)):
+        metadata = load_registry_metadata(registry_path)
+        entry = dict(metadata.get(category_name, {}))
+        for key, value in fields.items():
+            if isinstance(value, dict) and isinstance(entry.get(key), dict):
+                merged = dict(entry[key])
+                merged.update(value)
+                entry[key] = merged
+            else:
+                entry[key] = value
+        metadata[category_name] = entry
+        _save_registry_metadata(metadata, registry_path)
+    return entry
+
+
+class ModelRegistry:
+    """Cached read access to a registry and its metadata.
+
+    The YAML/JSON files are only re-read when their (mtime, size) changes, so
+    repeated lookups across many station/category tasks cost a single stat.
+    """
+
+    def __init__(self, registry_path: str):
+        self.registry_path = str(registry_path)
+        self._stamp: Optional[Tuple] = None
+        self._registry: Dict[str, str] = {}
+        self._metadata: Dict[str, Dict[str, Any]] = {}
+
+    def _current_stamp(self) -> Tuple:
+        stamp = []
+        for p in (Path(self.registry_path), metadata_path(self.registry_path)):
+            try:
+                st = p.stat()
+                stamp.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                stamp.append(None)
+        return tuple(stamp)
+
+    def _refresh(self) -> None:
+        stamp = self._current_stamp()
+        if stamp != self._stamp:
+            self._registry = load_model_registry(self.registry_path)
+            self._metadata = load_registry_metadata(self.registry_path)
+            self._stamp = stamp
+
+    @property
+    def entries(self) -> Dict[str, str]:
+        self._refresh()
+        return dict(self._registry)
+
+    def resolve(self, category_name: str) -> Optional[Path]:
+        self._refresh()
+        return resolve_registry_weight(self._registry, category_name, registry_path=self.registry_path)
+
+    def metadata(self, category_name: str) -> Dict[str, Any]:
+        self._refresh()
+        return dict(self._metadata.get(category_name, {}))
+
+    def update(self, category_name: str, weights_path: str, **kwargs: Any) -> None:
+        update_registry_for_category(self.registry_path, category_name, weights_path, **kwargs)
+
+    def update_metadata(self, category_name: str, **fields: Any) -> Dict[str, Any]:
+        return update_registry_metadata(self.registry_path, category_name, **fields)
@@ -0,0 +1,188 @@
+"""Dry-run planner for the batch entry points (`--plan`).
+
+Resolves, for every station/category task, the action that would actually run
+(including the runner's downgrade / auto-train rules), the weights and their
+source, and how many images are waiting to be labeled, without loading a
+model. Nothing in this module imports torch or ultralytics.
+"""
+
+from __future__ import annotations
+
+import json
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .category_pipeline import build_category_io, resolve_weights
+from .incremental import diff_labels
+from .utils import atomic_write_text, ensure_dir, get_image_files
+
+
+@dataclass
+class PlannedTask:
+    station: Optional[str]
+    category: str
+    category_dir: str
+    layout: str
+    requested_action: str
+    effective_action: str          # train / annotate / train_and_annotate / skip
+    weights: Optional[str]
+    weights_source: str
+    labeled_images: int
+    unlabeled_images: int
+    note: str = ""
+
+    @property
+    def key(self) -> str:
+        return f"{self.station}/{self.category}" if self.station else self.category
+
+
+def count_unlabeled(images_dir: Optional[Path], labels_dir: Optional[Path], skip_existing: bool) -> int:
+    """Images that an annotate run would process (existing labels/*.txt are skipped when skip_existing)."""
+    if not images_dir or not images_dir.exists():
+        return 0
+    images = get_image_files(str(images_dir))
+    if skip_existing and labels_dir is not None and labels_dir.exists():
+        existing = {p.stem for p in labels_dir.glob("*.txt")}
+        images = [p for p in images if p.stem not in existing]
+    return len(images)
+
+
+def _count_images(directory: Path) -> int:
+    return len(get_image_files(str(directory))) if directory.exists() else 0
+
+
+def plan_category(
+    *,
+    category_name: str,
+    category_root: Path,
+    use_pre_prefix: bool,
+    action: str,
+    weight_options: Dict[str, Any],
+    shared_model_root: Optional[str] = None,
+    force_train: bool = False,
+    train_init: str = "base",
+    output_layout: str = "triage",
+    skip_existing: bool = True,
+    station: Optional[str] = None,
+    layout: str = "category",
+) -> PlannedTask:
+    """Mirror process_category()'s decisions for one category."""
+    io = build_category_io(
+        category_name, category_root, use_pre_prefix=use_pre_prefix, shared_model_root=shared_model_root
+    )
+    weights, source = resolve_weights(category_name, io.model_root, **weight_options)
+    has_raw = io.raw_images_dir.exists() and io.raw_labels_dir.exists()
+    labels_dir = io.output_root if output_layout == "yolo" else None
+    unlabeled = count_unlabeled(io.unlabeled_images_dir, labels_dir, skip_existing)
+
+    should_train = action in ("train", "train_and_annotate")
+    should_annotate = action in ("annotate", "train_and_annotate")
+    note = ""
+    train = False
+    if should_train:
+        if not has_raw:
+            return PlannedTask(station, category_name, str(category_root), layout, action, "skip",
+                               str(weights) if weights else None, source, 0, unlabeled,
+                               f"missing {io.raw_images_dir.name}/{io.raw_labels_dir.name}")
+        if weights and not force_train and source in ("trained", "registry") and train_init == "incremental":
+            delta = diff_labels(weights, io.raw_images_dir, io.raw_labels_dir)
+            if delta.fresh:
+                train = True
+                note = (f"incremental fine-tune: {len(delta.new)} new + {len(delta.changed)} changed labels"
+                        + ("" if delta.has_manifest else " (no train manifest)"))
+            else:
+                note = "no new labels since last training (skip training)"
+        elif weights and not force_train and source in ("trained", "registry"):
+            note = "reuse existing weights (skip training)"
+        else:
+            train = True
+            weights, source = io.model_root / "train" / "weights" / "best.pt", "train"
+
+    if should_annotate and not weights and not train:
+        if action == "annotate" and has_raw:
+            train = True
+            weights, source = io.model_root / "train" / "weights" / "best.pt", "train"
+            note = "no weights found; will auto-train before annotating"
+        else:
+            return PlannedTask(station, category_name, str(category_root), layout, action, "skip",
+                               None, source, _count_images(io.raw_images_dir), unlabeled, "no usable weights")
+
+    annotate = should_annotate and io.unlabeled_images_dir.exists()
+    if should_annotate and not annotate:
+        note = (note + "; " if note else "") + "no unlabeled images dir"
+    effective = "train_and_annotate" if train and annotate else "train" if train else "annotate" if annotate else "skip"
+    return PlannedTask(station, category_name, str(category_root), layout, action, effective,
+                       str(weights) if weights else None, source,
+                       _count_images(io.raw_images_dir), unlabeled, note)
+
+
+def plan_station_entry(
+    station_name: str,
+    entry,
+    *,
+    action: str,
+    weight_options: Dict[str, Any],
+    shared_model_root: str,
+    force_train: bool = False,
+    train_init: str = "base",
+    output_layout: str = "yolo",
+    skip_existing: bool = True,
+) -> PlannedTask:
+    """Mirror train_by_station.py's per-entry decisions (downgrade rule + layouts)."""
+    category_dir = entry.category_dir
+    has_pre_labeled = (category_dir / "pre_images").exists() and (category_dir / "pre_labels").exists()
+    effective_action = action
+    note = ""
+    if effective_action in ("train", "train_and_annotate") and not has_pre_labeled:
+        effective_action = "annotate"
+        note = "no pre_images/pre_labels; downgraded to annotate"
+
+    if entry.layout == "flat_images":
+        model_root = Path(shared_model_root).expanduser().resolve() / entry.category_name
+        weights, source = resolve_weights(entry.category_name, model_root, **weight_options)
+        unlabeled = count_unlabeled(category_dir, category_dir / "labels", skip_existing)
+        return PlannedTask(station_name, entry.category_name, str(category_dir), entry.layout, action,
+                           "annotate" if weights else "skip", str(weights) if weights else None, source,
+                           0, unlabeled, note if weights else "no usable weights")
+
+    task = plan_category(
+        category_name=entry.category_name,
+        category_root=category_dir,
+        use_pre_prefix=True,
+        action=effective_action,
+        weight_options=weight_options,
+        shared_model_root=shared_model_root,
+        force_train=force_train,
+        train_init=train_init,
+        output_layout=output_layout,
+        skip_existing=skip_existing,
+        station=station_name,
+        layout=entry.layout,
+    )
+    task.requested_action = action
+    if note:
+        task.note = f"{note}; {task.note}" if task.note else note
+    return task
+
+
+def print_plan(tasks: List[PlannedTask]) -> None:
+    header = f"{'task':<40} {'layout':<12} {'action':<19} {'unlabeled':>9} {'labeled':>8}  {'source':<16} weights"
+    print(header)
+    print("-" * len(header))
+    for t in tasks:
+        print(f"{t.key:<40} {t.layout:<12} {t.effective_action:<19} {t.unlabeled_images:>9} "
+              f"{t.labeled_images:>8}  {t.weights_source:<16} {t.weights or '-'}")
+        if t.note:
+            print(f"{'':<40} {t.note}")
+    counts: Dict[str, int] = {}
+    for t in tasks:
+        counts[t.effective_action] = counts.get(t.effective_action, 0) + 1
+    print("-" * len(header))
+    print(f"{len(tasks)} tasks: " + ", ".join(f"{k}={v}" for k, v in sorted(counts.items())) +
+          f"; {sum(t.unlabeled_images for t in tasks if t.effective_action != 'skip')} images to annotate")
+
+
+def write_plan_json(tasks: List[PlannedTask], path: str) -> None:
+    ensure_dir(str(Path(path).parent))
+    atomic_write_text(path, json.dumps([asdict(t) for t in tasks], indent=2, ensure_ascii=False))
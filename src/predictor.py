@@ -1,10 +1,45 @@
 """Model prediction module"""
 
+import math
 import torch
-from ultralytics import YOLO
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List
+from typing import List, Optional, Sequence, Tuple
 from .utils import setup_logger
+from .cpu_profile import inference_context, prepare_model, select_cpu_profile
+from .image_loader import LoadedImage, load_image, read_image_size, restore_original_geometry
+from .model_artifacts import load_yolo
+
+
+def rect_batches(
+    sizes: Sequence[Optional[Tuple[int, int]]], batch_size: int, imgsz: int, stride: int = 32
+) -> List[Tuple[List[int], object]]:
+    """Group images by aspect ratio into batches with a shared minimal inference shape.
+
+    Like ultralytics' `rect` validation: images are sorted by height/width, cut into
+    batches of `batch_size`, and each batch gets the smallest stride-aligned [h, w]
+    whose long side is `imgsz` and that fits every image in it. Images of unknown
+    size (None) keep the square `imgsz`. Returns (input indices, imgsz) per batch.
+    """
+    known = [i for i, size in enumerate(sizes) if size and size[0] > 0 and size[1] > 0]
+    unknown = sorted(set(range(len(sizes))) - set(known))
+    order = sorted(known, key=lambda i: sizes[i][1] / sizes[i][0])
+
+    batches = []
+    for start in range(0, len(order), batch_size):
+        indices = order[start:start + batch_size]
+        ratios = [sizes[i][1] / sizes[i][0] for i in indices]
+        low, high = min(ratios), max(ratios)
+        if high < 1:
+            h, w = high, 1.0
+        elif low > 1:
+            h, w = 1.0, 1 / low
+        else:
+            h, w = 1.0, 1.0
+        batches.append((indices, [math.ceil(h * imgsz / stride) * stride, math.ceil(w * imgsz / stride) * stride]))
+    for start in range(0, len(unknown), batch_size):
+        batches.append((unknown[start:start + batch_size], imgsz))
+    return batches
 
 
 class YOLOPredictor:
@@ -15,15 +50,98 @@ class YOLOPredictor:
         self.config = config
         self.logger = setup_logger(__name__)
         self.model = None
+        self.cpu_profile = None
         
     def load_model(self):
         """Load trained model"""
         self.logger.info(f"Loading model from {self.model_path}")
-        self.model = YOLO(self.model_path)
+        self.model = self._load_yolo()
+        if not torch.cuda.is_available():
+            self._setup_cpu_profile()
         return self.model
+
+    def _load_yolo(self):
+        """Construct the YOLO model, through the cached inference artifact when enabled."""
+        artifact_cfg = self.config.get('auto_annotation', {}).get('artifact_cache') or {}
+        return load_yolo(self.model_path, artifact_cfg)
+
+    def _setup_cpu_profile(self):
+        """Pick (or autotune) the CPU inference profile and prepare the model for it."""
+        auto_cfg = self.config.get('auto_annotation', {})
+        cpu_cfg = auto_cfg.get('cpu_profile') or {}
+        if not cpu_cfg.get('enabled', True) or Path(self.model_path).suffix not in ('.pt', '.yaml'):
+            # Exported graphs (e.g. INT8 OpenVINO) carry their own precision/layout.
+            return
+
+        img_size = auto_cfg.get('img_size', 640)
+        try:
+            model_key = f"{sum(p.numel() for p in self.model.model.parameters())}p"
+        except (AttributeError, TypeError):
+            model_key = Path(self.model_path).name
+        self.cpu_profile = select_cpu_profile(
+            self._load_yolo, cpu_cfg, img_size, model_key
+        )
+        prepare_model(self.model, self.cpu_profile, img_size)
+        self.logger.info(f"CPU inference profile: {self.cpu_profile.describe()}")
     
     def predict_batch(self, image_paths: List[Path], **kwargs):
         """Predict on batch of images with memory optimization"""
+        auto_cfg = self.config.get('auto_annotation', {})
+        img_size = kwargs.get('imgsz', auto_cfg.get('img_size', 640))
+
+        if auto_cfg.get('reduced_decode', True) and image_paths:
+            # Decode oversized JPEGs at a DCT-reduced scale; boxes are mapped back afterwards.
+            loaded = self.load_images(image_paths, img_size, auto_cfg.get('decode_workers', 4))
+            return self.predict_loaded(loaded, **kwargs)
+        if self._use_rect(len(image_paths), img_size):
+            return self._predict_rect(list(image_paths), [read_image_size(p) for p in image_paths], **kwargs)
+        return self._predict_source(image_paths, **kwargs)
+
+    def predict_loaded(self, loaded: List[LoadedImage], **kwargs):
+        """Predict on already decoded images (see image_loader.load_image)."""
+        images = [item.image for item in loaded]
+        img_size = kwargs.get('imgsz', self.config.get('auto_annotation', {}).get('img_size', 640))
+        if self._use_rect(len(images), img_size):
+            # Decoded (possibly DCT-reduced) arrays keep the source aspect ratio
+            results = self._predict_rect(images, [(im.shape[1], im.shape[0]) for im in images], **kwargs)
+        else:
+            results = self._predict_source(images, **kwargs)
+        for result, item in zip(results, loaded):
+            restore_original_geometry(result, item)
+        return results
+
+    def _use_rect(self, count: int, img_size) -> bool:
+        """Rectangular batching applies to PyTorch models; exported graphs have a fixed input shape."""
+        auto_cfg = self.config.get('auto_annotation', {})
+        return (
+            bool(auto_cfg.get('rect_batching', True))
+            and count > 0
+            and isinstance(img_size, int)
+            and Path(self.model_path).suffix in ('.pt', '.yaml')
+        )
+
+    def _stride(self) -> int:
+        try:
+            return max(32, int(max(self.model.model.stride)))
+        except (AttributeError, TypeError, ValueError):
+            return 32
+
+    def _predict_rect(self, source: list, sizes, **kwargs):
+        """Predict in aspect-ratio batches letterboxed to their own rectangle; results in input order."""
+        if self.model is None:
+            self.load_model()
+        auto_cfg = self.config.get('auto_annotation', {})
+        img_size = kwargs.get('imgsz', auto_cfg.get('img_size', 640))
+        batch_size = max(1, int(kwargs.get('batch', auto_cfg.get('batch_size', 1))))
+
+        results = [None] * len(source)
+        for indices, shape in rect_batches(sizes, batch_size, img_size, self._stride()):
+            batch_kwargs = dict(kwargs, imgsz=shape, batch=len(indices))
+            for i, result in zip(indices, self._predict_source([source[i] for i in indices], **batch_kwargs)):
+                results[i] = result
+        return results
+
+    def _predict_source(self, source, **kwargs):
         if self.model is None:
             self.load_model()
 
@@ -37,25 +155,48 @@ class YOLOPredictor:
         max_det = kwargs.get('max_det', auto_cfg.get('max_det', 300))
         batch_size = kwargs.get('batch', auto_cfg.get('batch_size', 1))
         img_size = kwargs.get('imgsz', auto_cfg.get('img_size', 640))
-        half = kwargs.get('half', auto_cfg.get('half', True))
 
-        results = self.model.predict(
-            source=image_paths,
+        predict_args = dict(
+            source=source,
             conf=conf,
             iou=iou,
             max_det=max_det,
             batch=batch_size,
             imgsz=img_size,
-            half=half,
             verbose=False,
-            device='cuda' if torch.cuda.is_available() else 'cpu'
         )
 
+        if torch.cuda.is_available():
+            results = self.model.predict(
+                half=kwargs.get('half', auto_cfg.get('half', True)),
+                device='cuda',
+                **predict_args
+            )
+        else:
+            # fp16 is not a CPU format; precision comes from the CPU profile (fp32 / bf16).
+            with inference_context(self.cpu_profile):
+                results = self.model.predict(device='cpu', **predict_args)
+
         # Clear cache after prediction
         if torch.cuda.is_available():
             torch.cuda.empty_cache()
 
         return results
+
+    @staticmethod
+    def load_images(image_paths: List[Path], img_size, workers: int, reduced: bool = True) -> List[LoadedImage]:
+        """Decode a batch of images for inference (libjpeg/OpenCV release the GIL, so threads help).
+
+        With `reduced` false every image is decoded at full resolution, like
+        predict_batch with `auto_annotation.reduced_decode: false`.
+        """
+        def load(path):
+            return load_image(path, img_size, reduce_jpeg=reduced, map_uncompressed=reduced)
+
+        if workers and workers > 1 and len(image_paths) > 1:
+            with ThreadPoolExecutor(max_workers=min(workers, len(image_paths))) as pool:
+                return list(pool.map(load, image_paths))
+        return [load(p) for p in image_paths]
     
     def filter_by_confidence(self, results, threshold: float = 0.5):
         """Filter predictions by confidence threshold"""
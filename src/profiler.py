@@ -0,0 +1,186 @@
+"""Low-overhead sampling profiler for whole runs.
+
+A background thread periodically captures the Python stack of the profiled
+thread (the main thread by default) via `sys._current_frames()` and accumulates
+collapsed stacks, the format consumed by flamegraph.pl / speedscope / inferno:
+
+  main (train_by_station.py:19);process_category (category_runner.py:25);... 42
+
+Each sample is weighted by the wall time (ms) elapsed since the previous one:
+a GIL-holding Python loop delays the sampler thread, and plain sample counts
+would under-report it. Samples are attributed to the currently active task,
+so a run produces one `.folded` file per station/category task plus a
+`_run.folded` aggregate.
+
+Native code (torch kernels, ultralytics C extensions, file system calls) shows
+up as the Python frame that called into it.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .utils import ensure_dir
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Sample one thread's stack at a fixed interval and count collapsed stacks."""
+
+    def __init__(self, interval: float = 0.005, thread_id: Optional[int] = None, max_depth: int = 256):
+        self.interval = interval
+        self.thread_id = thread_id if thread_id is not None else threading.main_thread().ident
+        self.max_depth = max_depth
+        self.total: Counter = Counter()
+        self._task: Counter = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._labels: Dict[object, str] = {}
+        self.samples = 0
+
+    def _collapse(self, frame) -> str:
+        labels = []
+        depth = 0
+        while frame is not None and depth < self.max_depth:
+            code = frame.f_code
+            label = self._labels.get(code)
+            if label is None:
+                label = _frame_label(frame)
+                self._labels[code] = label
+            labels.append(label)
+            frame = frame.f_back
+            depth += 1
+        labels.reverse()
+        return ";".join(labels)
+
+    def _run(self) -> None:
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            weight = max(1, round((now - last) * 1000))
+            last = now
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = self._collapse(frame)
+            del frame
+            with self._lock:
+                self._task[stack] += weight
+                self.total[stack] += weight
+                self.samples += 1
+
+    def start(self) -> "SamplingProfiler":
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def begin_task(self) -> None:
+        with self._lock:
+            self._task = Counter()
+
+    def end_task(self) -> Counter:
+        with self._lock:
+            stacks, self._task = self._task, Counter()
+        return stacks
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+
+def write_collapsed(stacks: Counter, path: Path) -> None:
+    ensure_dir(str(Path(path).parent))
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, count in stacks.most_common():
+            f.write(f"{stack} {count}\n")
+
+
+def top_functions(stacks: Counter, n: int = 20) -> List[Tuple[str, int, int]]:
+    """Return [(frame, self_ms, total_ms)] sorted by self time."""
+    self_counts: Counter = Counter()
+    total_counts: Counter = Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(";")
+        if frames:
+            self_counts[frames[-1]] += count
+        for frame in set(frames):
+            total_counts[frame] += count
+    return [(frame, c, total_counts[frame]) for frame, c in self_counts.most_common(n)]
+
+
+def log_hotspots(stacks: Counter, logger, title: str, n: int = 20) -> None:
+    sampled_ms = sum(stacks.values())
+    if not sampled_ms:
+        logger.info(f"[profile] {title}: no samples")
+        return
+    logger.info(f"[profile] {title}: {sampled_ms / 1000:.1f}s sampled, top {n} by self time")
+    for frame, self_ms, total_ms in top_functions(stacks, n):
+        logger.info(
+            f"[profile]   self {self_ms / sampled_ms * 100:5.1f}%  total {total_ms / sampled_ms * 100:5.1f}%  {frame}"
+        )
+
+
+def _safe_name(name: str) -> str:
+    return re.sub(r"[^\w.\-]+", "_", name).strip("_") or "task"
+
+
+@contextmanager
+def profile_task(
+    profiler: Optional[SamplingProfiler],
+    task_name: str,
+    output_dir: Optional[Path],
+    logger,
+    top_n: int = 20,
+):
+    """Attribute samples taken inside the block to `task_name` and write them out."""
+    if profiler is None:
+        yield
+        return
+
+    profiler.begin_task()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stacks = profiler.end_task()
+        if output_dir is not None:
+            out = Path(output_dir) / f"{_safe_name(task_name)}.folded"
+            write_collapsed(stacks, out)
+            logger.info(f"[profile] {task_name}: {time.perf_counter() - start:.1f}s, collapsed stacks -> {out}")
+        log_hotspots(stacks, logger, task_name, top_n)
+
+
+def finish_run(profiler: Optional[SamplingProfiler], output_dir: Optional[Path], logger, top_n: int = 20) -> None:
+    """Stop the profiler and write the whole-run aggregate."""
+    if profiler is None:
+        return
+    profiler.stop()
+    if output_dir is not None:
+        out = Path(output_dir) / "_run.folded"
+        write_collapsed(profiler.total, out)
+        logger.info(f"[profile] Run collapsed stacks -> {out} (flamegraph.pl / speedscope compatible)")
+    log_hotspots(profiler.total, logger, "whole run", top_n)
@@ -0,0 +1,200 @@
+"""Optional INT8 CPU annotation path with an accuracy gate.
+
+For a category's fp32 `.pt` weights:
+1. Export an INT8 OpenVINO graph through ultralytics (`format="openvino", int8=True`),
+   calibrated on the category's own `pre_images`.
+2. Predict the category `val` split (produced by DatasetOrganizer under
+   `data_root/val/images`) with both models and measure their agreement: the F1
+   of greedily matched detections (same class, IoU >= match_iou).
+3. Use the INT8 model for that category only if the agreement reaches
+   `min_agreement`.
+
+The gate result is cached next to the weights as `<stem>.int8.json`, keyed by
+the weights SHA-256 and the gate settings, so the export/evaluation runs once
+per trained model.
+
+Config (auto_annotation.int8):
+  enabled: false
+  min_agreement: 0.9
+  match_iou: 0.5
+  max_val_images: 200
+  calibration_fraction: 1.0
+"""
+
+from __future__ import annotations
+
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import yaml
+
+from .evaluator import box_iou
+from .utils import atomic_write_text, file_lock, file_sha256, get_image_files
+
+
+def gate_path(weights_path: Path) -> Path:
+    return weights_path.with_name(f"{weights_path.stem}.int8.json")
+
+
+def _gate_settings(int8_cfg: Dict[str, Any], imgsz: int) -> Dict[str, Any]:
+    return {
+        "min_agreement": float(int8_cfg.get("min_agreement", 0.9)),
+        "match_iou": float(int8_cfg.get("match_iou", 0.5)),
+        "max_val_images": int(int8_cfg.get("max_val_images", 200)),
+        "calibration_fraction": float(int8_cfg.get("calibration_fraction", 1.0)),
+        "imgsz": int(imgsz),
+    }
+
+
+def _detections(result) -> Tuple[np.ndarray, np.ndarray]:
+    if result.boxes is None or len(result.boxes) == 0:
+        return np.zeros((0, 4), dtype=np.float32), np.zeros(0, dtype=np.int64)
+    return result.boxes.xyxy.cpu().numpy(), result.boxes.cls.cpu().numpy().astype(np.int64)
+
+
+def detection_agreement(reference: List, candidate: List, match_iou: float = 0.5) -> float:
+    """F1 of candidate detections against reference detections (per-image greedy matching)."""
+    tp = fp = fn = 0
+    for ref, cand in zip(reference, candidate):
+        ref_boxes, ref_cls = _detections(ref)
+        cand_boxes, cand_cls = _detections(cand)
+        matched = 0
+        if len(ref_boxes) and len(cand_boxes):
+            iou = box_iou(cand_boxes, ref_boxes)
+            iou[cand_cls[:, None] != ref_cls[None, :]] = 0.0
+            used = np.zeros(len(ref_boxes), dtype=bool)
+            for i in np.argsort(-iou.max(axis=1)):
+                row = np.where(used, 0.0, iou[i])
+                j = int(row.argmax())
+                if row[j] >= match_iou:
+                    used[j] = True
+                    matched += 1
+        tp += matched
+        fp += len(cand_boxes) - matched
+        fn += len(ref_boxes) - matched
+    if tp + fp + fn == 0:
+        return 1.0
+    return 2 * tp / (2 * tp + fp + fn)
+
+
+def _export_int8(weights_path: Path, calib_images_dir: Path, imgsz: int, fraction: float) -> Path:
+    from ultralytics import YOLO
+
+    model = YOLO(str(weights_path))
+    calib_yaml = weights_path.with_name(f"{weights_path.stem}_int8_calib.yaml")
+    calib_yaml.write_text(
+        yaml.safe_dump({
+            "path": str(calib_images_dir.parent.resolve()),
+            "train": calib_images_dir.name,
+            "val": calib_images_dir.name,
+            "names": dict(model.names),
+        }, allow_unicode=True),
+        encoding="utf-8",
+    )
+    exported = model.export(format="openvino", int8=True, data=str(calib_yaml), imgsz=imgsz,
+                            fraction=fraction, device="cpu")
+    return Path(exported)
+
+
+def _load_gate(path: Path) -> Optional[Dict[str, Any]]:
+    if not path.exists():
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def ensure_int8_model(
+    weights_path: Path,
+    calib_images_dir: Path,
+    val_images_dir: Path,
+    config: Dict[str, Any],
+    logger,
+) -> Optional[Path]:
+    """Return the gated INT8 model for `weights_path`, or None if it failed the gate / is unavailable."""
+    from .predictor import YOLOPredictor
+
+    auto_cfg = config.get("auto_annotation", {})
+    int8_cfg = auto_cfg.get("int8") or {}
+    settings = _gate_settings(int8_cfg, auto_cfg.get("img_size", 640))
+    sha = file_sha256(str(weights_path))
+    path = gate_path(weights_path)
+
+    def cached_choice(gate: Optional[Dict[str, Any]]) -> Tuple[bool, Optional[Path]]:
+        if not gate or gate.get("weights_sha256") != sha or gate.get("settings") != settings:
+            return False, None
+        model = Path(gate["int8_model"]) if gate.get("passed") and gate.get("int8_model") else None
+        return True, (model if model is not None and model.exists() else None)
+
+    hit, model = cached_choice(_load_gate(path))
+    if hit:
+        return model
+
+    with file_lock(str(path) + ".lock", timeout=3600):
+        hit, model = cached_choice(_load_gate(path))
+        if hit:
+            return model
+
+        val_images = get_image_files(str(val_images_dir))[: settings["max_val_images"]]
+        logger.info(f"Exporting INT8 model for {weights_path} (calibration: {calib_images_dir})")
+        int8_model = _export_int8(weights_path, calib_images_dir, settings["imgsz"],
+                                  settings["calibration_fraction"])
+
+        fp32_results = YOLOPredictor(str(weights_path), config).predict_batch(val_images)
+        int8_results = YOLOPredictor(str(int8_model), config).predict_batch(val_images)
+        agreement = detection_agreement(fp32_results, int8_results, settings["match_iou"])
+        passed = agreement >= settings["min_agreement"]
+
+        gate = {
+            "weights": str(weights_path),
+            "weights_sha256": sha,
+            "settings": settings,
+            "int8_model": str(int8_model),
+            "val_images": len(val_images),
+            "agreement": round(agreement, 4),
+            "passed": passed,
+            "evaluated_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        atomic_write_text(str(path), json.dumps(gate, indent=2, ensure_ascii=False))
+        logger.info(
+            f"INT8 agreement with fp32 on {len(val_images)} val images: {agreement:.3f} "
+            f"(threshold {settings['min_agreement']}) -> {'use INT8' if passed else 'keep fp32'}"
+        )
+        return int8_model if passed else None
+
+
+def select_annotation_weights(io, config: Dict[str, Any], weights_path: Path, logger) -> Path:
+    """Pick the INT8 model for a category when enabled, on CPU, and it passed the gate."""
+    int8_cfg = config.get("auto_annotation", {}).get("int8") or {}
+    if not int8_cfg.get("enabled", False) or Path(weights_path).suffix != ".pt":
+        return weights_path
+
+    import torch
+
+    if torch.cuda.is_available():
+        return weights_path
+
+    tag = f"[{io.category_name}]"
+    val_images_dir = io.data_root / "val" / "images"
+    if not io.raw_images_dir.exists() or not get_image_files(str(io.raw_images_dir)):
+        logger.info(f"{tag} INT8 skipped: no calibration images in {io.raw_images_dir}")
+        return weights_path
+    if not val_images_dir.exists() or not get_image_files(str(val_images_dir)):
+        logger.info(f"{tag} INT8 skipped: no val split to gate on ({val_images_dir})")
+        return weights_path
+
+    try:
+        int8_model = ensure_int8_model(Path(weights_path), io.raw_images_dir, val_images_dir, config, logger)
+    except Exception as e:
+        logger.warning(f"{tag} INT8 export/evaluation failed, using fp32 weights: {e}")
+        return weights_path
+
+    if int8_model is None:
+        return weights_path
+    logger.info(f"{tag} Using INT8 model: {int8_model}")
+    return int8_model
@@ -0,0 +1,287 @@
+"""Structured timing / throughput instrumentation.
+
+A `RunMetrics` collects one `TaskMetrics` per station/category task. Each task
+accumulates wall time per pipeline stage, the number of annotated images and
+per-image latencies, and records the process peak RSS when it finishes.
+
+Stages:
+  scan, weight_resolution, model_load, decode, preprocess, inference,
+  postprocess, label_write (plus prepare/train when a task trains a model)
+
+The decode share of a prediction call is derived from the ultralytics
+`result.speed` breakdown: whatever wall time is not preprocess/inference/
+postprocess is spent loading and decoding the source images.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from .utils import atomic_write_text, ensure_dir
+
+STAGES = (
+    "scan",
+    "weight_resolution",
+    "model_load",
+    "staging",
+    "decode",
+    "preprocess",
+    "inference",
+    "postprocess",
+    "label_write",
+)
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """Return the peak resident set size of this process, or None if unavailable."""
+    try:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports KiB, macOS reports bytes.
+        return int(peak) if sys.platform == "darwin" else int(peak) * 1024
+    except (ImportError, AttributeError, OSError):
+        pass
+
+    try:
+        import psutil  # optional
+
+        info = psutil.Process().memory_info()
+        return int(getattr(info, "peak_wset", 0) or info.rss)
+    except Exception:
+        return None
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Linear-interpolated percentile (q in [0, 100]) of an unsorted list."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * q / 100.0
+    lo = math.floor(k)
+    hi = math.ceil(k)
+    if lo == hi:
+        return ordered[int(k)]
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+class TaskMetrics:
+    """Metrics for a single station/category task."""
+
+    def __init__(self, name: str, labels: Optional[Dict[str, str]] = None):
+        self.name = name
+        self.labels = dict(labels or {})
+        self.stages: Dict[str, float] = {}
+        self.latencies_ms: List[float] = []
+        self.images = 0
+        self.extra: Dict[str, Any] = {}
+        self._start = time.perf_counter()
+        self.wall_s: Optional[float] = None
+        self.peak_rss: Optional[int] = None
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage(name, time.perf_counter() - start)
+
+    def add_stage(self, name: str, seconds: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + max(0.0, seconds)
+
+    def record_predictions(self, results: Iterable[Any], wall_s: float, count_images: bool = True) -> None:
+        """Attribute the wall time of one predict call to decode/preprocess/inference/postprocess.
+
+        With count_images=False (a second pass over already-counted images, e.g. cascade
+        escalation) only the stage times are added.
+        """
+        results = list(results)
+        if not results:
+            self.add_stage("inference", wall_s)
+            return
+
+        per_image = []
+        timed_ms = 0.0
+        for result in results:
+            speed = getattr(result, "speed", None) or {}
+            pre = float(speed.get("preprocess") or 0.0)
+            inf = float(speed.get("inference") or 0.0)
+            post = float(speed.get("postprocess") or 0.0)
+            self.add_stage("preprocess", pre / 1000.0)
+            self.add_stage("inference", inf / 1000.0)
+            self.add_stage("postprocess", post / 1000.0)
+            per_image.append(pre + inf + post)
+            timed_ms += pre + inf + post
+
+        decode_ms = max(0.0, wall_s * 1000.0 - timed_ms)
+        self.add_stage("decode", decode_ms / 1000.0)
+        if not count_images:
+            return
+        decode_share = decode_ms / len(results)
+        self.latencies_ms.extend(ms + decode_share for ms in per_image)
+        self.images += len(results)
+
+    def finish(self) -> "TaskMetrics":
+        if self.wall_s is None:
+            self.wall_s = time.perf_counter() - self._start
+            self.peak_rss = peak_rss_bytes()
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Snapshot of the task; an unfinished task reports its wall time and peak RSS so far.
+
+        The peak RSS is the process high-water mark (ru_maxrss), which cannot be reset per
+        task, so it covers every task run before this one in the same process.
+        """
+        wall = self.wall_s if self.wall_s is not None else time.perf_counter() - self._start
+        peak_rss = self.peak_rss if self.wall_s is not None else peak_rss_bytes()
+        compute = sum(self.stages.get(s, 0.0) for s in ("decode", "preprocess", "inference", "postprocess"))
+        data = {
+            "name": self.name,
+            "labels": self.labels,
+            "wall_s": round(wall, 4),
+            "images": self.images,
+            "images_per_s": round(self.images / compute, 3) if compute > 0 and self.images else None,
+            "stages_s": {k: round(v, 4) for k, v in self.stages.items()},
+            "latency_ms": {
+                "mean": round(sum(self.latencies_ms) / len(self.latencies_ms), 3) if self.latencies_ms else None,
+                "p50": _round(percentile(self.latencies_ms, 50)),
+                "p90": _round(percentile(self.latencies_ms, 90)),
+                "p99": _round(percentile(self.latencies_ms, 99)),
+            },
+            "peak_rss_mb": round(peak_rss / (1024 * 1024), 1) if peak_rss else None,
+            "peak_rss_scope": "process",
+        }
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+def _round(value: Optional[float], digits: int = 3) -> Optional[float]:
+    return round(value, digits) if value is not None else None
+
+
+class RunMetrics:
+    """Collects task metrics for a whole run and renders summaries."""
+
+    def __init__(self, run_name: str):
+        self.run_name = run_name
+        self.tasks: List[TaskMetrics] = []
+        self.stages: Dict[str, float] = {}
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+
+    def task(self, name: str, **labels: str) -> TaskMetrics:
+        metrics = TaskMetrics(name, labels)
+        self.tasks.append(metrics)
+        return metrics
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def summary(self) -> Dict[str, Any]:
+        for t in self.tasks:
+            t.finish()
+        stage_totals: Dict[str, float] = dict(self.stages)
+        for t in self.tasks:
+            for k, v in t.stages.items():
+                stage_totals[k] = stage_totals.get(k, 0.0) + v
+        latencies = [ms for t in self.tasks for ms in t.latencies_ms]
+        images = sum(t.images for t in self.tasks)
+        wall = time.perf_counter() - self._start
+        peak = peak_rss_bytes()
+        return {
+            "run": self.run_name,
+            "started_at": self.started_at,
+            "wall_s": round(wall, 3),
+            "tasks": len(self.tasks),
+            "images": images,
+            "images_per_s": round(images / wall, 3) if wall > 0 and images else None,
+            "stages_s": {k: round(v, 4) for k, v in stage_totals.items()},
+            "latency_ms": {
+                "p50": _round(percentile(latencies, 50)),
+                "p90": _round(percentile(latencies, 90)),
+                "p99": _round(percentile(latencies, 99)),
+            },
+            "peak_rss_mb": round(peak / (1024 * 1024), 1) if peak else None,
+            "per_task": [t.to_dict() for t in self.tasks],
+        }
+
+    def log_summary(self, logger) -> Dict[str, Any]:
+        summary = self.summary()
+        logger.info(f"\n{'=' * 60}")
+        logger.info("Timing Summary")
+        logger.info(f"{'=' * 60}")
+        logger.info(
+            f"Wall: {summary['wall_s']:.1f}s, images: {summary['images']}, "
+            f"throughput: {summary['images_per_s'] or '-'} img/s, peak RSS: {summary['peak_rss_mb'] or '-'} MB"
+        )
+        for stage in STAGES + tuple(k for k in summary["stages_s"] if k not in STAGES):
+            if stage in summary["stages_s"]:
+                logger.info(f"  {stage:<18} {summary['stages_s'][stage]:>10.3f}s")
+        for t in summary["per_task"]:
+            if t["images"]:
+                logger.info(
+                    f"  [{t['name']}] {t['images']} images, {t['images_per_s'] or '-'} img/s, "
+                    f"p50 {t['latency_ms']['p50']} ms, p90 {t['latency_ms']['p90']} ms"
+                )
+        return summary
+
+    def write_json(self, path: str) -> None:
+        ensure_dir(str(Path(path).parent))
+        atomic_write_text(path, json.dumps(self.summary(), indent=2, ensure_ascii=False))
+
+    def write_prometheus(self, path: str) -> None:
+        """Write a node_exporter textfile-collector compatible snapshot."""
+        summary = self.summary()
+        lines: List[str] = []
+
+        def metric(name: str, help_text: str, samples: List[tuple]) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in samples:
+                if value is None:
+                    continue
+                label_str = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+                lines.append(f"{name}{{{label_str}}} {value}" if label_str else f"{name} {value}")
+
+        run = {"run": self.run_name}
+        metric("autolabel_run_timestamp_seconds", "Unix time the run started", [(run, summary["started_at"])])
+        metric("autolabel_run_wall_seconds", "Wall time of the run", [(run, summary["wall_s"])])
+        metric("autolabel_run_images_total", "Images annotated in the run", [(run, summary["images"])])
+        metric("autolabel_run_peak_rss_megabytes", "Peak RSS of the run", [(run, summary["peak_rss_mb"])])
+
+        task_labels = [dict(run, task=t["name"], **t["labels"]) for t in summary["per_task"]]
+        metric("autolabel_task_wall_seconds", "Wall time per task",
+               [(lbl, t["wall_s"]) for lbl, t in zip(task_labels, summary["per_task"])])
+        metric("autolabel_task_images_total", "Images annotated per task",
+               [(lbl, t["images"]) for lbl, t in zip(task_labels, summary["per_task"])])
+        metric("autolabel_task_images_per_second", "Annotation throughput per task",
+               [(lbl, t["images_per_s"]) for lbl, t in zip(task_labels, summary["per_task"])])
+        metric("autolabel_task_stage_seconds", "Wall time per task and stage",
+               [(dict(lbl, stage=s), v) for lbl, t in zip(task_labels, summary["per_task"])
+                for s, v in t["stages_s"].items()])
+        metric("autolabel_task_latency_milliseconds", "Per-image latency quantiles per task",
+               [(dict(lbl, quantile=q), t["latency_ms"][key]) for lbl, t in zip(task_labels, summary["per_task"])
+                for q, key in (("0.5", "p50"), ("0.9", "p90"), ("0.99", "p99"))])
+        metric("autolabel_task_peak_rss_megabytes", "Process peak RSS when the task finished",
+               [(lbl, t["peak_rss_mb"]) for lbl, t in zip(task_labels, summary["per_task"])])
+
+        ensure_dir(str(Path(path).parent))
+        atomic_write_text(path, "\n".join(lines) + "\n")
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
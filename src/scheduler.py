@@ -0,0 +1,261 @@
+"""Cost-model-driven ordering of station/category tasks.
+
+Tasks range from a handful of images to tens of thousands, so running them in
+directory order tends to end a parallel or time-boxed run with one straggler.
+This module keeps a small history of measured throughput per model
+(images/sec for each weights + imgsz, as an exponential moving average),
+estimates every planned task's cost before the run starts, orders tasks by a
+schedule, and refines the run's ETA as tasks finish.
+
+The history lives in a JSON file next to the run logs:
+
+    {"version": 1,
+     "annotate": {"<weights>@<imgsz>": {"images_per_s": .., "overhead_s": .., "samples": ..}},
+     "train":    {"<imgsz>x<epochs>": {"s_per_image": .., "samples": ..}}}
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from .utils import atomic_write_text, file_lock
+
+DEFAULT_HISTORY_PATH = "logs/throughput_history.json"
+SCHEDULES = ("directory", "longest-first", "freshest")
+
+# Priors used until a model/imgsz has been measured once
+DEFAULT_IMAGES_PER_S = 5.0
+DEFAULT_OVERHEAD_S = 5.0
+DEFAULT_TRAIN_S_PER_IMAGE = 2.0
+
+HISTORY_VERSION = 1
+_IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff")
+
+
+def throughput_key(weights, imgsz) -> str:
+    return f"{Path(weights).expanduser().resolve()}@{imgsz}"
+
+
+def _ema(old: Optional[float], new: float, alpha: float) -> float:
+    return new if old is None else (1.0 - alpha) * old + alpha * new
+
+
+class ThroughputHistory:
+    """Per-model throughput history (EMA), persisted as JSON."""
+
+    def __init__(self, path: str = DEFAULT_HISTORY_PATH, alpha: float = 0.3):
+        self.path = path
+        self.alpha = alpha
+        self.data = self._read()
+        self._dirty: Dict[str, set] = {"annotate": set(), "train": set()}
+
+    def _read(self) -> dict:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == HISTORY_VERSION:
+                data.setdefault("annotate", {})
+                data.setdefault("train", {})
+                return data
+        except (OSError, ValueError):
+            pass
+        return {"version": HISTORY_VERSION, "annotate": {}, "train": {}}
+
+    # -- estimates -------------------------------------------------------
+
+    def images_per_s(self, key: str, imgsz) -> float:
+        entry = self.data["annotate"].get(key)
+        if entry:
+            return entry["images_per_s"]
+        # Unknown model: use the median of models measured at the same imgsz
+        same = sorted(
+            e["images_per_s"] for k, e in self.data["annotate"].items() if k.rsplit("@", 1)[-1] == str(imgsz)
+        )
+        return same[len(same) // 2] if same else DEFAULT_IMAGES_PER_S
+
+    def overhead_s(self, key: str) -> float:
+        entry = self.data["annotate"].get(key)
+        return entry.get("overhead_s", DEFAULT_OVERHEAD_S) if entry else DEFAULT_OVERHEAD_S
+
+    def train_s_per_image(self, imgsz, epochs) -> float:
+        entry = self.data["train"].get(f"{imgsz}x{epochs}")
+        return entry["s_per_image"] if entry else DEFAULT_TRAIN_S_PER_IMAGE
+
+    # -- updates ---------------------------------------------------------
+
+    def record_annotate(self, key: str, images: int, seconds: float, overhead_s: float = 0.0) -> None:
+        if images <= 0 or seconds <= 0:
+            return
+        entry = self.data["annotate"].get(key, {})
+        entry["images_per_s"] = round(_ema(entry.get("images_per_s"), images / seconds, self.alpha), 4)
+        entry["overhead_s"] = round(_ema(entry.get("overhead_s"), overhead_s, self.alpha), 3)
+        entry["samples"] = entry.get("samples", 0) + 1
+        entry["updated_at"] = time.time()
+        self.data["annotate"][key] = entry
+        self._dirty["annotate"].add(key)
+
+    def record_train(self, imgsz, epochs, images: int, seconds: float) -> None:
+        if images <= 0 or seconds <= 0:
+            return
+        key = f"{imgsz}x{epochs}"
+        entry = self.data["train"].get(key, {})
+        entry["s_per_image"] = round(_ema(entry.get("s_per_image"), seconds / images, self.alpha), 4)
+        entry["samples"] = entry.get("samples", 0) + 1
+        entry["updated_at"] = time.time()
+        self.data["train"][key] = entry
+        self._dirty["train"].add(key)
+
+    def save(self) -> None:
+        """Merge this run's updated entries into the file (other runs may have written meanwhile)."""
+        if not any(self._dirty.values()):
+            return
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        with file_lock(f"{self.path}.lock"):
+            merged = self._read()
+            for section, keys in self._dirty.items():
+                for key in keys:
+                    merged[section][key] = self.data[section][key]
+            atomic_write_text(self.path, json.dumps(merged, indent=2, ensure_ascii=False))
+        self.data = merged
+        self._dirty = {"annotate": set(), "train": set()}
+
+
+def seed_from_registry(history: ThroughputHistory, registry_path: str, imgsz) -> int:
+    """Use this host's benchmark-models results as priors for models without run history.
+
+    Returns how many models were seeded. Seeded entries are not written back.
+    """
+    import socket
+
+    from .model_registry import load_model_registry, load_registry_metadata, resolve_registry_weight
+
+    try:
+        registry = load_model_registry(registry_path)
+        metadata = load_registry_metadata(registry_path)
+    except (OSError, ValueError):
+        return 0
+    host = socket.gethostname()
+    seeded = 0
+    for category, entry in metadata.items():
+        bench = (entry.get("hosts") or {}).get(host)
+        if not bench or str(bench.get("imgsz")) != str(imgsz) or not bench.get("batch_images_per_s"):
+            continue
+        weights = resolve_registry_weight(registry, category, registry_path=registry_path)
+        if weights is None:
+            continue
+        key = throughput_key(weights, imgsz)
+        if key not in history.data["annotate"]:
+            history.data["annotate"][key] = {
+                "images_per_s": bench["batch_images_per_s"],
+                "overhead_s": round(bench.get("cold_load_s", 0.0) + bench.get("prepare_s", 0.0), 3),
+                "samples": 0,
+                "source": "benchmark-models",
+            }
+            seeded += 1
+    return seeded
+
+
+def estimate_task_cost(task, history: ThroughputHistory, imgsz, epochs, train_budget_s=None) -> float:
+    """Estimated wall seconds of a planned task (see planner.PlannedTask); training is capped by its budget."""
+    action = task.effective_action
+    cost = 0.0
+    if action in ("train", "train_and_annotate"):
+        train_s = max(1, task.labeled_images) * history.train_s_per_image(imgsz, epochs)
+        cost += min(train_s, train_budget_s) if train_budget_s else train_s
+    if action in ("annotate", "train_and_annotate") and task.weights:
+        key = throughput_key(task.weights, imgsz)
+        if task.unlabeled_images:
+            cost += history.overhead_s(key) + task.unlabeled_images / history.images_per_s(key, imgsz)
+    return cost
+
+
+def newest_image_mtime(directory: Optional[Path]) -> float:
+    """Most recent mtime of an image directly under `directory` (0 if none)."""
+    newest = 0.0
+    if not directory:
+        return newest
+    try:
+        with os.scandir(directory) as it:
+            for entry in it:
+                if entry.name.lower().endswith(_IMAGE_SUFFIXES) and entry.is_file():
+                    newest = max(newest, entry.stat().st_mtime)
+    except OSError:
+        pass
+    return newest
+
+
+@dataclass
+class ScheduledTask:
+    key: str
+    payload: object            # whatever the caller needs to run the task
+    plan: object               # planner.PlannedTask
+    estimate_s: float
+    freshness: float = 0.0     # newest unlabeled image mtime
+
+
+def order_tasks(tasks: List[ScheduledTask], schedule: str = "directory") -> List[ScheduledTask]:
+    """Order tasks: directory (as scanned), longest-first (by estimate) or freshest (newest images first)."""
+    if schedule not in SCHEDULES:
+        raise ValueError(f"Unsupported schedule: {schedule} (expected one of {SCHEDULES})")
+    if schedule == "longest-first":
+        return sorted(tasks, key=lambda t: -t.estimate_s)
+    if schedule == "freshest":
+        return sorted(tasks, key=lambda t: (-t.freshness, -t.estimate_s))
+    return list(tasks)
+
+
+def _fmt_duration(seconds: float) -> str:
+    seconds = int(round(max(0.0, seconds)))
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours}h{minutes:02d}m"
+    if minutes:
+        return f"{minutes}m{secs:02d}s"
+    return f"{secs}s"
+
+
+class EtaTracker:
+    """Run ETA from per-task estimates, corrected by how far off the finished tasks were."""
+
+    def __init__(self, estimates: Dict[str, float]):
+        self.estimates = dict(estimates)
+        self.pending = set(estimates)
+        self.estimated_done = 0.0
+        self.actual_done = 0.0
+        self._start = time.perf_counter()
+
+    @property
+    def correction(self) -> float:
+        if self.estimated_done <= 0:
+            return 1.0
+        # Clamp so a single odd task cannot swing the whole ETA wildly
+        return min(10.0, max(0.1, self.actual_done / self.estimated_done))
+
+    def done(self, key: str, actual_s: float) -> None:
+        if key not in self.pending:
+            return
+        self.pending.discard(key)
+        self.estimated_done += self.estimates[key]
+        self.actual_done += actual_s
+
+    def remaining_s(self) -> float:
+        return sum(self.estimates[k] for k in self.pending) * self.correction
+
+    def describe(self) -> str:
+        total = len(self.estimates)
+        finished = total - len(self.pending)
+        elapsed = time.perf_counter() - self._start
+        return (
+            f"{finished}/{total} tasks, elapsed {_fmt_duration(elapsed)}, "
+            f"ETA {_fmt_duration(self.remaining_s())} (estimate x{self.correction:.2f})"
+        )
+
+
+def total_estimate(tasks: Iterable[ScheduledTask]) -> str:
+    return _fmt_duration(sum(t.estimate_s for t in tasks))
@@ -0,0 +1,318 @@
+"""Local staging tier for images that live on slow mounts (WSL `/mnt/<drive>` 9p, SMB, NFS).
+
+On such mounts every file open/read is a round trip, and decoding straight from
+the mount leaves the inference loop waiting on I/O. With staging enabled:
+
+- `StagingCache` copies upcoming images into a size-capped local directory on
+  a background thread pool, a few chunks ahead of the inference cursor; readers
+  get the local copy (same file name, so label stems are unchanged). Staged
+  files are evicted least-recently-used once the cache exceeds its cap; files
+  that are staged but not yet consumed are pinned.
+- `LabelWriter` collects label files and writes them back to the mount in
+  batches on a background thread, off the inference path. Each file is
+  replaced (temp file + rename), never rewritten in place, so a label that is
+  hardlinked elsewhere (copy_matched_labels --mode hardlink) is not changed there.
+- `staged_data_root` places a category's training split (`<category>/category`)
+  on local disk, so training epochs never read from the mount.
+
+Staging is off by default. `staging.enabled: auto` turns it on only for sources
+on a slow filesystem (see SLOW_FILESYSTEMS); `true` forces it on. Staged
+training splits (`datasets/`) are not covered by `max_gb`.
+
+Cache layout (default `~/.cache/auto-labeling/staging`):
+
+    images/<key[:2]>/<key>/<file name>   staged copy; key = hash of source path, size and mtime
+    datasets/<hash of category dir>/     training splits of staged categories
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .utils import atomic_write_text, ensure_dir, setup_logger
+
+DEFAULT_STAGING_DIR = Path.home() / ".cache" / "auto-labeling" / "staging"
+SLOW_FILESYSTEMS = {
+    "9p", "v9fs", "drvfs", "cifs", "smb3", "smbfs", "nfs", "nfs4",
+    "fuse.sshfs", "fuse.rclone", "fuse.s3fs", "fuse.gcsfuse",
+}
+
+logger = setup_logger(__name__)
+
+_MOUNTS: Optional[List[Tuple[str, str]]] = None
+
+
+def _mounts() -> List[Tuple[str, str]]:
+    """(mount point, fs type) pairs, longest mount point first."""
+    global _MOUNTS
+    if _MOUNTS is None:
+        mounts = []
+        try:
+            with open("/proc/mounts", "r", encoding="utf-8") as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) >= 3:
+                        mounts.append((parts[1].replace("\\040", " "), parts[2]))
+        except OSError:
+            pass
+        _MOUNTS = sorted(mounts, key=lambda m: len(m[0]), reverse=True)
+    return _MOUNTS
+
+
+def filesystem_type(path) -> Optional[str]:
+    """Filesystem type of the mount holding `path` (None when unknown, e.g. not Linux)."""
+    resolved = str(Path(path).expanduser().resolve())
+    for mount_point, fs_type in _mounts():
+        if resolved == mount_point or resolved.startswith(mount_point.rstrip("/") + "/"):
+            return fs_type
+    return None
+
+
+def staging_enabled(config: Dict[str, Any], path) -> bool:
+    cfg = config.get("staging") or {}
+    enabled = cfg.get("enabled", False)
+    if enabled == "auto":
+        return filesystem_type(path) in SLOW_FILESYSTEMS
+    return bool(enabled)
+
+
+def staging_dir(config: Dict[str, Any]) -> Path:
+    return Path((config.get("staging") or {}).get("dir") or DEFAULT_STAGING_DIR).expanduser()
+
+
+class StagingCache:
+    """Size-capped local copies of source images, filled ahead of the reader by a thread pool.
+
+    Usage per chunk: `prefetch(next_chunks)`, `local = fetch(chunk)`, read `local`,
+    then `release(local)`. A file that cannot be staged is read from its source.
+    """
+
+    def __init__(self, cache_dir, max_bytes: int, workers: int = 8):
+        self.root = Path(cache_dir) / "images"
+        ensure_dir(str(self.root))
+        self.max_bytes = int(max_bytes)
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="staging")
+        self._lock = threading.Lock()
+        self._lru: "OrderedDict[Path, int]" = OrderedDict()
+        self._bytes = 0
+        self._pinned: Dict[Path, int] = {}
+        self._futures: Dict[Path, Future] = {}
+        self.stats = {"staged": 0, "hits": 0, "staged_bytes": 0, "evicted": 0, "fallbacks": 0}
+        self._load_existing()
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "StagingCache":
+        cfg = config.get("staging") or {}
+        return cls(
+            staging_dir(config),
+            max_bytes=int(float(cfg.get("max_gb", 20)) * (1 << 30)),
+            workers=int(cfg.get("workers", 8)),
+        )
+
+    def _load_existing(self) -> None:
+        """Adopt copies staged by earlier runs (oldest access first); drop half-written temp files."""
+        entries = []
+        for path in self.root.glob("*/*/*"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            if path.name.startswith(".") and path.name.endswith(".tmp"):
+                path.unlink(missing_ok=True)
+                continue
+            entries.append((st.st_atime, path, st.st_size))
+        for _, path, size in sorted(entries):
+            self._lru[path] = size
+            self._bytes += size
+        with self._lock:
+            self._evict()
+
+    def _local_path(self, src: Path) -> Tuple[Path, int]:
+        st = os.stat(src)
+        key = hashlib.sha1(f"{Path(src).resolve()}\0{st.st_size}\0{st.st_mtime_ns}".encode("utf-8")).hexdigest()[:20]
+        return self.root / key[:2] / key / Path(src).name, st.st_size
+
+    def _pin(self, local: Path) -> None:
+        self._pinned[local] = self._pinned.get(local, 0) + 1
+
+    def _evict(self) -> None:
+        """Drop least-recently-used unpinned copies until the cache fits its cap (lock held)."""
+        if self._bytes <= self.max_bytes:
+            return
+        for path in list(self._lru):
+            if self._bytes <= self.max_bytes:
+                break
+            if self._pinned.get(path):
+                continue
+            size = self._lru.pop(path)
+            self._bytes -= size
+            self.stats["evicted"] += 1
+            try:
+                path.unlink()
+                path.parent.rmdir()
+            except OSError:
+                pass
+
+    def _stage(self, src: Path) -> Path:
+        local, size = self._local_path(src)
+        with self._lock:
+            if local in self._lru:
+                self._lru.move_to_end(local)
+                self._pin(local)
+                self.stats["hits"] += 1
+                return local
+        if size > self.max_bytes:
+            return src
+
+        ensure_dir(str(local.parent))
+        tmp = local.with_name(f".{local.name}.{threading.get_ident()}.tmp")
+        try:
+            shutil.copyfile(src, tmp)
+            os.replace(tmp, local)
+        finally:
+            tmp.unlink(missing_ok=True)
+
+        with self._lock:
+            if local not in self._lru:
+                self._lru[local] = size
+                self._bytes += size
+                self.stats["staged"] += 1
+                self.stats["staged_bytes"] += size
+            self._lru.move_to_end(local)
+            self._pin(local)
+            self._evict()
+        return local
+
+    def prefetch(self, paths: Sequence[Path]) -> None:
+        """Start staging `paths` in the background (no-op for paths already queued)."""
+        with self._lock:
+            for src in paths:
+                src = Path(src)
+                if src not in self._futures:
+                    self._futures[src] = self._pool.submit(self._stage, src)
+
+    def fetch(self, paths: Sequence[Path]) -> List[Path]:
+        """Local copies of `paths` (waiting for in-flight copies); unstageable files map to their source."""
+        self.prefetch(paths)
+        local_paths = []
+        for src in paths:
+            src = Path(src)
+            with self._lock:
+                future = self._futures.pop(src, None)
+            if future is None:  # listed twice in `paths`
+                future = self._pool.submit(self._stage, src)
+            try:
+                local_paths.append(future.result())
+            except OSError as e:
+                logger.warning(f"Staging failed for {src}, reading it in place: {e}")
+                self.stats["fallbacks"] += 1
+                local_paths.append(src)
+        return local_paths
+
+    def release(self, local_paths: Sequence[Path]) -> None:
+        """Mark fetched copies as consumed, making them evictable."""
+        with self._lock:
+            for local in local_paths:
+                local = Path(local)
+                count = self._pinned.get(local, 0) - 1
+                if count > 0:
+                    self._pinned[local] = count
+                else:
+                    self._pinned.pop(local, None)
+            self._evict()
+
+    def close(self) -> None:
+        with self._lock:
+            futures, self._futures = list(self._futures.values()), {}
+        for future in futures:
+            future.cancel()
+        self._pool.shutdown(wait=True)
+        with self._lock:
+            self._pinned.clear()
+            self._evict()
+
+    def __enter__(self) -> "StagingCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class LabelWriter:
+    """Write label files back in batches on a background thread.
+
+    `write()` only queues; `flush()` hands the queued batch to the writer thread
+    (call it at chunk boundaries so an interrupted run keeps finished chunks);
+    `wait()` flushes and blocks until everything queued is written; `close()`
+    waits and stops the thread. Both re-raise the first write error.
+    """
+
+    def __init__(self, batch_size: int = 200):
+        self.batch_size = max(1, int(batch_size))
+        self._pending: List[Tuple[Path, str]] = []
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="label-writer")
+        self._futures: List[Future] = []
+        self.written = 0
+
+    def write(self, path: Path, text: str) -> None:
+        self._pending.append((Path(path), text))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        batch, self._pending = self._pending, []
+        if batch:
+            self._futures.append(self._pool.submit(self._write_batch, batch))
+
+    @staticmethod
+    def _write_batch(batch: List[Tuple[Path, str]]) -> int:
+        for path, text in batch:
+            atomic_write_text(str(path), text)
+        return len(batch)
+
+    def wait(self) -> None:
+        self.flush()
+        futures, self._futures = self._futures, []
+        for future in futures:
+            self.written += future.result()
+
+    def close(self) -> None:
+        try:
+            self.wait()
+        finally:
+            self._futures = []
+            self._pool.shutdown(wait=True)
+
+    def __enter__(self) -> "LabelWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def open_staging(config: Dict[str, Any], source_dir, output_dir=None) -> Tuple[Optional[StagingCache], Optional[LabelWriter]]:
+    """Staging cache for reads from `source_dir` and label writer for `output_dir`, each only where enabled."""
+    cfg = config.get("staging") or {}
+    cache = StagingCache.from_config(config) if staging_enabled(config, source_dir) else None
+    writer = None
+    if output_dir is not None and staging_enabled(config, output_dir):
+        writer = LabelWriter(cfg.get("label_batch", 200))
+    if cache or writer:
+        logger.info(f"Staging: images {'-> ' + str(cache.root) if cache else 'read in place'}, "
+                    f"labels {'written back in batches' if writer else 'written directly'}")
+    return cache, writer
+
+
+def staged_data_root(config: Dict[str, Any], category_root: Path, data_root: Path) -> Path:
+    """Where a category's training split should live: local disk when its category dir is staged."""
+    if not staging_enabled(config, category_root):
+        return data_root
+    key = hashlib.sha1(str(Path(category_root).resolve()).encode("utf-8")).hexdigest()[:16]
+    return staging_dir(config) / "datasets" / f"{Path(category_root).name}-{key}" / data_root.name
@@ -0,0 +1,411 @@
+"""Runner for station batches (scripts/train_by_station.py).
+
+The script parses the CLI and wires the pieces together; this module holds the
+per-task logic so it can be called (and tested) with explicit arguments:
+
+- `process_entry`: one whole station/category task (train and/or annotate)
+- `run_fanout`: groups of categories sharing images, decoded once (src/fanout.py)
+- `schedule_entries`: planned, cost-estimated and ordered tasks (src/scheduler.py)
+- `build_work_units`: whole tasks, or in distributed mode image shards of large
+  annotate-only tasks (`<task>#<i>of<n>`, plus `<task>#videos` for their clips)
+- `run_unit`: one work unit with metrics, profiling, throughput history and ETA
+"""
+
+from __future__ import annotations
+
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .category_pipeline import build_category_io, resolve_cascade_weights, resolve_weights
+from .category_runner import process_category
+from .lease_queue import LeaseQueue, shard_keys, shard_slice
+from .planner import plan_station_entry
+from .profiler import profile_task
+from .quantization import select_annotation_weights
+from .run_metrics import RunMetrics, TaskMetrics
+from .scheduler import (
+    EtaTracker,
+    ScheduledTask,
+    ThroughputHistory,
+    estimate_task_cost,
+    newest_image_mtime,
+    order_tasks,
+    throughput_key,
+)
+from .utils import get_image_files
+from .video_source import get_video_files, video_settings
+
+VIDEO_SHARD_SUFFIX = "#videos"
+
+
+@dataclass
+class StationRun:
+    """Settings shared by every task of a station batch (the CLI options)."""
+
+    base_config: Dict[str, Any]
+    action: str
+    shared_model_root: str
+    weight_options: Dict[str, Any]     # registry / model map / pretrained options of resolve_weights
+    force_train: bool = False
+    train_init: str = "reuse"
+    output_layout: str = "yolo"
+    skip_existing: bool = True
+    shard_size: int = 0
+
+    def model_root(self, category_name: str) -> Path:
+        return Path(self.shared_model_root).expanduser().resolve() / category_name
+
+    def cascade_weights(self, category_name: str) -> Optional[Path]:
+        return resolve_cascade_weights(
+            category_name,
+            self.base_config,
+            registry=self.weight_options.get("registry"),
+            registry_path=self.weight_options.get("registry_path"),
+        )
+
+    def annotation_weights(self, entry, weights: Path, logger) -> Path:
+        """Weights the per-category path would annotate with (INT8 gate for non-flat layouts)."""
+        if entry.layout == "flat_images":
+            return Path(weights)
+        io = build_category_io(
+            entry.category_name, entry.category_dir, use_pre_prefix=True,
+            shared_model_root=self.shared_model_root, config=self.base_config,
+        )
+        return select_annotation_weights(io, self.base_config, Path(weights), logger)
+
+
+@dataclass
+class WorkUnits:
+    units: Dict[str, ScheduledTask] = field(default_factory=dict)         # unit key -> its task
+    shard_images: Dict[str, List[str]] = field(default_factory=dict)      # task key -> names its shards cut
+
+    def estimates(self) -> Dict[str, float]:
+        """Per-unit cost estimates: a task's estimate split evenly over its units."""
+        counts = Counter(id(t) for t in self.units.values())
+        return {k: t.estimate_s / counts[id(t)] for k, t in self.units.items()}
+
+
+def task_images_dir(entry) -> Path:
+    return entry.category_dir if entry.layout == "flat_images" else entry.category_dir / "images"
+
+
+def has_videos(config: Dict[str, Any], images_dir: Path) -> bool:
+    video_cfg = video_settings(config)
+    return bool(video_cfg["enabled"] and get_video_files(images_dir, video_cfg["extensions"]))
+
+
+def process_entry(run: StationRun, station_name: str, entry, task_metrics: TaskMetrics, logger) -> bool:
+    """Run one station/category task, downgrading train actions when there are no pre-labeled data."""
+    category_name = entry.category_name
+    category_dir = entry.category_dir
+
+    effective_action = run.action
+    has_pre_labeled = (category_dir / "pre_images").exists() and (category_dir / "pre_labels").exists()
+    if effective_action in ("train", "train_and_annotate") and not has_pre_labeled:
+        logger.info(f"[{station_name}/{category_name}] No pre_images/pre_labels; downgrade action to annotate")
+        effective_action = "annotate"
+
+    if entry.layout in ("dir_images", "pre_labeled"):
+        return process_category(
+            category_name=category_name,
+            category_root=category_dir,
+            base_config=run.base_config,
+            logger=logger,
+            use_pre_prefix=True,
+            action=effective_action,
+            force_train=run.force_train,
+            train_init=run.train_init,
+            shared_model_root=run.shared_model_root,
+            output_layout=run.output_layout,
+            skip_existing=run.skip_existing,
+            metrics=task_metrics,
+            **run.weight_options,
+        )
+
+    if entry.layout == "flat_images":
+        with task_metrics.stage("weight_resolution"):
+            weights, source = resolve_weights(category_name, run.model_root(category_name), **run.weight_options)
+        if not weights:
+            logger.error(f"[{station_name}/{category_name}] No usable weights found (source={source})")
+            return False
+
+        from .auto_annotator import AutoAnnotator
+
+        labels_dir = category_dir / "labels"
+        cascade_weights = run.cascade_weights(category_name)
+        annotator = AutoAnnotator(
+            str(weights), run.base_config, cascade_model_path=str(cascade_weights) if cascade_weights else None
+        )
+        logger.info(f"[{station_name}/{category_name}] Flat images -> labels dir: {labels_dir}")
+        annotator.annotate_images_yolo(
+            str(category_dir),
+            str(labels_dir),
+            skip_existing=run.skip_existing,
+            write_empty=True,
+            report_path=str(labels_dir / "_auto_label_report.json"),
+            metrics=task_metrics,
+        )
+        return True
+
+    logger.warning(f"[{station_name}/{category_name}] Unknown layout: {entry.layout}")
+    return False
+
+
+def build_fanout_tasks(run: StationRun, station_entries, logger) -> list:
+    """One FanoutTask per category with images and usable weights."""
+    from .fanout import FanoutTask
+
+    tasks = []
+    for station_name, categories in station_entries:
+        for entry in categories:
+            images_dir = task_images_dir(entry)
+            if not images_dir.exists():
+                continue
+            weights, _source = resolve_weights(
+                entry.category_name, run.model_root(entry.category_name), **run.weight_options
+            )
+            if not weights:
+                continue
+            tasks.append(FanoutTask(
+                key=f"{station_name}/{entry.category_name}",
+                images_dir=images_dir,
+                output_dir=entry.category_dir / "labels",
+                weights=run.annotation_weights(entry, weights, logger),
+                output_layout="yolo" if entry.layout == "flat_images" else run.output_layout,
+                cascade_weights=run.cascade_weights(entry.category_name),
+            ))
+    return tasks
+
+
+def run_fanout(
+    run: StationRun,
+    station_entries,
+    mode: str,
+    *,
+    logger,
+    run_metrics: RunMetrics,
+    profiler=None,
+    profile_dir: Optional[Path] = None,
+    profile_top: int = 20,
+) -> Dict[Tuple[str, str], bool]:
+    """Annotate groups of categories sharing images in one decode pass.
+
+    Returns {(station, category): ok} for the categories that were fanned out;
+    the others are left to the regular per-task path.
+    """
+    from .fanout import FanoutAnnotator, group_tasks
+
+    tasks = build_fanout_tasks(run, station_entries, logger)
+    with run_metrics.stage("fanout_grouping"):
+        groups = [g for g in group_tasks(tasks, mode, skip_existing=run.skip_existing) if len(g) > 1]
+
+    results = {}
+    for group in groups:
+        keys = [t.key for t in group]
+        logger.info(f"\n{'#' * 60}")
+        logger.info(f"Fan-out group ({mode}): {keys}")
+        logger.info(f"{'#' * 60}")
+        task_metrics = run_metrics.task(f"fanout:{'+'.join(keys)}", fanout=mode)
+        with profile_task(profiler, f"fanout__{'+'.join(keys)}", profile_dir, logger, profile_top):
+            try:
+                FanoutAnnotator(group, run.base_config, skip_existing=run.skip_existing).run(task_metrics)
+                ok = True
+            except Exception as e:
+                logger.error(f"Fan-out group {keys} failed: {e}", exc_info=True)
+                ok = False
+        task_metrics.finish()
+        for key in keys:
+            station_name, category_name = key.split("/", 1)
+            results[(station_name, category_name)] = ok
+    return results
+
+
+def schedule_entries(
+    run: StationRun,
+    station_entries,
+    history: ThroughputHistory,
+    *,
+    schedule: str = "directory",
+    skip: Iterable[str] = (),
+    logger,
+) -> List[ScheduledTask]:
+    """Plan and cost every station/category task (except the `skip` keys) and order them."""
+    infer_imgsz = run.base_config.get("auto_annotation", {}).get("img_size", 640)
+    train_cfg = run.base_config["training"]
+    train_budget_min = train_cfg.get("time_budget_min")
+    skip = set(skip)
+
+    scheduled = []
+    for station_name, categories in station_entries:
+        if not categories:
+            logger.warning(f"[{station_name}] No categories found")
+            continue
+        logger.info(f"[{station_name}] Found {len(categories)} categories: {[c.category_name for c in categories]}")
+
+        station_tasks = []
+        for entry in categories:
+            key = f"{station_name}/{entry.category_name}"
+            if key in skip:
+                continue
+            plan = plan_station_entry(
+                station_name,
+                entry,
+                action=run.action,
+                weight_options=run.weight_options,
+                shared_model_root=run.shared_model_root,
+                force_train=run.force_train,
+                train_init=run.train_init,
+                output_layout=run.output_layout,
+                skip_existing=run.skip_existing,
+            )
+            station_tasks.append(ScheduledTask(
+                key=key,
+                payload=(station_name, entry),
+                plan=plan,
+                estimate_s=estimate_task_cost(
+                    plan, history, infer_imgsz, train_cfg.get("epochs"),
+                    train_budget_s=train_budget_min * 60 if train_budget_min else None,
+                ),
+                freshness=newest_image_mtime(task_images_dir(entry)) if schedule == "freshest" else 0.0,
+            ))
+        # 'freshest' ranks whole stations by their newest image
+        station_freshness = max((t.freshness for t in station_tasks), default=0.0)
+        for task in station_tasks:
+            task.freshness = station_freshness
+        scheduled.extend(station_tasks)
+    return order_tasks(scheduled, schedule)
+
+
+def shardable(run: StationRun, task: ScheduledTask) -> bool:
+    _station_name, entry = task.payload
+    return (
+        run.shard_size > 0
+        and task.plan.effective_action == "annotate"
+        and task.plan.weights is not None
+        and (entry.layout == "flat_images" or run.output_layout == "yolo")
+    )
+
+
+def build_work_units(run: StationRun, scheduled: List[ScheduledTask], queue: Optional[LeaseQueue] = None) -> WorkUnits:
+    """Work units: whole tasks, or image shards of large annotate-only tasks (distributed mode).
+
+    Shards are cut from the sorted image list published by the first worker
+    (queue.shard_plan), so every worker derives the same ones. Image shards leave
+    video clips out; a sharded task with clips gets one extra `<task>#videos` unit.
+    """
+    work = WorkUnits()
+    for task in scheduled:
+        keys = [task.key]
+        if queue is not None and shardable(run, task):
+            images_dir = task_images_dir(task.payload[1])
+            names, shard_size = queue.shard_plan(
+                task.key, [p.name for p in get_image_files(str(images_dir))], run.shard_size
+            )
+            keys = shard_keys(task.key, len(names), shard_size)
+            work.shard_images[task.key] = names
+            if len(keys) > 1 and has_videos(run.base_config, images_dir):
+                keys.append(f"{task.key}{VIDEO_SHARD_SUFFIX}")
+        for unit_key in keys:
+            work.units[unit_key] = task
+    return work
+
+
+def run_shard(run: StationRun, work: WorkUnits, unit_key: str, task_metrics: TaskMetrics, logger) -> bool:
+    """Annotate one shard (or the `#videos` unit) of a sharded task into the task's labels dir."""
+    from .auto_annotator import AutoAnnotator
+
+    task = work.units[unit_key]
+    _station_name, entry = task.payload
+    weights = run.annotation_weights(entry, Path(task.plan.weights), logger)
+    cascade_weights = run.cascade_weights(entry.category_name)
+    images_dir = task_images_dir(entry)
+    labels_dir = entry.category_dir / "labels"
+    shard_name = unit_key.rsplit("#", 1)[-1]
+    videos = unit_key.endswith(VIDEO_SHARD_SUFFIX)
+    if videos:
+        shard = []
+        logger.info(f"[{task.key}] Shard {shard_name}: video clips -> {labels_dir}")
+    else:
+        shard = [p for p in shard_slice([images_dir / n for n in work.shard_images[task.key]], unit_key) if p.exists()]
+        logger.info(f"[{task.key}] Shard {shard_name}: {len(shard)} images -> {labels_dir}")
+    annotator = AutoAnnotator(
+        str(weights), run.base_config, cascade_model_path=str(cascade_weights) if cascade_weights else None
+    )
+    annotator.annotate_images_yolo(
+        str(images_dir),
+        str(labels_dir),
+        skip_existing=run.skip_existing,
+        write_empty=True,
+        report_path=str(labels_dir / f"_auto_label_report.{shard_name}.json"),
+        metrics=task_metrics,
+        image_files=shard,
+        videos=videos,
+    )
+    return True
+
+
+def record_throughput(history: ThroughputHistory, task: ScheduledTask, task_metrics: TaskMetrics,
+                      config: Dict[str, Any]) -> None:
+    """Feed a finished task's train / annotate timings into the throughput history."""
+    train_cfg = config["training"]
+    stages = task_metrics.stages
+    if stages.get("train") and not train_cfg.get("time_budget_min"):
+        # Budgeted runs stop early by design; their time says nothing about a full schedule.
+        history.record_train(train_cfg.get("img_size"), train_cfg.get("epochs"), task.plan.labeled_images,
+                             stages["train"])
+    if task_metrics.images and task.plan.weights:
+        annotate_s = sum(
+            stages.get(s, 0.0) for s in ("decode", "preprocess", "inference", "postprocess", "label_write")
+        )
+        history.record_annotate(
+            throughput_key(task.plan.weights, config.get("auto_annotation", {}).get("img_size", 640)),
+            task_metrics.images,
+            annotate_s,
+            overhead_s=stages.get("model_load", 0.0) + stages.get("weight_resolution", 0.0),
+        )
+
+
+def run_unit(
+    run: StationRun,
+    work: WorkUnits,
+    unit_key: str,
+    *,
+    logger,
+    run_metrics: RunMetrics,
+    eta: EtaTracker,
+    history: ThroughputHistory,
+    results: Dict[Tuple[str, str], bool],
+    profiler=None,
+    profile_dir: Optional[Path] = None,
+    profile_top: int = 20,
+) -> bool:
+    """Run one work unit; a task counts as successful in `results` only if all its units are."""
+    task = work.units[unit_key]
+    station_name, entry = task.payload
+    category_name = entry.category_name
+    logger.info(f"\n{'#' * 60}")
+    logger.info(f"{unit_key} (estimated {eta.estimates[unit_key]:.0f}s)")
+    logger.info(f"{'#' * 60}")
+
+    task_metrics = run_metrics.task(unit_key, station=station_name, category=category_name)
+    with profile_task(
+        profiler, f"{station_name}__{category_name}{unit_key[len(task.key):]}", profile_dir, logger, profile_top,
+    ):
+        if unit_key != task.key:
+            try:
+                ok = run_shard(run, work, unit_key, task_metrics, logger)
+            except Exception as e:
+                logger.error(f"[{unit_key}] Shard failed: {e}", exc_info=True)
+                ok = False
+        else:
+            ok = process_entry(run, station_name, entry, task_metrics, logger)
+    task_metrics.finish()
+    results[(station_name, category_name)] = results.get((station_name, category_name), True) and ok
+
+    if ok:
+        record_throughput(history, task, task_metrics, run.base_config)
+    eta.done(unit_key, task_metrics.wall_s)
+    logger.info(f"Progress: {eta.describe()}")
+    return ok
@@ -1,11 +1,79 @@
 """Model training module"""
 
+import math
+import time
 from ultralytics import YOLO
 from pathlib import Path
 from typing import Optional
 from .utils import setup_logger, ensure_dir
 
 
+class TimeBudget:
+    """Fit a training run into a wall-clock budget (seconds, measured from `train()`).
+
+    Builds on ultralytics' `time` mode, which re-estimates the epoch count from the
+    mean epoch time, rescales the LR schedule to it and stops mid-epoch (validating
+    and saving) once the time is up. On top of that this callback:
+
+    - subtracts the dataset/model setup time and a reserve for the final best.pt
+      validation and plots (estimated as the setup time plus twice the per-epoch
+      validation time) from the budget
+    - never plans more than `max_epochs` (training.epochs), so a small category
+      does not train longer just because the budget allows it
+    """
+
+    def __init__(self, budget_s: float, max_epochs: int, logger, start: Optional[float] = None):
+        self.start = start or time.time()
+        self.deadline = self.start + budget_s
+        self.budget_s = budget_s
+        self.max_epochs = max_epochs
+        self.logger = logger
+        self.setup_s = 0.0
+        self.val_s = 0.0
+        self.epoch_end = None
+        self.finished = False
+
+    def register(self, model) -> None:
+        model.add_callback("on_train_start", self.on_train_start)
+        model.add_callback("on_train_epoch_end", self.on_train_epoch_end)
+        model.add_callback("on_fit_epoch_end", self.on_fit_epoch_end)
+
+    def _set_time(self, trainer) -> float:
+        """Training time left for the epoch loop, relative to trainer.train_time_start."""
+        reserve = self.setup_s + 2 * self.val_s
+        available = max(self.deadline - reserve - trainer.train_time_start, 1.0)
+        trainer.args.time = available / 3600
+        return available
+
+    def on_train_start(self, trainer):
+        self.setup_s = trainer.train_time_start - self.start
+        available = self._set_time(trainer)
+        self.logger.info(f"Time budget: {self.budget_s / 60:.1f} min, {available / 60:.1f} min left after setup")
+
+    def on_train_epoch_end(self, trainer):
+        self.epoch_end = time.time()
+
+    def on_fit_epoch_end(self, trainer):
+        if self.finished:
+            return  # final best.pt validation also fires this event
+        now = time.time()
+        if self.epoch_end is not None:
+            self.val_s = max(self.val_s, now - self.epoch_end)
+        available = self._set_time(trainer)
+        done = trainer.epoch - trainer.start_epoch + 1
+        mean_epoch_s = (now - trainer.train_time_start) / done
+        epochs = min(self.max_epochs, max(trainer.epoch + 1, math.floor(available / mean_epoch_s)))
+        if epochs != trainer.epochs:
+            trainer.epochs = trainer.args.epochs = epochs
+            trainer._setup_scheduler()
+            trainer.scheduler.last_epoch = trainer.epoch
+        trainer.stop |= trainer.epoch + 1 >= epochs
+        if done == 1:
+            self.logger.info(f"Time budget: {mean_epoch_s:.1f}s per epoch -> planning {epochs} epochs")
+        if trainer.stop:
+            self.finished = True
+
+
 class YOLOTrainer:
     """YOLO model trainer"""
     
@@ -38,8 +106,14 @@ class YOLOTrainer:
         self.model = YOLO(model_name)
         return self.model
     
-    def train(self, data_config: str):
-        """Train the model"""
+    def train(self, data_config: str, name: str = 'train', time_budget_s: Optional[float] = None):
+        """Train the model into <model_root>/<name>.
+
+        With a time budget (argument, or training.time_budget_min), the epoch count and
+        LR schedule are fitted to it and training stops cleanly when it runs out;
+        best.pt is still the best epoch seen.
+        """
+        start = time.time()
         if self.model is None:
             self.load_model()
 
@@ -60,7 +134,7 @@ class YOLOTrainer:
             'patience': train_cfg['patience'],
             'save_period': train_cfg.get('save_period', -1),
             'project': str(output_dir),
-            'name': 'train',
+            'name': name,
             'exist_ok': True,
         }
 
@@ -84,8 +158,15 @@ class YOLOTrainer:
             if param in train_cfg:
                 train_params[param] = train_cfg[param]
 
+        if time_budget_s is None and train_cfg.get('time_budget_min'):
+            time_budget_s = float(train_cfg['time_budget_min']) * 60
+        if time_budget_s:
+            train_params['time'] = time_budget_s / 3600
+            TimeBudget(time_budget_s, train_params['epochs'], self.logger, start=start).register(self.model)
+
         self.logger.info("Starting training with parameters:")
-        self.logger.info(f"  Epochs: {train_params['epochs']}")
+        self.logger.info(f"  Epochs: {train_params['epochs']}"
+                         + (f" (max, time budget {time_budget_s / 60:.1f} min)" if time_budget_s else ""))
         self.logger.info(f"  Batch size: {train_params['batch']}")
         self.logger.info(f"  Learning rate: {train_params.get('lr0', 'default')}")
         self.logger.info(f"  Freeze layers: {train_params.get('freeze', 0)} (0=no freeze, 10=freeze backbone)")
@@ -1,10 +1,15 @@
 """Utility functions for the auto-annotation system"""
 
 import os
+import stat
+import time
+import hashlib
 import logging
+import tempfile
 import yaml
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Iterable, Optional, Tuple
 
 
 def setup_logger(name: str, log_file: str = None, level=logging.INFO) -> logging.Logger:
@@ -58,7 +63,122 @@ def ensure_dir(path: str):
     os.makedirs(path, exist_ok=True)
 
 
-def get_image_files(directory: str, extensions=('.jpg', '.jpeg', '.png', '.bmp')):
+def _new_file_mode() -> int:
+    """Mode `open(path, "w")` would give a new file (0666 minus the umask)."""
+    try:
+        # Linux exposes the umask without having to change it (os.umask is process-wide, not thread-safe)
+        with open("/proc/self/status", "r", encoding="ascii") as f:
+            umask = next(int(line.split()[1], 8) for line in f if line.startswith("Umask:"))
+    except (OSError, StopIteration, ValueError, IndexError):
+        umask = os.umask(0o022)
+        os.umask(umask)
+    return 0o666 & ~umask
+
+
+def atomic_write_text(path: str, text: str, encoding: str = "utf-8", newline: Optional[str] = None):
+    """Write text to path atomically (temp file in the same dir + os.replace).
+
+    The file keeps the mode of the file it replaces (new files get the umask
+    default), since mkstemp creates temp files as 0600.
+    """
+    target = Path(path)
+    try:
+        mode = stat.S_IMODE(os.stat(target).st_mode)
+    except OSError:
+        mode = _new_file_mode()
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{target.name}.", suffix=".tmp", dir=str(target.parent))
+    try:
+        with os.fdopen(fd, "w", encoding=encoding, newline=newline) as f:
+            f.write(text)
+            if hasattr(os, "fchmod"):
+                os.fchmod(f.fileno(), mode)
+        os.replace(tmp_path, target)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+@contextmanager
+def file_lock(lock_path: str, timeout: float = 120.0, poll_interval: float = 0.05):
+    """Exclusive inter-process lock on `lock_path` (fcntl on POSIX, msvcrt on Windows)"""
+    ensure_dir(str(Path(lock_path).parent))
+    f = open(lock_path, "a+")
+    deadline = time.monotonic() + timeout
+    try:
+        if os.name == "nt":
+            import msvcrt
+
+            while True:
+                try:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError:
+                    if time.monotonic() > deadline:
+                        raise TimeoutError(f"Timed out waiting for lock: {lock_path}")
+                    time.sleep(poll_interval)
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+
+            while True:
+                try:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() > deadline:
+                        raise TimeoutError(f"Timed out waiting for lock: {lock_path}")
+                    time.sleep(poll_interval)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    finally:
+        f.close()
+
+
+_SHA256_CACHE: Dict[Tuple[str, int, int], str] = {}
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 of a file, cached per (path, size, mtime) for the lifetime of the process"""
+    st = os.stat(path)
+    key = (str(Path(path).resolve()), st.st_size, st.st_mtime_ns)
+    cached = _SHA256_CACHE.get(key)
+    if cached:
+        return cached
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            h.update(block)
+    digest = h.hexdigest()
+    _SHA256_CACHE[key] = digest
+    return digest
+
+
+def directory_fingerprint(directory: str, suffixes: Iterable[str] = (".txt",)) -> str:
+    """Cheap fingerprint of a directory's files (names, sizes, mtimes), e.g. a training label set"""
+    suffixes = tuple(s.lower() for s in suffixes)
+    h = hashlib.sha1()
+    entries = []
+    with os.scandir(directory) as it:
+        for entry in it:
+            if entry.is_file() and entry.name.lower().endswith(suffixes):
+                st = entry.stat()
+                entries.append((entry.name, st.st_size, st.st_mtime_ns))
+    for name, size, mtime in sorted(entries):
+        h.update(f"{name}\0{size}\0{mtime}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
+def get_image_files(directory: str, extensions=('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff')):
     """Get all image files in directory"""
     image_files = []
     for ext in extensions:
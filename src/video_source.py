@@ -0,0 +1,120 @@
+"""Streaming frame sampling for video clips placed in image directories.
+
+Some stations deliver short camera clips instead of stills. Instead of
+extracting every frame to JPEG before annotating, clips are decoded
+sequentially with OpenCV and only the sampled frames reach inference:
+
+- `stride`: every N-th frame is a candidate; the frames in between are only
+  grabbed (demuxed/decoded, never converted to a BGR array)
+- `scene_threshold`: a candidate is kept only when it differs from the last
+  kept frame by at least this mean absolute difference (0-255) of a small
+  grayscale thumbnail; 0 keeps every candidate. The first frame is always kept.
+- `max_frames`: cap on sampled frames per clip (0 = no cap)
+
+Each sampled frame is resized to `img_size` into a `LoadedImage`, so boxes are
+mapped back onto the full frame like reduced JPEG decodes. Its virtual path
+`<clip dir>/<clip stem>_<frame index:06d>.jpg` gives the stable label stem
+`<video>_<frame>`; the frame index counts decoded frames from the start of the
+clip, so it does not depend on the sampling settings.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+
+import cv2
+import numpy as np
+
+from .image_loader import LoadedImage, target_size
+
+DEFAULT_VIDEO: Dict[str, Any] = {
+    "enabled": True,
+    "extensions": [".mp4", ".avi", ".mov", ".mkv"],
+    "stride": 10,
+    "scene_threshold": 0,
+    "max_frames": 0,
+    "save_frames": False,
+    "frames_dir": None,
+}
+_THUMB_SIZE = (64, 36)
+
+
+def video_settings(config: Dict[str, Any]) -> Dict[str, Any]:
+    settings = dict(DEFAULT_VIDEO)
+    settings.update(config.get("auto_annotation", {}).get("video") or {})
+    settings["stride"] = max(1, int(settings["stride"]))
+    settings["scene_threshold"] = float(settings["scene_threshold"] or 0)
+    settings["max_frames"] = int(settings["max_frames"] or 0)
+    return settings
+
+
+def get_video_files(directory, extensions=DEFAULT_VIDEO["extensions"]) -> List[Path]:
+    """Video clips directly inside `directory` (sorted, non-recursive, like get_image_files)."""
+    suffixes = {ext.lower() for ext in extensions}
+    if not Path(directory).is_dir():
+        return []
+    return sorted(p for p in Path(directory).iterdir() if p.is_file() and p.suffix.lower() in suffixes)
+
+
+def frame_path(video: Path, index: int) -> Path:
+    """Virtual image path of a sampled frame; its stem is the label stem `<video>_<frame>`."""
+    return Path(video).with_name(f"{Path(video).stem}_{index:06d}.jpg")
+
+
+def sampling_signature(settings: Dict[str, Any]) -> List[Any]:
+    """Settings that decide which frames a clip yields (used to tell whether a clip is done)."""
+    return [settings["stride"], settings["scene_threshold"], settings["max_frames"]]
+
+
+def _thumbnail(frame: np.ndarray) -> np.ndarray:
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(gray, _THUMB_SIZE, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+
+def iter_sampled_frames(
+    path, *, stride: int = 1, scene_threshold: float = 0, max_frames: int = 0
+) -> Iterator[Tuple[int, np.ndarray]]:
+    """Yield (frame index, BGR frame) for the sampled frames of a clip, decoding it as a stream."""
+    cap = cv2.VideoCapture(str(path))
+    if not cap.isOpened():
+        raise ValueError(f"Failed to open video: {path}")
+    try:
+        index, sampled, last = -1, 0, None
+        while not max_frames or sampled < max_frames:
+            if not cap.grab():
+                break
+            index += 1
+            if index % stride:
+                continue
+            ok, frame = cap.retrieve()
+            if not ok:
+                break
+            if scene_threshold > 0:
+                thumb = _thumbnail(frame)
+                if last is not None and float(np.abs(thumb - last).mean()) < scene_threshold:
+                    continue
+                last = thumb
+            sampled += 1
+            yield index, frame
+    finally:
+        cap.release()
+
+
+def frame_to_loaded(frame: np.ndarray, path: Path, imgsz) -> LoadedImage:
+    """Resize a full frame to `imgsz` (long side) for inference, keeping the scale for box mapping."""
+    height, width = frame.shape[:2]
+    scale = max(width, height) / target_size(imgsz)
+    if scale <= 1:
+        return LoadedImage(path=path, image=frame, orig_size=(width, height), scale=1)
+    size = (max(1, round(width / scale)), max(1, round(height / scale)))
+    image = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+    return LoadedImage(path=path, image=image, orig_size=(width, height), scale=width / size[0])
+
+
+def save_frame(frame: np.ndarray, path: Path) -> None:
+    """Write a sampled frame as JPEG (unicode-safe, like read_image_full)."""
+    ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 95])
+    if not ok:
+        raise ValueError(f"Failed to encode frame: {path}")
+    encoded.tofile(str(path))